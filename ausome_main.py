@@ -1,7 +1,8 @@
 # pages/home.py
 import streamlit as st
-from pages.child_profile import child_profile
+from pages.child_profile import child_profile, sync_session
 from utils.background import apply_background
+from utils.resources import get_prefetcher, load_environment
 
 # ----------------------------
 # PAGE CONFIG
@@ -16,6 +17,7 @@ st.set_page_config(
 # APPLY BACKGROUND CSS
 # ----------------------------
 apply_background()
+sync_session()
 
 # ----------------------------
 # PAGE HEADER
@@ -41,6 +43,21 @@ selected_focus = st.radio(
 # Save the selection to session_state
 st.session_state["child_activity"] = selected_focus
 
+# ----------------------------
+# BACKGROUND PREFETCH (OPT-IN)
+# ----------------------------
+st.session_state["prefetch_enabled"] = st.checkbox(
+    "Prepare likely worksheets in the background",
+    value=st.session_state.get("prefetch_enabled", False),
+    help="Uses a small daily budget to pre-generate the activities you are most likely to pick next."
+)
+if st.session_state["prefetch_enabled"] and st.session_state.get("child_age"):
+    load_environment()
+    get_prefetcher().warm(selected_focus, st.session_state)
+
+# Save this run's profile and focus for the next page (or replica).
+sync_session()
+
 # ----------------------------
 # GENERATE ACTIVITY BUTTON
 # ----------------------------
@@ -0,0 +1,95 @@
+# ausome_worker.py
+"""
+Worker pool for queued worksheet generations (see utils/job_queue.py).
+
+    python ausome_worker.py --processes 2 --concurrency 4
+    AUSOME_JOB_QUEUE=worker streamlit run ausome_main.py
+
+Each process has its own JobRunner (event loop, API client) and runs up
+to --concurrency jobs at once. Processes share the job queue, the
+worksheet cache, the artifact store and the API rate limits on disk, so
+workers can be added or stopped at any time without touching the
+Streamlit app or going over the account's limits.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from dotenv import load_dotenv
+
+# Before utils.* read their AUSOME_* settings at import time.
+load_dotenv()
+
+from utils.job_queue import JobQueue, run_queued_job
+from utils.jobs import JobRunner
+
+logger = logging.getLogger("ausome.worker")
+
+
+def _work(queue, runner, name, poll_seconds, stop):
+    while not stop.is_set():
+        row = queue.claim(name)
+        if row is None:
+            stop.wait(poll_seconds)
+            continue
+        logger.info("%s: %s (%s)", name, row["topic"], row["id"])
+        try:
+            run_queued_job(queue, runner, row)
+        except Exception:
+            # The lease expires and another worker retries the job.
+            logger.exception("%s: job %s crashed", name, row["id"])
+
+
+def run_worker(concurrency, poll_seconds, stop):
+    """One worker process: `concurrency` threads sharing one JobRunner."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    queue = JobQueue()
+    runner = JobRunner()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(target=_work, args=(queue, runner, f"{prefix}-{index}", poll_seconds, stop), daemon=True)
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs per process")
+    parser.add_argument("--poll-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    stop = multiprocessing.Event()
+    # SIGTERM (e.g. from a process manager) drains: workers finish their current jobs and exit.
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.concurrency, args.poll_seconds, stop))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Running jobs stop with their process; their leases expire and they are retried.
+        stop.set()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_generation.py
+"""
+Offline latency/throughput benchmark for the text and image generation paths.
+
+Drives the real JobRunner (event loop, cache, streaming) against the local
+FakeBackend with N concurrent simulated users, each issuing a number of
+"generate" actions the way the generator tab does.
+
+    python -m benchmarks.bench_generation --users 40 --requests 5
+    python -m benchmarks.bench_generation --users 20 --topics 3 --image-latency 2
+"""
+import argparse
+import concurrent.futures
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from benchmarks.common import latency_summary, peak_rss_mb, print_table
+from utils.artifacts import ArtifactStore
+from utils.backends import FakeBackend
+from utils.cache import WorksheetCache
+from utils.jobs import JobRunner
+from utils.metrics import get_metrics
+from utils.profile import profile_from_record
+from utils.prompts import build_image_prompt, build_text_prompt
+from utils.resilience import ResilientBackend
+
+TOPICS = [
+    "CVC Blending", "Line Tracing", "Shape Tracing", "Alphabet Tracing",
+    "Writing Practice", "Personal Hygiene", "Daily Routines", "Household Skills",
+]
+
+
+def simulated_user(runner, user_id, args, latencies, errors, lock):
+    rng = random.Random(user_id)
+    profile = profile_from_record({
+        "child_name": f"Child {user_id}",
+        "child_age": rng.randint(4, 9),
+        "learning_style": "Visual",
+        "sensory_profile": "Medium",
+    })
+    for request_index in range(args.requests):
+        if args.topics:
+            topic = TOPICS[rng.randrange(min(args.topics, len(TOPICS)))]
+        else:
+            # Unique topic per request so every call misses the cache.
+            topic = f"Benchmark topic {user_id}-{request_index}"
+        started = time.perf_counter()
+        job = runner.submit(
+            topic,
+            text_prompt=build_text_prompt(topic, profile) if args.mode in ("text", "both") else None,
+            image_prompt=build_image_prompt(topic, profile) if args.mode in ("image", "both") else None,
+            stream_text=args.stream,
+            profile=profile if args.local_render else None,
+        )
+        for name, future in job.parts.items():
+            try:
+                future.result()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[name].append(elapsed)
+            except Exception:
+                with lock:
+                    errors[name] += 1
+        with lock:
+            latencies["action"].append(time.perf_counter() - started)
+        if args.think_time:
+            time.sleep(rng.uniform(0, args.think_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=3, help="generate actions per user")
+    parser.add_argument("--mode", choices=["text", "image", "both"], default="both")
+    parser.add_argument("--stream", action="store_true", help="use the streaming text path")
+    parser.add_argument("--local-render", action="store_true",
+                        help="render structured activities locally instead of calling the image backend")
+    parser.add_argument("--topics", type=int, default=0,
+                        help="draw from this many shared topics (0 = every request unique)")
+    parser.add_argument("--text-latency", type=float, default=0.3)
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with a 429")
+    parser.add_argument("--raw", action="store_true",
+                        help="call the fake backend directly, without retries / limits / circuit breaker")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max seconds between actions")
+    args = parser.parse_args()
+
+    backend = FakeBackend(
+        text_latency=args.text_latency,
+        image_latency=args.image_latency,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=0.2,
+        seed=0,
+    )
+    # Cache rows and artifacts go to a throwaway directory, not the app's .ausome_cache.
+    cache_dir = tempfile.mkdtemp(prefix="ausome-bench-")
+    runner = JobRunner(
+        backend=backend if args.raw else ResilientBackend(backend),
+        cache=WorksheetCache(os.path.join(cache_dir, "bench.sqlite3")),
+        artifacts=ArtifactStore(os.path.join(cache_dir, "artifacts")),
+    )
+
+    latencies = {"text": [], "image": [], "action": []}
+    errors = {"text": 0, "image": 0}
+    lock = threading.Lock()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [
+            pool.submit(simulated_user, runner, user_id, args, latencies, errors, lock)
+            for user_id in range(args.users)
+        ]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    actions = len(latencies["action"])
+    print(f"users={args.users} requests/user={args.requests} mode={args.mode} "
+          f"stream={args.stream} topics={args.topics or 'unique'}")
+    print_table("Latency (seconds)", [
+        (name, latency_summary(values)) for name, values in latencies.items() if values
+    ])
+    stats = runner.cache.stats()
+    print(f"\nthroughput:   {actions / wall:.2f} actions/s over {wall:.2f}s")
+    print(f"backend calls: text={backend.calls['text']} image={backend.calls['image']}")
+    print(f"errors:       text={errors['text']} image={errors['image']}")
+    if not args.raw:
+        totals = get_metrics().totals()
+        print(f"resilience:   retries={totals.get('api_retries_total', 0):.0f} "
+              f"fallbacks={totals.get('fallback_total', 0):.0f} circuits={runner.backend.status()}")
+    print(f"cache:        hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']:.0%}")
+    print(f"coalesced:    {runner.inflight.stats()['coalesced']} requests joined an identical in-flight call")
+    print(f"memory:       traced peak={traced_peak / (1024 * 1024):.1f} MB, process peak RSS={peak_rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# benchmarks/bench_load.py
+"""
+Headless load / regression test for the Streamlit pages, built on
+streamlit.testing.v1.AppTest. Each simulated teacher session walks the
+real pages the way a teacher does:
+
+    home page      load, fill and save the profile form, pick a focus
+    generator page load (the session is restored from the shared state
+                   backend, as after st.switch_page), edit the profile
+                   tab, open the generator tab, pick an activity, click
+                   "Generate Text Activity", then "Generate Activity Image"
+
+AppTest swaps process-wide runtime state on every run, so one process can
+only run one script at a time. Concurrent sessions are therefore spread
+over --processes worker processes (each one session at a time), which
+share the cache, state and job stores on disk like replicas of the app.
+OpenAI is stubbed: by default with the FakeBackend, or with --fake-server
+through the real SDK against benchmarks/fake_openai_server.py on a local
+port.
+
+    python -m benchmarks.bench_load --sessions 40 --processes 8
+    python -m benchmarks.bench_load --sessions 40 --fake-server --save-baseline load.json
+    python -m benchmarks.bench_load --sessions 40 --baseline load.json
+
+Reported: script rerun latency per step (a click on a generate button is
+reported separately, from click until the result is on screen), memory
+per session (peak RSS growth of the workers / sessions, AppTest's
+element trees included), throughput, and errors: script exceptions,
+st.error messages, and clicks after which no text or image is shown.
+Only flows whose results all appeared count toward throughput. Exits
+with status 1 if any threshold is exceeded, or if --baseline is given
+and a metric is worse than the saved run by more than --tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import ThreadingHTTPServer
+
+from benchmarks.common import latency_summary, peak_rss_mb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOME_PAGE = os.path.join(ROOT, "ausome_main.py")
+GENERATOR_PAGE = os.path.join(ROOT, "pages", "ausome_chatbot.py")
+GENERATOR_TAB = "📝 Generate Worksheet"
+ACTIVITIES = {
+    "Cognitive": ("cog_radio_type", ["Basic Reading (Phonics)", "Shapes (Math)", "Tracing (Writing)"]),
+    "Self-Help": ("self_help_radio_type", ["Personal Hygiene", "Daily Routines", "Household Skills"]),
+}
+INTERESTS = ["trains", "dinosaurs", "music", "animals", "space", "drawing"]
+# What the generator page shows once a result is ready.
+TEXT_HEADER = "📘 Generated Activity Instructions"
+IMAGE_CAPTION = "Generated: "
+
+# Metrics compared against a baseline: name -> True if higher is better.
+BASELINE_METRICS = {
+    "rerun_p95_s": False,
+    "click_p95_s": False,
+    "session_mb": False,
+    "flows_per_s": True,
+}
+
+
+# ----------------------------
+# ONE SESSION
+# ----------------------------
+class SessionRecorder:
+    """Timings and errors of the sessions run by one worker process."""
+
+    def __init__(self):
+        self.reruns = defaultdict(list)
+        self.clicks = defaultdict(list)
+        self.errors = []
+        self.flows = 0
+
+    def run(self, at, step, click=False, expect=None):
+        """
+        Run the script once. Exceptions and st.error messages count as
+        errors, and so does a missing result when expect(at) is given.
+        Returns True if the step succeeded.
+        """
+        started = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - started
+        (self.clicks if click else self.reruns)[step].append(elapsed)
+        errors = [f"{step}: {error.value}" for error in at.exception]
+        errors += [f"{step}: {error.value}" for error in at.error]
+        if expect is not None and not errors and not expect(at):
+            errors.append(f"{step}: no result on screen")
+        self.errors.extend(errors)
+        return not errors
+
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def _shows_text(at):
+    return any(header.value == TEXT_HEADER for header in at.subheader)
+
+
+def _shows_image(at):
+    return any(caption.startswith(IMAGE_CAPTION) for image in at.image for caption in image.captions)
+
+
+def teacher_session(index, recorder, timeout, keep):
+    """One teacher's flow through the home page and the generator page."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(index)
+    focus = rng.choice(list(ACTIVITIES))
+
+    home = AppTest.from_file(HOME_PAGE, default_timeout=timeout)
+    recorder.run(home, "home: load")
+    _widget(home.text_input, "Child Name").set_value(f"Child {index}")
+    _widget(home.number_input, "Age").set_value(rng.randint(4, 10))
+    _widget(home.button, "Save Profile").click()
+    recorder.run(home, "home: save profile")
+    _widget(home.radio, "Choose focus area:").set_value(focus)
+    recorder.run(home, "home: pick focus")
+
+    # The home page issued the session token; st.switch_page keeps it in the URL.
+    generator = AppTest.from_file(GENERATOR_PAGE, default_timeout=timeout)
+    generator.query_params["teacher"] = home.query_params["teacher"]
+    recorder.run(generator, "generator: load")
+    generator.text_area(key="child_interests").set_value(rng.choice(INTERESTS))
+    recorder.run(generator, "profile tab: edit")
+    generator.session_state["chatbot_tab"] = GENERATOR_TAB
+    recorder.run(generator, "generator: open tab")
+    key, options = ACTIVITIES[focus]
+    generator.radio(key=key).set_value(rng.choice(options))
+    recorder.run(generator, "generator: pick")
+    # The page polls its job until the result is shown, so each run covers click -> result.
+    _widget(generator.button, "Generate Text Activity").click()
+    text_ok = recorder.run(generator, "text", click=True, expect=_shows_text)
+    _widget(generator.button, "Generate Activity Image").click()
+    image_ok = recorder.run(generator, "image", click=True, expect=_shows_image)
+    if text_ok and image_ok:
+        recorder.flows += 1
+    if keep is not None:
+        keep.append((home, generator))
+
+
+def worker(indexes, timeout, barrier, results):
+    """One worker process: a warm-up session, then its share of the sessions in turn."""
+    try:
+        # A teacher of its own, so the measured sessions start on their own cache keys.
+        teacher_session(-1 - indexes[0], SessionRecorder(), timeout, None)
+    except Exception:
+        pass  # the measured sessions report the same failure
+    recorder = SessionRecorder()
+    sessions = []
+    rss_before = peak_rss_mb()
+    barrier.wait()
+    started = time.time()
+    for index in indexes:
+        try:
+            teacher_session(index, recorder, timeout, sessions)
+        except Exception as e:
+            recorder.errors.append(f"session {index} crashed: {e!r}")
+    results.put({
+        "reruns": dict(recorder.reruns),
+        "clicks": dict(recorder.clicks),
+        "errors": recorder.errors,
+        "flows": recorder.flows,
+        "sessions": len(sessions),
+        "memory_mb": peak_rss_mb() - rss_before,
+        "started": started,
+        "finished": time.time(),
+    })
+
+
+# ----------------------------
+# STUBBED OPENAI
+# ----------------------------
+def start_fake_server(args):
+    """Fake OpenAI API on a free local port; the real OpenAIBackend talks to it."""
+    from benchmarks.fake_openai_server import FakeOpenAIHandler
+
+    FakeOpenAIHandler.settings = argparse.Namespace(
+        text_latency=args.text_latency,
+        image_latency=args.image_latency,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=0.0,
+        retry_after=1.0,
+        verbose=False,
+    )
+    FakeOpenAIHandler.random = random.Random(0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure(args, tmp):
+    """Environment for the app modules; must run before any of them is imported."""
+    os.environ.update({
+        "AUSOME_CACHE_DIR": os.path.join(tmp, "cache"),
+        "AUSOME_DATA_DIR": os.path.join(tmp, "data"),
+        "AUSOME_ARTIFACT_DIR": os.path.join(tmp, "artifacts"),
+        "AUSOME_JOB_QUEUE": "inline",
+        "AUSOME_STATE_BACKEND": "sqlite",
+    })
+    os.environ.pop("AUSOME_METRICS_LOG", None)
+    if args.fake_server:
+        server = start_fake_server(args)
+        os.environ.update({
+            "AUSOME_BACKEND": "openai",
+            "OPENAI_API_KEY": "test",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}/v1",
+        })
+        return server
+    os.environ.update({
+        "AUSOME_BACKEND": "fake",
+        "AUSOME_FAKE_TEXT_LATENCY": str(args.text_latency),
+        "AUSOME_FAKE_IMAGE_LATENCY": str(args.image_latency),
+        "AUSOME_FAKE_FAILURE_RATE": str(args.failure_rate),
+    })
+    return None
+
+
+# ----------------------------
+# REPORT / THRESHOLDS
+# ----------------------------
+def print_steps(title, samples):
+    print(f"\n{title}")
+    print(f"{'step':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for step, values in samples.items():
+        summary = latency_summary(values)
+        print(
+            f"{step:<24}{summary['count']:>7}{summary['p50'] * 1000:>10.1f}"
+            f"{summary['p95'] * 1000:>10.1f}{summary['max'] * 1000:>10.1f}"
+        )
+
+
+def check(results, args):
+    """List of failure messages (empty if every threshold and the baseline hold)."""
+    failures = []
+    limits = [
+        ("rerun_p95_s", args.max_rerun_p95, "rerun p95 {:.3f}s > {:.3f}s"),
+        ("click_p95_s", args.max_click_p95, "click-to-result p95 {:.3f}s > {:.3f}s"),
+        ("session_mb", args.max_session_mb, "memory per session {:.1f} MB > {:.1f} MB"),
+    ]
+    for name, limit, message in limits:
+        if limit and results[name] > limit:
+            failures.append(message.format(results[name], limit))
+    if args.min_throughput and results["flows_per_s"] < args.min_throughput:
+        failures.append(f"throughput {results['flows_per_s']:.2f} flows/s < {args.min_throughput:.2f}")
+    if results["errors"] > args.max_errors:
+        failures.append(f"{results['errors']} errors > {args.max_errors}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, higher_is_better in BASELINE_METRICS.items():
+            old, new = baseline.get(name), results[name]
+            if not old:
+                continue
+            worse = old / new - 1 if higher_is_better else new / old - 1
+            if worse > args.tolerance:
+                failures.append(f"{name} regressed {worse:.0%} vs baseline ({old:.3f} -> {new:.3f})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="simulated teacher sessions")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="worker processes, i.e. sessions at once (0 = one per session)")
+    parser.add_argument("--fake-server", action="store_true",
+                        help="use the real OpenAI SDK against a local fake API server")
+    parser.add_argument("--text-latency", type=float, default=0.3)
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per script run")
+    parser.add_argument("--max-rerun-p95", type=float, default=1.0, help="seconds; 0 disables")
+    parser.add_argument("--max-click-p95", type=float, default=5.0, help="seconds; 0 disables")
+    parser.add_argument("--max-session-mb", type=float, default=50.0, help="MB; 0 disables")
+    parser.add_argument("--min-throughput", type=float, default=0.0, help="flows/s; 0 disables")
+    parser.add_argument("--max-errors", type=int, default=0)
+    parser.add_argument("--baseline", help="JSON from an earlier --save-baseline run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs the baseline")
+    parser.add_argument("--save-baseline", help="write this run's metrics to a JSON file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ausome-load-")
+    server = configure(args, tmp)
+    processes = min(args.processes or args.sessions, args.sessions)
+
+    # Each worker runs an unmeasured warm-up session (imports, resources,
+    # fonts) first; cold start is covered by benchmarks/bench_startup.py.
+    barrier = multiprocessing.Barrier(processes)
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=worker, args=(list(range(n, args.sessions, processes)), args.timeout, barrier, queue)
+        )
+        for n in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    reports = [queue.get() for _ in workers]
+    for process in workers:
+        process.join()
+
+    reruns_by_step = defaultdict(list)
+    clicks_by_step = defaultdict(list)
+    errors = []
+    for report in reports:
+        for step, values in report["reruns"].items():
+            reruns_by_step[step].extend(values)
+        for step, values in report["clicks"].items():
+            clicks_by_step[step].extend(values)
+        errors.extend(report["errors"])
+    flows = sum(report["flows"] for report in reports)
+    sessions = sum(report["sessions"] for report in reports)
+    memory_mb = sum(report["memory_mb"] for report in reports)
+    wall = max(report["finished"] for report in reports) - min(report["started"] for report in reports)
+
+    reruns = [seconds for values in reruns_by_step.values() for seconds in values]
+    clicks = [seconds for values in clicks_by_step.values() for seconds in values]
+    results = {
+        "sessions": args.sessions,
+        "rerun_p95_s": latency_summary(reruns)["p95"],
+        "click_p95_s": latency_summary(clicks)["p95"],
+        "session_mb": memory_mb / max(1, sessions),
+        "flows_per_s": flows / wall,
+        "errors": len(errors),
+    }
+
+    print(f"sessions={args.sessions} processes={processes} "
+          f"client={'fake server + OpenAI SDK' if args.fake_server else 'FakeBackend'} "
+          f"text={args.text_latency}s image={args.image_latency}s")
+    print_steps("Script reruns", reruns_by_step)
+    print_steps("Generate clicks (click -> result on screen)", clicks_by_step)
+    print(f"\nthroughput:  {flows} flows in {wall:.2f}s = {results['flows_per_s']:.2f} flows/s, "
+          f"{(len(reruns) + len(clicks)) / wall:.1f} script runs/s")
+    print(f"memory:      {results['session_mb']:.2f} MB per session "
+          f"({memory_mb:.0f} MB peak RSS growth over {processes} processes)")
+    print(f"errors:      {len(errors)} ({flows} of {args.sessions} flows completed)")
+    for error in errors[:10]:
+        print(f"    {error}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    failures = check(results, args)
+    if server is not None:
+        server.shutdown()
+    print("\nFAIL\n  " + "\n  ".join(failures) if failures else "\nPASS")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
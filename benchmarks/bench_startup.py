@@ -0,0 +1,135 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark: what a fresh server process (e.g. a new container
+after a deploy) pays before the first page is on screen.
+
+Each page is run with Streamlit's AppTest in a new Python process, so
+module imports, .env loading and resource creation are measured cold:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --reruns 20
+
+Reported per page: import of Streamlit itself, the first script run
+(everything the page imports and builds), warm reruns, and which heavy
+optional modules (openai, httpx, PIL, numpy, dotenv) the page pulled in.
+Also times the background CSS: first encode, restart with the on-disk
+copy, and the per-rerun cached path.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import latency_summary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["ausome_main.py", "pages/ausome_chatbot.py", "pages/classroom_batch.py", "pages/weekly_workbook.py",
+         "pages/admin_metrics.py"]
+HEAVY_MODULES = ["openai", "httpx", "PIL", "numpy", "dotenv"]
+
+
+def measure_page(page, reruns):
+    """Runs inside the child process; prints one JSON line."""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_seconds = time.perf_counter() - started
+
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    if page.endswith("ausome_chatbot.py"):
+        at.session_state["child_activity"] = "Cognitive"
+    started = time.perf_counter()
+    at.run()
+    first_seconds = time.perf_counter() - started
+    rerun_seconds = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        rerun_seconds.append(time.perf_counter() - started)
+    print(json.dumps({
+        "streamlit": streamlit_seconds,
+        "first": first_seconds,
+        "reruns": rerun_seconds,
+        "modules": [name for name in HEAVY_MODULES if name in sys.modules],
+        "errors": [str(error.value) for error in at.exception],
+    }))
+
+
+def measure_background():
+    """Runs inside the child process; prints one JSON line."""
+    from utils import background
+
+    started = time.perf_counter()
+    background.background_css()
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(100):
+        background.background_css()
+    print(json.dumps({"first": first, "cached": (time.perf_counter() - started) / 100}))
+
+
+def _child(args, env):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup"] + args,
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per page")
+    parser.add_argument("--reruns", type=int, default=10, help="warm reruns per process")
+    parser.add_argument("--child-page", help=argparse.SUPPRESS)
+    parser.add_argument("--child-background", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_page:
+        measure_page(args.child_page, args.reruns)
+        return
+    if args.child_background:
+        measure_background()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            AUSOME_BACKEND="fake",
+            AUSOME_CACHE_DIR=os.path.join(tmp, "cache"),
+            AUSOME_DATA_DIR=os.path.join(tmp, "data"),
+            AUSOME_ARTIFACT_DIR=os.path.join(tmp, "artifacts"),
+        )
+        env.pop("AUSOME_METRICS_LOG", None)
+
+        # Before any page run, so the first encode really starts cold.
+        cold = _child(["--child-background"], env)
+        restart = _child(["--child-background"], env)
+
+        print(f"{'page':<28}{'import st s':>12}{'first run s':>12}{'rerun p50 ms':>14}{'rerun p95 ms':>14}  heavy modules")
+        for page in PAGES:
+            results = [
+                _child(["--child-page", page, "--reruns", str(args.reruns)], env)
+                for _ in range(args.repeat)
+            ]
+            reruns = latency_summary([seconds for result in results for seconds in result["reruns"]])
+            first = latency_summary([result["first"] for result in results])
+            imports = latency_summary([result["streamlit"] for result in results])
+            print(
+                f"{page:<28}{imports['p50']:>12.3f}{first['p50']:>12.3f}"
+                f"{reruns['p50'] * 1000:>14.1f}{reruns['p95'] * 1000:>14.1f}  "
+                f"{', '.join(results[-1]['modules']) or '-'}"
+            )
+            for error in results[-1]["errors"]:
+                print(f"    error: {error}")
+
+        print("\nbackground CSS")
+        print(f"  first encode      {cold['first'] * 1000:8.1f} ms")
+        print(f"  restart (on disk) {restart['first'] * 1000:8.1f} ms")
+        print(f"  per rerun         {restart['cached'] * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/common.py
+# Small helpers shared by the benchmark scripts.
+import resource
+import sys
+
+from utils.timing import percentile
+
+
+def latency_summary(values):
+    ordered = sorted(values)
+    return {
+        "count": len(values),
+        "p50": percentile(ordered, 50) if ordered else 0.0,
+        "p95": percentile(ordered, 95) if ordered else 0.0,
+        "p99": percentile(ordered, 99) if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def print_table(title, rows):
+    """rows: list of (label, summary dict from latency_summary)."""
+    print(f"\n{title}")
+    print(f"{'path':<12}{'count':>8}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'max s':>10}")
+    for label, summary in rows:
+        print(
+            f"{label:<12}{summary['count']:>8}{summary['p50']:>10.3f}"
+            f"{summary['p95']:>10.3f}{summary['p99']:>10.3f}{summary['max']:>10.3f}"
+        )
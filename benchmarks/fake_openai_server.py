@@ -0,0 +1,158 @@
+# benchmarks/fake_openai_server.py
+"""
+Local HTTP server that mimics the two OpenAI endpoints the app uses, so the
+real OpenAIBackend (SDK, HTTP pool, deadlines, retries, circuit breaker) can
+be exercised without an API key or network access.
+
+    python -m benchmarks.fake_openai_server --port 8765 --rate-limit-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test streamlit run ausome_main.py
+
+Supports POST /v1/chat/completions (plain, stream=True with usage, and
+json_schema structured output) and POST /v1/images/generations
+(b64_json), with injected latency, 500s and 429s carrying a Retry-After
+header.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.backends import FAKE_ACTIVITY_TEXT, fake_sheet, placeholder_png
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    settings = None
+    random = random.Random()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        if self.settings.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self):
+        """Send an injected error and return True, or return False."""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.settings.rate_limit_rate:
+            self._send_json(
+                429, {"error": {"message": "Rate limit reached (fake server)", "type": "requests"}},
+                {"Retry-After": str(self.settings.retry_after)},
+            )
+            return True
+        if roll < self.settings.rate_limit_rate + self.settings.failure_rate:
+            self._send_json(500, {"error": {"message": "Internal server error (fake server)", "type": "server_error"}})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/chat/completions"):
+            time.sleep(self.settings.text_latency * 0.2)
+            if not self._maybe_fail():
+                self._chat(request)
+        elif self.path.endswith("/images/generations"):
+            time.sleep(self.settings.image_latency)
+            if not self._maybe_fail():
+                self._image(request)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _chat(self, request):
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        content = FAKE_ACTIVITY_TEXT
+        if (request.get("response_format") or {}).get("type") == "json_schema":
+            content = json.dumps(fake_sheet(prompt))
+        words = content.split(" ")
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(words),
+            "total_tokens": len(prompt.split()) + len(words),
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model")}
+        if not request.get("stream"):
+            time.sleep(self.settings.text_latency * 0.8)
+            self._send_json(200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = self.settings.text_latency * 0.8 / len(words)
+        for index, word in enumerate(words):
+            self._event({**base, "object": "chat.completion.chunk", "choices": [{
+                "index": 0,
+                "delta": {"content": word if index == 0 else " " + word},
+                "finish_reason": None,
+            }]})
+            time.sleep(step)
+        self._event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _image(self, request):
+        image = placeholder_png(request.get("size") or "1024x1024")
+        self._send_json(200, {
+            "created": int(time.time()),
+            "data": [{"b64_json": base64.b64encode(image).decode("ascii")}],
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--text-latency", type=float, default=1.5)
+    parser.add_argument("--image-latency", type=float, default=5.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.settings = args
+    FakeOpenAIHandler.random = random.Random(args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"fake OpenAI API on http://{args.host}:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
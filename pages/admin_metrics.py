@@ -0,0 +1,175 @@
+import streamlit as st
+from utils.background import apply_background
+from utils.cache import get_cache
+from utils.metrics import get_metrics
+from utils.resources import get_job_queue, get_job_runner, get_semantic_cache, load_environment
+from utils.state import STATE_BACKEND
+from utils.timing import get_rerun_timings
+
+# ----------------------------
+# PAGE CONFIG
+# ----------------------------
+st.set_page_config(
+    page_title="AI Ausome Assistant",
+    page_icon="💙",
+    layout="wide"
+)
+
+# ----------------------------
+# APPLY BACKGROUND CSS
+# ----------------------------
+apply_background()
+
+load_environment()
+metrics = get_metrics()
+cache = get_cache()
+runner = get_job_runner()
+semantic = get_semantic_cache()
+
+# ----------------------------
+# PAGE HEADER
+# ----------------------------
+st.markdown("<h1 style='text-align:center;'>📈 Admin Metrics</h1>", unsafe_allow_html=True)
+st.markdown(
+    "<p style='text-align:center;'>Rolling latency per generation stage, cache hit rates and API usage "
+    "for this server process</p>",
+    unsafe_allow_html=True
+)
+st.button("🔄 Refresh")
+
+# ----------------------------
+# USAGE & COST
+# ----------------------------
+totals = metrics.totals()
+cache_stats = cache.stats()
+pool_stats = runner.inflight.stats()
+semantic_stats = semantic.stats()
+queue_stats = get_job_queue().stats()
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Estimated API cost", f"${totals.get('cost_usd_total', 0.0):.4f}")
+col2.metric(
+    "Text tokens",
+    f"{totals.get('prompt_tokens_total', 0) + totals.get('completion_tokens_total', 0):,.0f}",
+    help=f"{totals.get('prompt_tokens_total', 0):,.0f} prompt / "
+         f"{totals.get('completion_tokens_total', 0):,.0f} completion"
+)
+col3.metric("Images generated", f"{totals.get('images_total', 0):,.0f}")
+col4.metric(
+    "Cache hit rate",
+    f"{cache_stats['hit_rate']:.0%}",
+    help=f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
+
+before = totals.get("prompt_tokens_before_total", 0)
+after = totals.get("prompt_tokens_after_total", 0)
+if before:
+    st.caption(
+        f"Prompt compaction: {before:,.0f} → {after:,.0f} tokens across built prompts "
+        f"({1 - after / before:.0%} smaller)"
+    )
+
+# ----------------------------
+# STAGE LATENCY
+# ----------------------------
+st.subheader("⏱️ Stage latency (rolling)")
+stage_rows = metrics.stage_summary()
+if stage_rows:
+    st.dataframe(
+        [
+            {
+                "Stage": row["stage"],
+                "Calls": row["count"],
+                "Errors": row["errors"],
+                "p50 (ms)": round(row["p50_ms"], 1),
+                "p95 (ms)": round(row["p95_ms"], 1),
+                "Mean (ms)": round(row["mean_ms"], 1),
+            }
+            for row in stage_rows
+        ],
+        hide_index=True
+    )
+else:
+    st.info("No generations recorded since the server started.")
+
+st.subheader("🔁 Page script time per rerun")
+timings = get_rerun_timings()
+rerun_rows = []
+for name in timings.names():
+    summary = timings.summary(name)
+    rerun_rows.append({
+        "Page / fragment": name,
+        "Reruns": summary["count"],
+        "p50 (ms)": round(summary["p50_ms"], 1),
+        "p95 (ms)": round(summary["p95_ms"], 1),
+    })
+if rerun_rows:
+    st.dataframe(rerun_rows, hide_index=True)
+else:
+    st.caption("No page reruns recorded yet.")
+
+# ----------------------------
+# CACHES
+# ----------------------------
+st.subheader("🗄️ Caches")
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.write(
+        f"**Worksheet cache:** {cache_stats['entries']} entries, "
+        f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB, {cache_stats['evictions']} evictions"
+    )
+with col2:
+    st.write(
+        f"**Shared requests:** {pool_stats['started']} started, "
+        f"{pool_stats['coalesced']} joined, {pool_stats['in_flight']} in progress"
+    )
+with col3:
+    st.write(
+        f"**Similar custom topics:** {semantic_stats['hits']} offered in {semantic_stats['lookups']} lookups "
+        f"({semantic_stats['hit_rate']:.0%}), {totals.get('semantic_accepted_total', 0):.0f} accepted, "
+        f"{semantic_stats['topics']} topics indexed"
+    )
+st.write(
+    f"**Job queue:** {queue_stats['queued']} waiting, {queue_stats['running']} running "
+    f"({queue_stats['busy_workers']} busy worker threads), {queue_stats['done']} done, "
+    f"{queue_stats['failed']} failed"
+)
+st.write(f"**Shared session state:** {STATE_BACKEND} backend")
+
+# ----------------------------
+# API HEALTH
+# ----------------------------
+if hasattr(runner.backend, "breakers"):
+    st.subheader("🩺 API health")
+    breaker_states = runner.backend.status()
+    st.write(
+        " · ".join(f"**{kind}:** circuit {state}" for kind, state in breaker_states.items())
+        + f" · {totals.get('api_retries_total', 0):.0f} retries"
+        + f" · {totals.get('fallback_total', 0):.0f} fallbacks to cached or local output"
+    )
+
+# ----------------------------
+# PROMETHEUS EXPORT
+# ----------------------------
+gauges = {
+    "cache_hits_total": cache_stats["hits"],
+    "cache_misses_total": cache_stats["misses"],
+    "cache_hit_ratio": cache_stats["hit_rate"],
+    "cache_entries": cache_stats["entries"],
+    "cache_bytes": cache_stats["bytes"],
+    "requests_coalesced_total": pool_stats["coalesced"],
+    "requests_in_flight": pool_stats["in_flight"],
+    "semantic_lookups_total": semantic_stats["lookups"],
+    "semantic_topics": semantic_stats["topics"],
+    "jobs_queued": queue_stats["queued"],
+    "jobs_running": queue_stats["running"],
+}
+prometheus_text = metrics.prometheus_text(gauges)
+with st.expander("Prometheus text"):
+    st.code(prometheus_text, language="text")
+st.download_button(
+    label="📥 Download metrics.prom",
+    data=prometheus_text,
+    file_name="metrics.prom",
+    mime="text/plain"
+)
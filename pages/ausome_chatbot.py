@@ -1,10 +1,21 @@
 import streamlit as st
-from pages.child_profile import ensure_profile_exists
-from openai import OpenAI
-import base64
-import os
-from dotenv import load_dotenv
+from streamlit.errors import StreamlitAPIException
+from pages.child_profile import ensure_profile_exists, sync_session
+import functools
+import time
+from utils.artifacts import get_artifact_store
 from utils.background import apply_background
+from utils.cache import get_cache
+from utils.job_queue import JOB_QUEUE_MODE, MISSING_IMAGE
+from utils.metrics import get_metrics
+from utils.resources import get_job_queue, get_job_runner, get_prefetcher, get_semantic_cache, load_environment
+from utils.profile import GENERATOR_DEFAULTS, generator_value
+from utils.prompts import build_text_prompt, build_image_prompt, build_sheet_prompt, prompt_token_report
+from utils.structured import STRUCTURED_DEFAULT
+from utils.resilience import describe_error
+from utils.timing import get_rerun_timings, timed
+
+RERUN_STARTED = time.perf_counter()
 
 # ----------------------------
 # PAGE CONFIG
@@ -22,10 +33,20 @@ st.set_page_config(
 apply_background()
 
 # ---------------------------
-# OPENAI CLIENT
+# OPENAI JOB RUNNER
 # ----------------------------
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# .env, the client and the runner are built once per process, not per rerun.
+load_environment()
+runner = get_job_runner()
+cache = get_cache()
+artifacts = get_artifact_store()
+prefetcher = get_prefetcher()
+queue = get_job_queue()
+JOB_POLL_SECONDS = 0.5
+
+# Session (child, choices, current job) from the shared state backend, keyed
+# by the teacher ID in the URL; any replica can serve the next request.
+sync_session()
 
 # ----------------------------
 # PAGE HEADER
@@ -34,289 +55,478 @@ st.markdown("<h1 style='text-align:center;'>🧩 Activity Generator for Ausome K
 st.markdown("<p style='text-align:center;'>Generate custom activity worksheets for children</p>", unsafe_allow_html=True)
 
 # ----------------------------
-# TABS
+# WIDGET STATE ACROSS TABS
 # ----------------------------
-tabs = st.tabs(["🧩 Child Profile", "📝 Generate Worksheet", "ℹ️ About"])
+# Only the open tab is rendered, and Streamlit forgets the value of a keyed
+# widget that was not drawn in a run. Re-assigning the keys here (before any
+# widget exists) keeps the profile and generator choices while the other
+# tab is open. Unset fields get utils.profile.GENERATOR_DEFAULTS, which
+# prompts built off this page (the prefetcher) use as well.
+PROFILE_WIDGETS = {
+    "learning_style": ["Visual", "Auditory", "Kinesthetic", "Mixed"],
+    "academic_level": ["Preschool", "Kindergarten", "Grade 1", "Grade 2", "Grade 3+"],
+    "sensory_profile": ["Low", "Medium", "High"],
+    "comm_level": ["Non-verbal", "Basic Words", "Full Sentences"],
+    "child_activity": ["Cognitive", "Self-Help"],
+}
+GENERATOR_WIDGETS = ["cog_radio_type", "tracing_focus", "self_help_radio_type", "variant_count", "structured_mode"]
+
+
+def _options(key):
+    """Widget options, keeping a value saved from the full profile form if it is not listed."""
+    options = PROFILE_WIDGETS[key]
+    value = st.session_state.get(key)
+    return options if value in options else options + [value]
+
+
+for key, default in GENERATOR_DEFAULTS.items():
+    st.session_state[key] = generator_value(key, st.session_state.get(key, default))
+
+st.session_state["stream_text"] = st.session_state.get("stream_text", True)
+st.session_state["structured_mode"] = st.session_state.get("structured_mode", STRUCTURED_DEFAULT)
+for key in GENERATOR_WIDGETS + [k for k in st.session_state if str(k).startswith("user_topic_input_")]:
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
 
 # ----------------------------
-# CHILD CONTEXT FUNCTION
+# TABS
 # ----------------------------
-def build_child_context():
-    profile = st.session_state
-    return f"""
-Child Profile:
-- Name: {profile.get('child_name')}
-- Age: {profile.get('child_age')}
-- Learning Style: {profile.get('learning_style')}
-- Academic Level: {profile.get('academic_level')}
-
-Behavioral Information:
-- Notes: {profile.get('behavioral_notes')}
-
-Strengths & Interests:
-- Strengths: {profile.get('child_strengths')}
-- Interests: {profile.get('child_interests')}
-
-Sensory Profile:
-- Sensitivity Level: {profile.get('sensory_profile')}
-- Triggers: {profile.get('sensory_triggers')}
-
-Communication Profile:
-- Level: {profile.get('comm_level')}
-- Methods: {profile.get('comm_methods')}
-"""
+# on_change="rerun" makes the tabs stateful, so only the open tab's code runs.
+tabs = st.tabs(["🧩 Child Profile", "📝 Generate Worksheet", "ℹ️ About"], key="chatbot_tab", on_change="rerun")
 
-# ----------------------------
-# WORKSHEET PROMPT FUNCTION
-# ----------------------------
-def build_worksheet_prompt(activity_type):
-    child_age = st.session_state.get("child_age", "")
-    learning_style = st.session_state.get("learning_style", "")
-    behavior = st.session_state.get("behavioral_notes", "")
-    strengths = st.session_state.get("child_interests", "")
-    sensory = st.session_state.get("sensory_profile", "")
-    communication = st.session_state.get("comm_level", "")
-
-    base_profile = f"""
-You are an AI that generates sensory-friendly worksheets for children with ASD.
-
-Child Profile:
-- Age: {child_age}
-- Learning Style: {learning_style}
-- Behavioral Notes: {behavior}
-- Strengths & Interests: {strengths}
-- Sensory Sensitivity: {sensory}
-- Communication Level: {communication}
-
-Follow ASD-friendly design:
-- Black & white only
-- Thick outlines, minimal details
-- Structured and predictable layout
-- Very simple instructions
-- Wide spacing
-"""
-    # Example activity types
-    if activity_type == "CVC Blending":
-        return base_profile + """Create a black-and-white, sensory-friendly phonics worksheet focused on CVC word blending.
-            Include:
-            - A clear name header line: “Name: ___________”
-            - A short, simple instruction: “Read the sounds. Blend the word.”
-            - A table with 4 columns and 3 rows.
-            - Each cell should contain:
-                • One CVC word (e.g., tap, gap, cap, mop, dog, sun, bed, lip)
-                • The word should be in large, clear font.
-            - Use only beginner-level CVC words.
-            - Avoid pictures unless explicitly requested.
-            - Keep layout low-visual-clutter for ASD-friendly processing."""
-    if activity_type == "Alphabet Tracing":
-        return base_profile + "Generate an alphabet tracing worksheet (uppercase + lowercase) with simple related objects and dotted lines to trace."
-    if activity_type == "Line Tracing":
-        return base_profile + "Generate a line tracing worksheet with straight, zigzag, curved, and wavy lines."
-    if activity_type == "Shape Tracing":
-        return base_profile + "Generate a shape tracing worksheet with square, circle, triangle, star, heart, etc., with labels and dashed lines."
-    if activity_type == "Writing Practice":
-        return base_profile + "Generate a handwriting practice worksheet with large model letters/numbers and multiple rows of dotted traceable characters."
-
-    # Default custom topic
-    return base_profile + f"""
-Generate a sensory-friendly worksheet based on this topic:
-"{activity_type}"
-
-Requirements:
-- Black & white only
-- Simple illustrations
-- Very simple instructions
-- Structured layout
-- Header: "Name: ________"
-"""
 
 # ---------- TAB 1: Child Profile ----------
-with tabs[0]:
-    st.header("Child Profile")
-    ensure_profile_exists()
-    st.info("You can update the child profile below. Changes are saved automatically.")
-
-    st.subheader("👤 Personal Information")
-    st.text_input("Name", value=st.session_state.get('child_name',''), key='child_name')
-    st.number_input("Age", value=st.session_state.get('child_age',5), min_value=1, max_value=18, key='child_age')
-    learning_options = ["Visual","Auditory","Kinesthetic","Mixed"]
-    st.selectbox("Learning Style", learning_options, index=learning_options.index(st.session_state.get('learning_style','Visual')), key='learning_style')
-    academic_options = ["Preschool","Kindergarten","Grade 1","Grade 2","Grade 3+"]
-    st.selectbox("Academic Level", academic_options, index=academic_options.index(st.session_state.get('academic_level','Preschool')), key='academic_level')
-
-    st.subheader("📝 Behavioral Information")
-    st.text_area("Behavioral Notes", value=st.session_state.get('behavioral_notes',''), height=80, key='behavioral_notes')
-
-    st.subheader("🌟 Strengths & Interests")
-    st.text_area("Strengths", value=st.session_state.get('child_strengths',''), height=60, key='child_strengths')
-    st.text_area("Interests", value=st.session_state.get('child_interests',''), height=60, key='child_interests')
-
-    st.subheader("🔍 Sensory Profile")
-    sensory_options = ["Low","Medium","High"]
-    st.selectbox("Sensitivity Level", sensory_options, index=sensory_options.index(st.session_state.get('sensory_profile','Medium')), key='sensory_profile')
-    st.text_area("Triggers", value=st.session_state.get('sensory_triggers',''), height=60, key='sensory_triggers')
-
-    st.subheader("💬 Communication Profile")
-    comm_options = ["Non-verbal","Basic Words","Full Sentences"]
-    st.selectbox("Communication Level", comm_options, index=comm_options.index(st.session_state.get('comm_level','Basic Words')), key='comm_level')
-    st.text_area("Communication Methods", value=st.session_state.get('comm_methods',''), height=60, key='comm_methods')
-
-    focus_options = ["Cognitive","Self-Help"]
-    current_focus_val = st.session_state.get("child_activity", focus_options[0])
-    if isinstance(current_focus_val,list) and current_focus_val:
-        current_focus_val = current_focus_val[0]
-    st.selectbox("Focus", focus_options, index=focus_options.index(current_focus_val) if current_focus_val in focus_options else 0, key='child_activity')
+# Fragment: editing a field reruns only this function, not the whole page.
+@st.fragment
+def profile_editor():
+    sync_session()
+    with timed("chatbot: profile editor"):
+        st.header("Child Profile")
+        ensure_profile_exists()
+        st.info("You can update the child profile below. Changes are saved automatically.")
 
-# ---------- TAB 2: Generate Worksheet ----------
-with tabs[1]:
-    st.header("Generate Worksheet")
+        st.subheader("👤 Personal Information")
+        st.text_input("Name", key='child_name')
+        st.number_input("Age", min_value=1, max_value=18, key='child_age')
+        st.selectbox("Learning Style", _options('learning_style'), key='learning_style')
+        st.selectbox("Academic Level", _options('academic_level'), key='academic_level')
 
-    raw_focus = st.session_state.get("child_activity", None)
-    if isinstance(raw_focus, list) and raw_focus:
-        focus = raw_focus[0]
-    else:
-        focus = raw_focus
+        st.subheader("📝 Behavioral Information")
+        st.text_area("Behavioral Notes", height=80, key='behavioral_notes')
+
+        st.subheader("🌟 Strengths & Interests")
+        st.text_area("Strengths", height=60, key='child_strengths')
+        st.text_area("Interests", height=60, key='child_interests')
+
+        st.subheader("🔍 Sensory Profile")
+        st.selectbox("Sensitivity Level", _options('sensory_profile'), key='sensory_profile')
+        st.text_area("Triggers", height=60, key='sensory_triggers')
+
+        st.subheader("💬 Communication Profile")
+        st.selectbox("Communication Level", _options('comm_level'), key='comm_level')
+        st.text_area("Communication Methods", height=60, key='comm_methods')
+
+        st.selectbox("Focus", _options('child_activity'), key='child_activity')
 
-    if not focus:
-        st.warning("⚠️ Please go back to the profile tab and select an activity focus.")
+
+# ---------- TAB 2: Generate Worksheet ----------
+def submit_generation(request):
+    """
+    Start a generation job (queued for the worker pool in worker mode) and
+    remember custom topics for near-duplicate lookups. Structured worksheets
+    are one small call drawn locally, so they always run in this process.
+    """
+    st.session_state.pop("semantic_offer", None)
+    owner = st.session_state["teacher_id"]
+    if request.get("structured"):
+        job = runner.submit_structured(
+            request["topic"], st.session_state,
+            want_text=request["text_prompt"] is not None,
+            want_image=request["image_prompt"] is not None,
+        )
+        queue.track(owner, job, request["text_prompt"], request["image_prompt"], profile=st.session_state)
+    elif JOB_QUEUE_MODE == "worker":
+        job = queue.enqueue(
+            owner, request["topic"], request["text_prompt"], request["image_prompt"], profile=st.session_state
+        )
     else:
-        st.subheader(f"Focus: {focus} (Age: {st.session_state.get('child_age','N/A')})")
-        topic_input_key = f"user_topic_input_{focus}"
-        activity_type_for_prompt = None
-
-        # -----------------------------
-        #  SELECT ACTIVITY TYPE
-        # -----------------------------
-        if focus.lower() == "cognitive":
-            subtype = st.radio(
-                "Choose a Cognitive Activity type:",
-                ["Basic Reading (Phonics)", "Shapes (Math)", "Tracing (Writing)", "Other/Custom"],
-                key="cog_radio_type"
-            )
-            subtype_map = {
-                "Basic Reading (Phonics)": "CVC Blending",
-                "Shapes (Math)": "Shape Tracing",
-                "Tracing (Writing)": "Line Tracing"
-            }
-            if subtype in subtype_map:
-                activity_type_for_prompt = subtype_map[subtype]
-            elif subtype == "Other/Custom":
-                topic = st.text_input("Enter the custom lesson topic:", key=topic_input_key)
-                activity_type_for_prompt = topic.strip()
-
-            # For tracing options
-            if subtype == "Tracing (Writing)":
-                tracing_type = st.radio(
-                    "Select Tracing Focus:",
-                    ["Line Tracing", "Alphabet Tracing", "Writing Practice"],
-                    key="tracing_focus"
+        job = runner.submit(
+            request["topic"],
+            text_prompt=request["text_prompt"],
+            image_prompt=request["image_prompt"],
+            stream_text=request["stream_text"],
+            profile=st.session_state,
+            variants=request["variants"],
+        )
+        queue.track(owner, job, request["text_prompt"], request["image_prompt"], profile=st.session_state)
+    st.session_state["generation_job"] = job
+    if request["custom"] and not request.get("structured"):
+        get_semantic_cache().add(request["topic"], request["child_age"], request["text_prompt"], request["image_prompt"])
+
+
+def use_saved_worksheet(offer):
+    """Load the cached worksheet of a similar earlier topic instead of generating."""
+    request, match = offer["request"], offer["match"]
+    get_metrics().count("semantic_accepted_total")
+    submit_generation({
+        **request,
+        "topic": match["topic"],
+        "text_prompt": match["text_prompt"] if request["text_prompt"] else None,
+        "image_prompt": match["image_prompt"] if request["image_prompt"] else None,
+        "variants": 1,
+        "custom": False,
+    })
+
+
+def choose_variant(job, name):
+    runner.choose_variant(job, name)
+    queue.set_image(job.id, job.result(name))
+
+
+def open_recent_worksheet(job_id):
+    st.session_state.pop("semantic_offer", None)
+    st.session_state["generation_job"] = queue.handle(job_id)
+
+
+# Fragment: radios, buttons and job polling rerun only the generator.
+@st.fragment
+def worksheet_generator():
+    sync_session()
+    job_running = False
+    with timed("chatbot: generator"):
+        st.header("Generate Worksheet")
+
+        raw_focus = st.session_state.get("child_activity", None)
+        if isinstance(raw_focus, list) and raw_focus:
+            focus = raw_focus[0]
+        else:
+            focus = raw_focus
+
+        if not focus:
+            st.warning("⚠️ Please go back to the profile tab and select an activity focus.")
+        else:
+            st.subheader(f"Focus: {focus} (Age: {st.session_state.get('child_age','N/A')})")
+            topic_input_key = f"user_topic_input_{focus}"
+            activity_type_for_prompt = None
+            custom_topic = False
+
+            # -----------------------------
+            #  SELECT ACTIVITY TYPE
+            # -----------------------------
+            if focus.lower() == "cognitive":
+                subtype = st.radio(
+                    "Choose a Cognitive Activity type:",
+                    ["Basic Reading (Phonics)", "Shapes (Math)", "Tracing (Writing)", "Other/Custom"],
+                    key="cog_radio_type"
                 )
-                activity_type_for_prompt = tracing_type
-
-        elif focus.lower() == "self-help":
-            subtype = st.radio(
-                "Choose a Self-Help skill:",
-                ["Personal Hygiene", "Daily Routines", "Household Skills", "Other/Custom Skill"],
-                key="self_help_radio_type"
-            )
-            if subtype == "Other/Custom Skill":
-                topic = st.text_input("Enter the custom skill topic:", key=topic_input_key)
-                activity_type_for_prompt = topic.strip()
+                subtype_map = {
+                    "Basic Reading (Phonics)": "CVC Blending",
+                    "Shapes (Math)": "Shape Tracing",
+                    "Tracing (Writing)": "Line Tracing"
+                }
+                if subtype in subtype_map:
+                    activity_type_for_prompt = subtype_map[subtype]
+                elif subtype == "Other/Custom":
+                    topic = st.text_input("Enter the custom lesson topic:", key=topic_input_key)
+                    activity_type_for_prompt = topic.strip()
+                    custom_topic = True
+
+                # For tracing options
+                if subtype == "Tracing (Writing)":
+                    tracing_type = st.radio(
+                        "Select Tracing Focus:",
+                        ["Line Tracing", "Alphabet Tracing", "Writing Practice"],
+                        key="tracing_focus"
+                    )
+                    activity_type_for_prompt = tracing_type
+
+            elif focus.lower() == "self-help":
+                subtype = st.radio(
+                    "Choose a Self-Help skill:",
+                    ["Personal Hygiene", "Daily Routines", "Household Skills", "Other/Custom Skill"],
+                    key="self_help_radio_type"
+                )
+                if subtype == "Other/Custom Skill":
+                    topic = st.text_input("Enter the custom skill topic:", key=topic_input_key)
+                    activity_type_for_prompt = topic.strip()
+                    custom_topic = True
+                else:
+                    activity_type_for_prompt = subtype
+
+            if not activity_type_for_prompt:
+                st.warning("Please enter a custom topic or select an activity type.")
             else:
-                activity_type_for_prompt = subtype
-
-        if not activity_type_for_prompt:
-            st.warning("Please enter a custom topic or select an activity type.")
-
-        # ---------------------------------------------------------
-        #   🔵 BUTTON 1 — GENERATE TEXT ACTIVITY (MODEL A)
-        # ---------------------------------------------------------
-        if st.button("Generate Text Activity"):
-            if activity_type_for_prompt.strip():
-                with st.spinner("Generating activity text..."):
-
-                    text_prompt = f"""
-                    You are an expert SPED teacher.
-                    Create an autism-friendly worksheet activity for a child age {st.session_state.get('child_age','N/A')}.
-                    Topic: {activity_type_for_prompt}
-
-                    Include:
-                    - clear instructions
-                    - 3 to 5 items
-                    - simple, encouraging tone
-                    - very child-friendly language
-                    """
-
-                    try:
-                        text_response = client.chat.completions.create(
-                            model="gpt-4.1-mini",
-                            messages=[{"role": "user", "content": text_prompt}]
-                        )
+                report = prompt_token_report(activity_type_for_prompt, st.session_state)
+                st.caption(
+                    f"Prompt size: worksheet {report['sheet']['after']} tokens (from {report['sheet']['before']}), "
+                    "no image-model call"
+                    if st.session_state["structured_mode"] else
+                    f"Prompt size: text {report['text']['after']} tokens (from {report['text']['before']}) · "
+                    f"image {report['image']['after']} tokens (from {report['image']['before']})"
+                )
 
+            # ---------------------------------------------------------
+            #   🔵 GENERATE BUTTONS — TEXT (MODEL A) / IMAGE (MODEL B)
+            # ---------------------------------------------------------
+            # Each button submits a background job; text and image run
+            # concurrently when both are requested.
+            btn_col1, btn_col2, btn_col3 = st.columns(3)
+            with btn_col1:
+                want_text = st.button("Generate Text Activity")
+            with btn_col2:
+                want_image = st.button("Generate Activity Image")
+            with btn_col3:
+                want_both = st.button("Generate Both")
+
+            # Title, instruction, items and word list from one JSON-schema call,
+            # shown as the text and drawn locally as the worksheet image.
+            structured = st.toggle(
+                "Quick worksheet (one structured call, drawn locally)", key="structured_mode",
+                help="Faster and cheaper; the same worksheet is reused for children of the same age."
+            )
+            stream_text = st.checkbox("Show text as it is written", key="stream_text", disabled=structured)
+            # Several images per click, generated concurrently; the teacher keeps one.
+            variant_count = st.select_slider(
+                "Image variants per click", options=[1, 2, 3, 4, 5], key="variant_count",
+                disabled=JOB_QUEUE_MODE == "worker" or structured,
+                help="Queued jobs produce one image." if JOB_QUEUE_MODE == "worker" else None
+            )
+            st.session_state["prefetch_enabled"] = st.checkbox(
+                "Prepare likely worksheets in the background",
+                value=st.session_state.get("prefetch_enabled", False)
+            )
+            if st.session_state["prefetch_enabled"] and st.session_state.get("child_age"):
+                prefetcher.warm(focus, st.session_state)
+
+            if want_text or want_image or want_both:
+                if activity_type_for_prompt and activity_type_for_prompt.strip():
+                    prefetcher.record_click(focus, activity_type_for_prompt)
+                    sheet_prompt = build_sheet_prompt(activity_type_for_prompt, st.session_state) if structured else None
+                    request = {
+                        "topic": activity_type_for_prompt,
+                        "text_prompt": (sheet_prompt or build_text_prompt(activity_type_for_prompt, st.session_state)) if (want_text or want_both) else None,
+                        "image_prompt": (sheet_prompt or build_image_prompt(activity_type_for_prompt, st.session_state)) if (want_image or want_both) else None,
+                        "stream_text": stream_text and not structured,
+                        "variants": 1 if structured else variant_count,
+                        "custom": custom_topic,
+                        "child_age": st.session_state.get("child_age"),
+                        "structured": structured,
+                    }
+                    # A custom topic close to one generated before (e.g. "tooth brushing
+                    # routine" after "brushing teeth") is offered from the cache first.
+                    match = get_semantic_cache().lookup(
+                        activity_type_for_prompt, request["child_age"],
+                        need_text=request["text_prompt"] is not None,
+                        need_image=request["image_prompt"] is not None,
+                    ) if custom_topic and not structured else None
+                    if match is not None:
+                        st.session_state["semantic_offer"] = {"request": request, "match": match}
+                    else:
+                        submit_generation(request)
+                else:
+                    st.warning("Please select or enter an activity topic before generating.")
+
+            offer = st.session_state.get("semantic_offer")
+            if offer is not None and offer["request"]["topic"] == activity_type_for_prompt:
+                st.info(
+                    f"💡 A saved worksheet for **{offer['match']['topic']}** is a "
+                    f"{offer['match']['similarity']:.0%} match for this topic. "
+                    "Use it right away, or generate a new one."
+                )
+                offer_col1, offer_col2 = st.columns(2)
+                with offer_col1:
+                    st.button("Use saved worksheet", key="semantic_use", on_click=use_saved_worksheet, args=(offer,))
+                with offer_col2:
+                    st.button("Generate new anyway", key="semantic_new", on_click=submit_generation, args=(offer["request"],))
+
+            # ---------------------------------------------------------
+            #   JOB RESULTS (polled across reruns)
+            # ---------------------------------------------------------
+            job = st.session_state.get("generation_job")
+            if job is not None:
+                # Checked before the parts are drawn: a job that finishes while they
+                # are still shown as running gets one more rerun to show its result.
+                job_running = not job.done()
+                # Queued jobs (utils.job_queue) may still be waiting for a worker.
+                waiting = hasattr(job, "state") and job.state() == "queued"
+                if "text" in job.parts:
+                    text_stream = job.streams.get("text")
+                    if text_stream is not None and job.status("text") != "failed":
+                        # Render tokens as they arrive; the image part keeps running meanwhile.
                         st.subheader("📘 Generated Activity Instructions")
-                        st.write(text_response.choices[0].message.content)
-
-                    except Exception as e:
-                        st.error(f"Error generating activity text: {e}")
-            else:
-                st.warning("Please select or enter an activity topic before generating.")
-
-        # ---------------------------------------------------------
-        #   🔵 BUTTON 2 — GENERATE IMAGE WORKSHEET (MODEL B)
-        # ---------------------------------------------------------
-        if st.button("Generate Activity Image"):
-            if activity_type_for_prompt and activity_type_for_prompt.strip():
-                with st.spinner("Generating worksheet image..."):
-                    full_prompt = build_worksheet_prompt(activity_type_for_prompt)
-                    dall_e_prompt = f"Black & white sensory-friendly worksheet for a child with ASD. {full_prompt}"
-
-                    try:
-                        image_response = client.images.generate(
-                            model="dall-e-3",
-                            prompt=dall_e_prompt,
-                            size="1024x1024",
-                            quality="standard",
-                            n=1,
-                            response_format="b64_json"
-                        )
-                        image_data = base64.b64decode(image_response.data[0].b64_json)
+                        st.write_stream(text_stream.iter_chunks())
+                        job.parts["text"].exception()  # wait for the cache write to settle
+                        metrics = text_stream.metrics()
+                        if job.status("text") == "done" and metrics["ttft"] is not None:
+                            st.caption(
+                                f"First words after {metrics['ttft']:.1f}s · "
+                                f"finished in {metrics['total']:.1f}s · "
+                                f"{metrics['tokens'] or '?'} tokens"
+                            )
 
+                    status = job.status("text")
+                    if status == "running" and waiting:
+                        st.info(f"⏳ Waiting for a free worker... ({job.elapsed():.0f}s)")
+                    elif status == "running":
+                        st.info(f"⏳ Generating activity text... ({job.elapsed():.0f}s)")
+                    elif status == "failed":
+                        st.error(f"Error generating activity text: {describe_error(job.error('text'))}")
+                    elif text_stream is None:
+                        st.subheader("📘 Generated Activity Instructions")
+                        st.write(job.result("text"))
+
+                if job.variants and "image" not in job.parts:
+                    st.subheader("🖼️ Pick a worksheet")
+                    st.caption("Each variant appears as soon as it is ready. The others stay saved for similar requests.")
+                    columns = st.columns(len(job.variants))
+                    for column, name in zip(columns, job.variants):
+                        with column:
+                            status = job.status(name)
+                            if status == "running":
+                                st.info(f"⏳ Drawing variant {job.variants[name]}... ({job.elapsed():.0f}s)")
+                            elif status == "failed":
+                                st.error(describe_error(job.error(name)))
+                            elif not artifacts.touch(job.result(name)):
+                                st.warning(MISSING_IMAGE)
+                            else:
+                                st.image(
+                                    artifacts.variant_path(job.result(name), "preview"),
+                                    caption=f"Variant {job.variants[name]}",
+                                    width="stretch"
+                                )
+                                st.button(
+                                    "Use this one",
+                                    key=f"pick_{job.id}_{name}",
+                                    on_click=choose_variant,
+                                    args=(job, name)
+                                )
+
+                if "image" in job.parts:
+                    status = job.status("image")
+                    if status == "running" and waiting and "text" not in job.parts:
+                        st.info(f"⏳ Waiting for a free worker... ({job.elapsed():.0f}s)")
+                    elif status == "running":
+                        st.info(f"⏳ Generating worksheet image... ({job.elapsed():.0f}s)")
+                    elif status == "failed":
+                        st.error(f"Error during image generation: {describe_error(job.error('image'))}")
+                    elif not artifacts.touch(job.result("image")):
+                        # Pruned from the size-capped store since it was made.
+                        st.warning(MISSING_IMAGE)
+                    else:
+                        # Only the artifact ID lives in the session; variants are rendered
+                        # once on disk and downloads are produced when clicked.
+                        artifact_id = job.result("image")
+                        file_stem = job.topic.replace(' ','_')
                         col1, col2 = st.columns(2)
                         with col1:
                             st.image(
-                                image_data,
-                                caption=f"Generated: {activity_type_for_prompt}",
-                                use_container_width=True
+                                artifacts.variant_path(artifact_id, "preview"),
+                                caption=f"Generated: {job.topic}",
+                                width="stretch"
                             )
                         with col2:
                             st.download_button(
                                 label="📥 Download Image",
-                                data=image_data,
-                                file_name=f"{activity_type_for_prompt.replace(' ','_')}.png",
+                                data=functools.partial(artifacts.variant, artifact_id, "print"),
+                                file_name=f"{file_stem}.png",
                                 mime="image/png"
                             )
-                    except Exception as e:
-                        st.error(f"Error during image generation: {e}")
-            else:
-                st.warning("Please specify an activity topic before generating.")
+                            st.download_button(
+                                label="🖨️ Download Printable PDF",
+                                data=functools.partial(artifacts.variant, artifact_id, "pdf"),
+                                file_name=f"{file_stem}.pdf",
+                                mime="application/pdf"
+                            )
 
-        # ---------------------------------------------------------
-        # BACK BUTTON
-        # ---------------------------------------------------------
-        if st.button("⬅️ Back to Home", key="back_to_home_btn"):
-            st.switch_page("ausome_main")
+            # ---------------------------------------------------------
+            #   MY RECENT WORKSHEETS
+            # ---------------------------------------------------------
+            recent = queue.recent(st.session_state["teacher_id"])
+            if recent:
+                with st.expander(f"🗂️ My recent worksheets ({len(recent)})"):
+                    status_labels = {"queued": "⏳ waiting", "running": "⏳ generating", "done": "✅ ready", "failed": "⚠️ failed"}
+                    for row in recent:
+                        parts = " + ".join(
+                            part for part, prompt in (("text", row["text_prompt"]), ("image", row["image_prompt"])) if prompt
+                        )
+                        row_col1, row_col2 = st.columns([4, 1])
+                        row_col1.write(
+                            f"**{row['topic']}** · {parts} · {status_labels.get(row['status'], row['status'])} · "
+                            f"{time.strftime('%b %d %H:%M', time.localtime(row['created']))}"
+                        )
+                        row_col2.button(
+                            "Open", key=f"recent_{row['id']}",
+                            on_click=open_recent_worksheet, args=(row["id"],),
+                            disabled=row["status"] == "failed"
+                        )
+
+            cache_stats = cache.stats()
+            pool_stats = runner.inflight.stats()
+            st.caption(
+                f"Worksheet cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['entries']} saved worksheets) · "
+                f"shared requests: {pool_stats['coalesced']} joined, {pool_stats['in_flight']} in progress"
+            )
+
+            # ---------------------------------------------------------
+            # BACK BUTTON
+            # ---------------------------------------------------------
+            if st.button("⬅️ Back to Home", key="back_to_home_btn"):
+                st.switch_page("ausome_main")
+
+    # ----------------------------
+    # POLL RUNNING JOBS
+    # ----------------------------
+    # Rerun until the background job finishes; the handle lives in
+    # session_state, so results are picked up even after an interrupted
+    # rerun. Only the fragment reruns, except on a full page run (e.g. after
+    # switching tabs), where Streamlit does not allow a fragment-scoped rerun.
+    pending_job = st.session_state.get("generation_job")
+    if job_running or (pending_job is not None and not pending_job.done()):
+        time.sleep(JOB_POLL_SECONDS)
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            st.rerun()
+
+
+if tabs[0].open:
+    with tabs[0]:
+        profile_editor()
+
+if tabs[1].open:
+    with tabs[1]:
+        worksheet_generator()
 
 # ---------- TAB 3: About ----------
-with tabs[2]:
-    st.header("About AI Ausome Assistant")
-    st.info("""
-    This app allows teachers and parents to generate **customized worksheets** for children with ASD.
+if tabs[2].open:
+    with tabs[2]:
+        st.header("About AI Ausome Assistant")
+        st.info("""
+        This app allows teachers and parents to generate **customized worksheets** for children with ASD.
     
-    Features:
-    - Cognitive, Language, and Self-Help worksheets
-    - AI-generated images for worksheets
-    - Downloadable PNG worksheets
-    - Child-friendly pastel design
+        Features:
+        - Cognitive, Language, and Self-Help worksheets
+        - AI-generated images for custom worksheets
+        - Instant, print-ready tracing and phonics sheets
+        - Downloadable PNG and printable PDF worksheets
+        - Child-friendly pastel design
     
-    2025 Uplift Project Presentation
-    """)
+        2025 Uplift Project Presentation
+        """)
+
+# ----------------------------
+# RERUN TIMING
+# ----------------------------
+timings = get_rerun_timings()
+timing_parts = []
+for name in ["chatbot: full page", "chatbot: profile editor", "chatbot: generator"]:
+    summary = timings.summary(name)
+    if summary is not None:
+        timing_parts.append(f"{name.split(': ')[1]} {summary['p50_ms']:.0f} ms p50 ({summary['last_ms']:.0f} ms last)")
+if timing_parts:
+    st.caption("⏱️ Script time per rerun: " + " · ".join(timing_parts))
+timings.record("chatbot: full page", time.perf_counter() - RERUN_STARTED)
+
+# Also save what this run changed (e.g. a job started by a button), not just the previous run.
+sync_session()
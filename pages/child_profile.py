@@ -1,62 +1,156 @@
 # child_profile.py
 import streamlit as st
+import hashlib
+import re
+import secrets
 from datetime import date
+from utils.profile import PROFILE_DEFAULTS
+from utils.profile_store import AGE_BANDS, STORED_FIELDS
+from utils.resources import get_job_queue, get_profile_store, get_session_store
+
+# Identifying, contact, medical and behavioural details are never written
+# to the shared state backend; a restored session reloads them from the
+# saved profile.
+PRIVATE_FIELDS = (
+    "child_name", "child_birthday", "parent_name", "parent_contact",
+    "diagnosis", "diagnosis_date", "diagnosed_by", "current_therapies",
+    "allergies", "emergency_contact", "safety_concerns", "eating_notes",
+    "behavior_triggers", "behavior_management", "behavioral_notes",
+)
+# Session keys kept in the shared state backend (utils/state.py), so a
+# session that reconnects to another replica, or to a restarted one,
+# carries on with the same child, focus and generator choices.
+SESSION_KEYS = tuple(key for key in STORED_FIELDS if key not in PRIVATE_FIELDS) + (
+    "child_activity", "profile_id", "prefetch_enabled", "stream_text", "structured_mode",
+    "cog_radio_type", "tracing_focus", "self_help_radio_type", "variant_count",
+)
+# ?teacher= values must look like new_session_token(): names or short IDs are replaced.
+SESSION_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_-]{32}")
+
+
+def new_session_token():
+    return secrets.token_urlsafe(24)
+
+
+def session_id():
+    """
+    The teacher's session ID. It also owns the teacher's recent worksheets,
+    so they are still listed after the tab is closed and the page reopened.
+    With st.login configured it is derived from the signed-in account;
+    otherwise it is a random token kept in the URL (?teacher=...), so only
+    the teacher's own bookmark reopens the session.
+    """
+    account = (st.user.get("sub") or st.user.get("email")) if st.user.get("is_logged_in") else None
+    if account:
+        st.session_state["teacher_id"] = "user-" + hashlib.sha256(str(account).encode("utf-8")).hexdigest()[:32]
+        return st.session_state["teacher_id"]
+    token = st.query_params.get("teacher", "")
+    if not SESSION_TOKEN_PATTERN.fullmatch(token):
+        token = st.session_state.get("teacher_id", "")
+        if not SESSION_TOKEN_PATTERN.fullmatch(token):
+            token = new_session_token()
+        st.query_params["teacher"] = token
+    st.session_state["teacher_id"] = token
+    return token
+
+
+def sync_session():
+    """
+    Restore the session from the state backend on its first run in this
+    process, then save what changed since the last run. Call it before any
+    widget is created (and at the top of fragments, which rerun alone).
+    """
+    sid = session_id()
+    store = get_session_store()
+    if st.session_state.get("restored_session") != sid:
+        snapshot = store.load(sid) or {}
+        fields = snapshot.get("fields", {})
+        if fields.get("profile_id") and not st.session_state.get("profile_id"):
+            # Private details come from the saved profile; unsaved edits to them stay in the old session.
+            load_profile_into_session(fields["profile_id"])
+        for key, value in fields.items():
+            if key in SESSION_KEYS:
+                st.session_state[key] = value
+        if snapshot.get("job_id") and "generation_job" not in st.session_state:
+            # Polled from the job queue / published status, wherever it ran.
+            job = get_job_queue().handle(snapshot["job_id"])
+            if job is not None:
+                st.session_state["generation_job"] = job
+        st.session_state["restored_session"] = sid
+    job = st.session_state.get("generation_job")
+    store.save(sid, {
+        "fields": {key: st.session_state[key] for key in SESSION_KEYS if key in st.session_state},
+        "job_id": job.id if job is not None else None,
+    })
+
 
 def ensure_session_state():
     """Ensure all keys exist in session_state to avoid KeyErrors."""
-    defaults = {
-        # Basic Info
-        "child_name": "",
-        "child_age": "",
-        "child_birthday": "",
-        "child_gender": "",
-        "parent_name": "",
-        "parent_contact": "",
-
-        # Diagnosis
-        "diagnosis": "",
-        "diagnosis_date": "",
-        "diagnosed_by": "",
-        "current_therapies": [],
-
-        # Communication
-        "communication_method": "",
-        "expressive_level": "",
-        "receptive_level": "",
-        "communication_challenges": [],
-
-        # Sensory
-        "sensory_sensitivities": [],
-        "sensory_needs": [],
-        "calming_strategies": [],
-
-        # Strengths & Interests
-        "child_strengths": "",
-        "child_interests": "",
-
-        # Behavior
-        "behavior_triggers": "",
-        "behavior_management": "",
-
-        # Learning
-        "learning_style": "",
-        "academic_focus": "",
-
-        # Routines
-        "routine_morning": "",
-        "routine_school": "",
-        "routine_bedtime": "",
-        "eating_notes": "",
-
-        # Safety
-        "allergies": "",
-        "emergency_contact": "",
-        "safety_concerns": "",
-    }
-
-    for key, value in defaults.items():
+    for key, value in PROFILE_DEFAULTS.items():
         if key not in st.session_state:
-            st.session_state[key] = value
+            st.session_state[key] = list(value) if isinstance(value, list) else value
+
+
+def _profile_snapshot():
+    """Copy of the stored fields as they are now, used to find what changed on save."""
+    snapshot = {}
+    for key in STORED_FIELDS:
+        value = st.session_state.get(key, PROFILE_DEFAULTS.get(key, ""))
+        snapshot[key] = list(value) if isinstance(value, list) else value
+    return snapshot
+
+
+def load_profile_into_session(profile_id):
+    """Copy one of the teacher's saved profiles into session_state (only loaded when chosen)."""
+    profile = get_profile_store().load(profile_id, session_id())
+    if profile is None:
+        return False
+    for key, value in profile.items():
+        st.session_state[key] = value
+    st.session_state["profile_id"] = profile_id
+    st.session_state["saved_profile"] = _profile_snapshot()
+    return True
+
+
+def start_new_profile():
+    for key, value in PROFILE_DEFAULTS.items():
+        st.session_state[key] = list(value) if isinstance(value, list) else value
+    st.session_state["profile_id"] = None
+    st.session_state["saved_profile"] = None
+
+
+def saved_profile_picker():
+    """Search the teacher's saved profiles by name / age band and load one into the form."""
+    store = get_profile_store()
+    with st.expander("📂 Saved profiles"):
+        col1, col2 = st.columns(2)
+        with col1:
+            search = st.text_input("Search by name", key="profile_search")
+        with col2:
+            band = st.selectbox("Age band", ["Any"] + [label for _, _, label in AGE_BANDS], key="profile_age_band")
+        matches = store.find(session_id(), name=search, age_band=None if band == "Any" else band)
+        if matches:
+            labels = {
+                match["id"]: f"{match['child_name']} (age {match['child_age'] or '?'})"
+                + (f" - {match['diagnosis']}" if match["diagnosis"] else "")
+                for match in matches
+            }
+            choice = st.selectbox("Profile", list(labels), format_func=labels.get, key="profile_choice")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Load Profile"):
+                    load_profile_into_session(choice)
+                    st.rerun()
+            with col2:
+                if st.button("Start New Profile"):
+                    start_new_profile()
+                    st.rerun()
+        else:
+            st.caption("No saved profiles match.")
+
+
+def _option_index(options, value):
+    return options.index(value) if value in options else 0
 
 
 def child_profile(show_title=True):
@@ -66,6 +160,8 @@ def child_profile(show_title=True):
         st.title("🧩 Child Profile")
         st.markdown("Please provide or update the child's information below.")
 
+    saved_profile_picker()
+
     with st.form("child_profile_form"):
         st.subheader("👶 Basic Information")
         st.session_state.child_name = st.text_input(
@@ -82,8 +178,9 @@ def child_profile(show_title=True):
                 else date(2017, 1, 1)
             )
         )
+        gender_options = ["Male", "Female", "Prefer not to say"]
         st.session_state.child_gender = st.selectbox(
-            "Gender", ["Male", "Female", "Prefer not to say"], index=0
+            "Gender", gender_options, index=_option_index(gender_options, st.session_state.child_gender)
         )
         st.session_state.parent_name = st.text_input(
             "Parent/Guardian Name", st.session_state.parent_name
@@ -116,10 +213,11 @@ def child_profile(show_title=True):
 
         st.markdown("---")
         st.subheader("🗣 Communication Profile")
+        communication_options = ["Verbal", "Gestures", "AAC Device", "PECS", "Mixed"]
         st.session_state.communication_method = st.selectbox(
             "Primary Communication Method",
-            ["Verbal", "Gestures", "AAC Device", "PECS", "Mixed"],
-            index=0
+            communication_options,
+            index=_option_index(communication_options, st.session_state.communication_method)
         )
         st.session_state.expressive_level = st.text_input(
             "Expressive Language Level", st.session_state.expressive_level
@@ -171,8 +269,10 @@ def child_profile(show_title=True):
 
         st.markdown("---")
         st.subheader("📘 Learning Profile")
+        learning_options = ["Visual", "Auditory", "Kinesthetic", "Multi-sensory"]
         st.session_state.learning_style = st.selectbox(
-            "Preferred Learning Style", ["Visual", "Auditory", "Kinesthetic", "Multi-sensory"]
+            "Preferred Learning Style", learning_options,
+            index=_option_index(learning_options, st.session_state.learning_style)
         )
         st.session_state.academic_focus = st.text_area(
             "Academic Focus / Areas Needing Support", st.session_state.academic_focus
@@ -208,7 +308,15 @@ def child_profile(show_title=True):
         submitted = st.form_submit_button("Save Profile")
 
         if submitted:
-            st.success("Child profile updated successfully!")
+            profile_id, changed = get_profile_store().save(
+                st.session_state,
+                session_id(),
+                profile_id=st.session_state.get("profile_id"),
+                previous=st.session_state.get("saved_profile"),
+            )
+            st.session_state["profile_id"] = profile_id
+            st.session_state["saved_profile"] = _profile_snapshot()
+            st.success(f"Child profile saved successfully! ({len(changed)} fields updated)")
             
 def ensure_profile_exists():
     """
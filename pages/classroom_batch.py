@@ -0,0 +1,105 @@
+import streamlit as st
+import time
+from utils.background import apply_background
+from utils.batch import BATCH_CONCURRENCY, BatchJob, load_roster
+from utils.resources import get_job_runner, load_environment
+
+# ----------------------------
+# PAGE CONFIG
+# ----------------------------
+st.set_page_config(
+    page_title="AI Ausome Assistant",
+    page_icon="💙",
+    layout="wide"
+)
+
+# ----------------------------
+# APPLY BACKGROUND CSS
+# ----------------------------
+apply_background()
+
+# ---------------------------
+# OPENAI JOB RUNNER
+# ----------------------------
+load_environment()
+runner = get_job_runner()
+BATCH_POLL_SECONDS = 1.0
+
+ACTIVITY_OPTIONS = [
+    "CVC Blending",
+    "Shape Tracing",
+    "Line Tracing",
+    "Alphabet Tracing",
+    "Writing Practice",
+    "Personal Hygiene",
+    "Daily Routines",
+    "Household Skills",
+    "Other/Custom",
+]
+
+# ----------------------------
+# PAGE HEADER
+# ----------------------------
+st.markdown("<h1 style='text-align:center;'>🏫 Classroom Worksheets</h1>", unsafe_allow_html=True)
+st.markdown("<p style='text-align:center;'>Generate one worksheet for every child on a roster</p>", unsafe_allow_html=True)
+
+st.info(
+    "Upload a CSV or JSON roster. Columns use the child profile field names "
+    "(child_name, child_age, learning_style, child_interests, ...). "
+    "List fields such as current_therapies can be separated with ';'."
+)
+
+roster_file = st.file_uploader("Roster (CSV or JSON)", type=["csv", "json"])
+profiles = []
+if roster_file is not None:
+    try:
+        profiles = load_roster(roster_file.getvalue(), roster_file.name)
+        st.success(f"Loaded {len(profiles)} children.")
+    except Exception as e:
+        st.error(f"Could not read roster: {e}")
+
+activity = st.selectbox("Activity type", ACTIVITY_OPTIONS)
+if activity == "Other/Custom":
+    activity = st.text_input("Enter the custom lesson topic:", key="batch_custom_topic").strip()
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    include_text = st.checkbox("Text activity", value=True)
+with col2:
+    include_image = st.checkbox("Worksheet image", value=True)
+with col3:
+    concurrency = st.slider("Parallel requests", 1, 8, BATCH_CONCURRENCY)
+
+if st.button("Generate for whole class"):
+    if not profiles:
+        st.warning("Please upload a roster first.")
+    elif not activity:
+        st.warning("Please select or enter an activity topic before generating.")
+    elif not (include_text or include_image):
+        st.warning("Please choose text, image, or both.")
+    else:
+        batch = BatchJob(profiles, activity, include_text, include_image, concurrency)
+        runner.submit_batch(batch)
+        st.session_state["batch_job"] = batch
+
+# ----------------------------
+# BATCH PROGRESS / DOWNLOAD
+# ----------------------------
+batch = st.session_state.get("batch_job")
+if batch is not None:
+    st.progress(
+        batch.completed / batch.total if batch.total else 1.0,
+        text=f"{batch.completed} of {batch.total} unique worksheets for {len(batch.profiles)} children"
+    )
+    if batch.done():
+        if batch.errors:
+            st.warning(f"{len(batch.errors)} worksheets failed; see errors.txt in the ZIP.")
+        st.download_button(
+            label="📥 Download Class ZIP",
+            data=batch.to_zip,  # built when clicked, not on every rerun
+            file_name=f"{batch.activity_type.replace(' ','_')}_class.zip",
+            mime="application/zip"
+        )
+    else:
+        time.sleep(BATCH_POLL_SECONDS)
+        st.rerun()
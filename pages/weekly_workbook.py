@@ -0,0 +1,114 @@
+import streamlit as st
+import time
+from pages.child_profile import ensure_profile_exists, ensure_session_state, saved_profile_picker, sync_session
+from utils.background import apply_background
+from utils.resources import get_job_runner, load_environment
+from utils.workbook import MAX_PAGES, WORKBOOK_CONCURRENCY, WorkbookJob
+
+# ----------------------------
+# PAGE CONFIG
+# ----------------------------
+st.set_page_config(
+    page_title="AI Ausome Assistant",
+    page_icon="💙",
+    layout="wide"
+)
+
+# ----------------------------
+# APPLY BACKGROUND CSS
+# ----------------------------
+apply_background()
+
+# ---------------------------
+# OPENAI JOB RUNNER
+# ----------------------------
+load_environment()
+runner = get_job_runner()
+WORKBOOK_POLL_SECONDS = 1.0
+
+# Same activities as the generator's Cognitive and Self-Help choices.
+WORKBOOK_ACTIVITIES = {
+    "Cognitive": ["CVC Blending", "Shape Tracing", "Line Tracing", "Alphabet Tracing", "Writing Practice"],
+    "Self-Help": ["Personal Hygiene", "Daily Routines", "Household Skills"],
+}
+
+# ----------------------------
+# PAGE HEADER
+# ----------------------------
+st.markdown("<h1 style='text-align:center;'>📚 Weekly Workbook</h1>", unsafe_allow_html=True)
+st.markdown("<p style='text-align:center;'>A week's packet of worksheets for one child, in one PDF</p>", unsafe_allow_html=True)
+
+sync_session()
+ensure_session_state()
+saved_profile_picker()
+if not ensure_profile_exists():
+    st.warning("Please fill in or load a child profile first.")
+    st.stop()
+st.info(f"Workbook for **{st.session_state['child_name']}** (age {st.session_state['child_age']}).")
+
+# ----------------------------
+# PLAN
+# ----------------------------
+plan = []
+for focus, activities in WORKBOOK_ACTIVITIES.items():
+    st.subheader(focus)
+    columns = st.columns(len(activities))
+    for column, activity in zip(columns, activities):
+        with column:
+            plan.append((activity, st.number_input(activity, min_value=0, max_value=5, value=0, key=f"workbook_{activity}")))
+
+custom_col1, custom_col2 = st.columns([3, 1])
+with custom_col1:
+    custom_topic = st.text_input("Custom topic (optional):", key="workbook_custom_topic").strip()
+with custom_col2:
+    custom_count = st.number_input("Pages", min_value=0, max_value=5, value=0, key="workbook_custom_count")
+if custom_topic:
+    plan.append((custom_topic, custom_count))
+
+total_pages = sum(count for _, count in plan)
+concurrency = st.slider("Parallel requests", 1, 8, WORKBOOK_CONCURRENCY)
+st.caption(f"{total_pages} pages planned (up to {MAX_PAGES}).")
+if total_pages > MAX_PAGES:
+    st.warning(f"A workbook can have at most {MAX_PAGES} pages. Please remove {total_pages - MAX_PAGES}.")
+
+if st.button("Build workbook", disabled=total_pages > MAX_PAGES):
+    if not total_pages:
+        st.warning("Please choose at least one page.")
+    else:
+        # The same plan for the same child resumes: finished pages are not generated again.
+        workbook = WorkbookJob(st.session_state, plan, concurrency)
+        runner.submit_workbook(workbook)
+        st.session_state["workbook_job"] = workbook
+
+# ----------------------------
+# WORKBOOK PROGRESS / DOWNLOAD
+# ----------------------------
+workbook = st.session_state.get("workbook_job")
+if workbook is not None:
+    st.progress(
+        workbook.completed / workbook.total if workbook.total else 1.0,
+        text=f"{workbook.completed} of {workbook.total} pages ready · {workbook.pages_written} written to the PDF"
+    )
+    if workbook.resumed:
+        st.caption(f"Resumed: {workbook.resumed} pages were kept from the last run.")
+    if workbook.done():
+        if workbook.errors:
+            st.warning(
+                f"{len(workbook.errors)} pages failed and were left out. "
+                "Click Build workbook again to retry only those pages."
+            )
+            for page in workbook.errors:
+                st.caption(f"{page['activity']} (page {page['copy']}): {page['error']}")
+        try:
+            with open(workbook.pdf_path, "rb") as f:
+                st.download_button(
+                    label="📥 Download Workbook PDF",
+                    data=f,
+                    file_name=f"{workbook.profile.child_name.replace(' ', '_')}_workbook.pdf",
+                    mime="application/pdf"
+                )
+        except FileNotFoundError:
+            st.error("The workbook PDF could not be written. Please build it again.")
+    else:
+        time.sleep(WORKBOOK_POLL_SECONDS)
+        st.rerun()
@@ -0,0 +1,16 @@
+# tests/conftest.py
+# The utils modules read their settings (data, cache and artifact
+# directories, backend) at import time, so point them at a throwaway
+# directory before any test imports them.
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="ausome-tests-")
+os.environ.update({
+    "AUSOME_BACKEND": "fake",
+    "AUSOME_CACHE_DIR": os.path.join(_TMP, "cache"),
+    "AUSOME_DATA_DIR": os.path.join(_TMP, "data"),
+    "AUSOME_ARTIFACT_DIR": os.path.join(_TMP, "artifacts"),
+    "AUSOME_STATE_BACKEND": "sqlite",
+    "AUSOME_JOB_QUEUE": "inline",
+})
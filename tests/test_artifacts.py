@@ -0,0 +1,86 @@
+# tests/test_artifacts.py
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from utils.artifacts import ArtifactStore
+
+
+def png(shade, size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (shade, shade, shade)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def age(store, artifact_id, seconds):
+    path = store._path(artifact_id)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def group_files(store, artifact_id):
+    folder = os.path.dirname(store._path(artifact_id))
+    return [name for name in os.listdir(folder) if name.startswith(artifact_id)]
+
+
+def test_put_is_content_addressed_grayscale(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put(png(10))
+    assert store.put(png(10)) == first
+    assert store.put(png(200)) != first
+    with Image.open(io.BytesIO(store.get(first))) as image:
+        assert image.mode == "L"
+
+
+def test_variants_are_rendered_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = store.put(png(10, size=(2000, 1000)))
+    path = store.variant_path(artifact_id, "preview")
+    with Image.open(path) as preview:
+        assert max(preview.size) == 512
+    assert store.variant_path(artifact_id, "preview") == path
+    assert store.variant(artifact_id, "pdf").startswith(b"%PDF")
+    with Image.open(store.variant_path(artifact_id, "print")) as printed:
+        assert printed.mode == "1"
+
+
+def test_missing_artifact(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    assert not store.touch("0" * 32)
+    with pytest.raises(FileNotFoundError):
+        store.variant_path("0" * 32, "preview")
+
+
+def test_prune_drops_least_recently_used_with_variants(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1)
+    old = store.put(png(10))
+    store.variant_path(old, "preview")
+    new = store.put(png(200))
+    age(store, old, 7200)
+    age(store, new, 3600)
+    store.prune(keep_seconds=60)
+    assert group_files(store, old) == []
+    assert not store.exists(new)
+
+
+def test_prune_keeps_recently_used(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1)
+    old = store.put(png(10))
+    shown = store.put(png(200))
+    age(store, old, 7200)
+    age(store, shown, 7200)
+    store.variant_path(shown, "preview")  # shown on a page just now
+    store.prune(keep_seconds=60)
+    assert not store.exists(old)
+    assert store.exists(shown)
+
+
+def test_prune_under_cap_keeps_everything(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    artifact_id = store.put(png(10))
+    age(store, artifact_id, 10 ** 6)
+    store.prune(keep_seconds=0)
+    assert store.exists(artifact_id)
@@ -0,0 +1,141 @@
+# tests/test_batch.py
+import asyncio
+import io
+import threading
+import zipfile
+from pathlib import Path
+
+from utils.backends import FAKE_ACTIVITY_TEXT, FakeAPIError, FakeBackend
+from utils.batch import BatchJob, load_roster
+from utils.cache import WorksheetCache
+
+ROOT = Path(__file__).resolve().parent.parent
+CSV_ROSTER = (
+    "child_name,child_age,sensory_needs\n"
+    "Ana,5,quiet space; visual schedule\n"
+    "Ben,5,quiet space; visual schedule\n"
+    "Cara,7,\n"
+    ",6,\n"
+)
+
+
+class FailingBackend(FakeBackend):
+    async def generate_text(self, prompt, model=None):
+        raise FakeAPIError("Internal server error (fake)", status_code=500)
+
+
+def run(job, backend, tmp_path):
+    return asyncio.run(job.run(backend, WorksheetCache(str(tmp_path / "cache.sqlite3"))))
+
+
+def test_load_roster_csv_and_json():
+    profiles = load_roster(CSV_ROSTER.encode("utf-8-sig"), "class.csv")
+    assert [p["child_name"] for p in profiles] == ["Ana", "Ben", "Cara"]
+    assert profiles[0]["child_age"] == 5
+    assert profiles[0]["sensory_needs"] == ["quiet space", "visual schedule"]
+
+    profiles = load_roster('{"children": [{"child_name": "Dev", "child_age": 4}]}', "class.json")
+    assert profiles[0]["child_name"] == "Dev"
+    assert profiles[0]["current_therapies"] == []
+
+
+def test_identical_prompts_are_generated_once(tmp_path):
+    profiles = load_roster(CSV_ROSTER, "class.csv")
+    # Names are not part of the prompt, so Ana and Ben share one request.
+    job = BatchJob(profiles, "Sensory Activity", include_image=False)
+    backend = FakeBackend(text_latency=0, seed=1)
+    run(job, backend, tmp_path)
+    assert job.done()
+    assert job.completed == job.total == backend.calls["text"]
+    assert job.total < len(profiles)
+
+
+def test_cached_prompts_skip_the_backend(tmp_path):
+    profiles = load_roster(CSV_ROSTER, "class.csv")
+    backend = FakeBackend(text_latency=0, seed=1)
+    run(BatchJob(profiles, "Sensory Activity", include_image=False), backend, tmp_path)
+    calls = backend.calls["text"]
+    run(BatchJob(profiles, "Sensory Activity", include_image=False), backend, tmp_path)
+    assert backend.calls["text"] == calls
+
+
+def test_zip_has_a_folder_per_child(tmp_path):
+    profiles = load_roster(CSV_ROSTER, "class.csv") + load_roster("child_name\nAna\n", "more.csv")
+    job = BatchJob(profiles, "Sensory Activity", include_image=False)
+    run(job, FakeBackend(text_latency=0, seed=1), tmp_path)
+    with zipfile.ZipFile(io.BytesIO(job.to_zip())) as archive:
+        names = sorted(archive.namelist())
+        assert names == [
+            "Ana/Sensory_Activity.txt",
+            "Ana_4/Sensory_Activity.txt",
+            "Ben/Sensory_Activity.txt",
+            "Cara/Sensory_Activity.txt",
+        ]
+        assert archive.read("Ben/Sensory_Activity.txt").decode() == FAKE_ACTIVITY_TEXT
+
+
+def test_failures_are_listed_in_the_zip(tmp_path):
+    job = BatchJob(load_roster(CSV_ROSTER, "class.csv"), "Sensory Activity", include_image=False)
+    run(job, FailingBackend(), tmp_path)
+    assert job.done() and len(job.errors) == job.total
+    with zipfile.ZipFile(io.BytesIO(job.to_zip())) as archive:
+        assert archive.namelist() == ["errors.txt"]
+        errors = archive.read("errors.txt").decode()
+    assert "Ana (text)" in errors and "Cara (text)" in errors
+
+
+def test_renderable_activities_are_drawn_locally(tmp_path):
+    profiles = load_roster(CSV_ROSTER, "class.csv")
+    job = BatchJob(profiles, "Line Tracing", include_text=False)
+    backend = FakeBackend(image_latency=0, seed=1)
+    run(job, backend, tmp_path)
+    assert backend.calls["image"] == 0
+    assert {kind for kind, _ in job.results} == {"render"}
+    with zipfile.ZipFile(io.BytesIO(job.to_zip())) as archive:
+        assert archive.read("Ana/Line_Tracing.png").startswith(b"\x89PNG")
+
+
+class ThreadCheckingCache(WorksheetCache):
+    """Records which threads the (blocking) SQLite lookups ran on."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, *args, **kwargs):
+        self.threads.add(threading.get_ident())
+        return super().get(*args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        self.threads.add(threading.get_ident())
+        return super().put(*args, **kwargs)
+
+
+def test_cache_calls_stay_off_the_event_loop(tmp_path):
+    cache = ThreadCheckingCache(str(tmp_path / "cache.sqlite3"))
+    job = BatchJob(load_roster(CSV_ROSTER, "class.csv"), "Sensory Activity", include_image=False)
+
+    async def run_and_report_loop_thread():
+        await job.run(FakeBackend(text_latency=0, seed=1), cache)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run_and_report_loop_thread())
+    assert cache.threads and loop_thread not in cache.threads
+
+
+def test_finished_batch_zip_is_built_only_when_downloaded(tmp_path):
+    from streamlit.testing.v1 import AppTest
+
+    job = BatchJob(load_roster(CSV_ROSTER, "class.csv"), "Sensory Activity", include_image=False)
+    run(job, FakeBackend(text_latency=0, seed=1), tmp_path)
+    builds = []
+    to_zip = job.to_zip
+    job.to_zip = lambda: builds.append(1) or to_zip()
+
+    at = AppTest.from_file(str(ROOT / "pages" / "classroom_batch.py"), default_timeout=30)
+    at.session_state["batch_job"] = job
+    at.run()
+    at.run()
+    assert not at.exception
+    assert builds == []
+
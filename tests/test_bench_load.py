@@ -0,0 +1,23 @@
+# tests/test_bench_load.py
+# Smoke run of the load harness: one teacher session in one process, so a
+# broken page flow (home page -> profile -> generator -> text and image)
+# fails the suite. Latency and memory thresholds are left to real runs.
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("client", [[], ["--fake-server"]], ids=["fake-backend", "fake-server"])
+def test_one_session_completes(client):
+    command = [
+        sys.executable, "-m", "benchmarks.bench_load", "--sessions", "1", "--processes", "1",
+        "--text-latency", "0.05", "--image-latency", "0.1", "--timeout", "60",
+        "--max-rerun-p95", "0", "--max-click-p95", "0", "--max-session-mb", "0", *client,
+    ]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "errors:      0 (1 of 1 flows completed)" in result.stdout
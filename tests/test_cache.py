@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import time
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import WorksheetCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return WorksheetCache(str(tmp_path / "cache.sqlite3"))
+
+
+def backdate(cache, key, seconds, column="created"):
+    cache._conn.execute(f"UPDATE entries SET {column} = {column} - ? WHERE key = ?", (seconds, key))
+    cache._conn.commit()
+
+
+def test_round_trip_and_counters(cache):
+    assert cache.get("text", "prompt", "model") is None
+    cache.put("text", "prompt", "model", "hello")
+    assert cache.get("text", "prompt", "model") == b"hello"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_whitespace_and_variants_in_keys():
+    assert cache_key("text", "a  b\n c", "m") == cache_key("text", "a b c", "m")
+    assert cache_key("image", "p", "m", "1024x1024") != cache_key("image", "p", "m", "1024x1024", variant=2)
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = WorksheetCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    key = cache.put("text", "prompt", "model", "old")
+    backdate(cache, key, 120)
+    assert not cache.contains("text", "prompt", "model")
+    # The fallback path still serves it while the API is down.
+    assert cache.get_stale("text", "prompt", "model") == b"old"
+    assert cache.get("text", "prompt", "model") is None
+    assert cache.get_stale("text", "prompt", "model") is None
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = WorksheetCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    first = cache.put("text", "first", "model", "aaaa")
+    second = cache.put("text", "second", "model", "bbbb")
+    backdate(cache, first, 10, "accessed")
+    backdate(cache, second, 5, "accessed")
+    cache.get("text", "first", "model")  # first is now the most recently used
+    cache.put("text", "third", "model", "cccc")
+    assert cache.contains("text", "first", "model")
+    assert not cache.contains("text", "second", "model")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_hits_do_not_write(cache):
+    cache.put("text", "prompt", "model", "hello")
+    changes = cache._conn.total_changes
+    for _ in range(10):
+        assert cache.get("text", "prompt", "model") == b"hello"
+    assert cache._conn.total_changes == changes
+
+
+def test_access_times_are_flushed_in_batches(cache, monkeypatch):
+    monkeypatch.setattr(cache_module, "ACCESS_FLUSH_EVERY", 3)
+    keys = [cache.put("text", f"prompt {n}", "model", "x") for n in range(3)]
+    for key in keys:
+        backdate(cache, key, 100, "accessed")
+    before = time.time() - 50
+    cache.get("text", "prompt 0", "model")
+    cache.get("text", "prompt 1", "model")
+    accessed = dict(cache._conn.execute("SELECT key, accessed FROM entries").fetchall())
+    assert all(accessed[key] < before for key in keys)
+    cache.get("text", "prompt 2", "model")
+    accessed = dict(cache._conn.execute("SELECT key, accessed FROM entries").fetchall())
+    assert all(accessed[key] > before for key in keys)
+
+
+def test_images_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    image = bytes(range(256)) * 4
+    WorksheetCache(path).put("image", "prompt", "dall-e-3", image, "1024x1024")
+    reopened = WorksheetCache(path)
+    assert reopened.get("image", "prompt", "dall-e-3", "1024x1024") == image
+    # Kind, model and size are part of the address.
+    assert reopened.get("image", "prompt", "dall-e-3", "1792x1024") is None
+    assert reopened.get("image", "prompt", "dall-e-2", "1024x1024") is None
+    assert reopened.get("text", "prompt", "dall-e-3") is None
+
+
+def test_same_prompt_replaces_the_entry(cache):
+    cache.put("text", "prompt", "model", "first")
+    cache.put("text", "  prompt ", "model", "second")
+    assert cache.get("text", "prompt", "model") == b"second"
+    assert cache.stats()["entries"] == 1
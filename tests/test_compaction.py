@@ -0,0 +1,89 @@
+# tests/test_compaction.py
+import pytest
+
+from utils import compaction
+from utils.compaction import compact_prompt, compaction_report, count_tokens
+from utils.prompts import build_image_prompt, build_text_prompt, prompt_token_report
+
+PROMPT = """
+    You are an expert special education assistant.
+
+    Child Profile:
+    - Age: 7
+    - Learning Style: N/A
+    - Interests:
+
+    Sensory Notes:
+    - Triggers: none
+
+    Rules:
+    - Use simple words
+    - Use   simple words.
+    - Keep it short
+"""
+
+
+def test_empty_fields_headers_and_repeated_rules_are_dropped():
+    text = compact_prompt(PROMPT, "gpt-4.1-mini")
+    assert text.splitlines() == [
+        "You are an expert special education assistant.",
+        "",
+        "Child Profile:",
+        "- Age: 7",
+        "",
+        "Rules:",
+        "- Use simple words",
+        "- Keep it short",
+    ]
+
+
+def test_persona_lines_are_dropped_for_image_models_only():
+    assert "You are an expert" not in compact_prompt(PROMPT, "dall-e-3")
+    assert "You are an expert" in compact_prompt(PROMPT, "gpt-4.1-mini")
+
+
+def test_nested_lines_keep_their_empty_introducer():
+    prompt = "Grid:\n- Each cell should contain:\n    - one word\n    - one picture"
+    assert "- Each cell should contain:" in compact_prompt(prompt, "gpt-4.1-mini")
+
+
+@pytest.mark.parametrize("model", ["gpt-4.1-mini", "dall-e-3"])
+def test_long_profile_values_are_shortened_to_the_budget(model):
+    notes = " ".join(f"note{n}" for n in range(3000))
+    prompt = f"Child Profile:\n- Age: 7\n- Behavioral Notes: {notes}\n\nRules:\n- Use simple words"
+    text = compact_prompt(prompt, model)
+    assert count_tokens(text, model) <= compaction.TOKEN_BUDGETS[model]
+    # The longest value is shortened; the rest of the prompt survives.
+    assert "- Age: 7" in text and "- Use simple words" in text
+    assert "- Behavioral Notes: note0 note1" in text and "…" in text
+
+
+def test_prompts_without_values_to_shorten_are_truncated():
+    prompt = "word " * 5000
+    assert count_tokens(compact_prompt(prompt, "gpt-4.1-mini"), "gpt-4.1-mini") <= 1500
+
+
+def test_image_prompts_fit_the_character_cap(monkeypatch):
+    monkeypatch.setitem(compaction.TOKEN_BUDGETS, "dall-e-3", 10 ** 6)
+    compaction._compact.cache_clear()
+    text = compact_prompt("word " * 2000, "dall-e-3")
+    compaction._compact.cache_clear()
+    assert len(text) <= compaction.MAX_PROMPT_CHARS["dall-e-3"]
+
+
+def test_disabled_compaction_returns_the_prompt(monkeypatch):
+    monkeypatch.setattr(compaction, "COMPACTION_ENABLED", False)
+    assert compact_prompt(PROMPT, "gpt-4.1-mini") == PROMPT
+
+
+def test_report_counts_saved_tokens():
+    report = compaction_report(PROMPT, "gpt-4.1-mini")
+    assert report["saved"] == report["before"] - report["after"] > 0
+
+
+def test_built_prompts_fit_their_budgets():
+    profile = {"child_name": "Sam", "child_age": 7, "behavioral_notes": "gets tired " * 600, "child_interests": "trains"}
+    assert count_tokens(build_image_prompt("Brushing Teeth", profile), "dall-e-3") <= 700
+    assert count_tokens(build_text_prompt("Brushing Teeth", profile), "gpt-4.1-mini") <= 1500
+    report = prompt_token_report("Brushing Teeth", profile)
+    assert report["image"]["after"] <= 700 < report["image"]["before"]
@@ -0,0 +1,123 @@
+# tests/test_job_queue.py
+import concurrent.futures
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import job_queue
+from utils.job_queue import INTERRUPTED, MISSING_JOB, JobQueue
+from utils.state import SqliteStateBackend
+
+
+@pytest.fixture
+def state(tmp_path):
+    return SqliteStateBackend(str(tmp_path / "state.sqlite3"))
+
+
+@pytest.fixture
+def queue(tmp_path, state):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), state=state)
+
+
+def inline_job(job_id="job-1", parts=("text",)):
+    return SimpleNamespace(
+        id=job_id, topic="Brushing Teeth", parts={name: concurrent.futures.Future() for name in parts}
+    )
+
+
+def age_row(queue, job_id, seconds, **columns):
+    """Move a job's timestamps into the past (and set any other columns)."""
+    sets = ", ".join(["created = created - ?"] + [f"{name} = ?" for name in columns])
+    queue._conn.execute(f"UPDATE jobs SET {sets} WHERE id = ?", (seconds, *columns.values(), job_id))
+    queue._conn.commit()
+
+
+def test_enqueue_claim_complete(queue):
+    job = queue.enqueue("teacher", "Shapes", text_prompt="t", image_prompt="i")
+    assert job.state() == "queued"
+    row = queue.claim("worker-1")
+    assert row["id"] == job.id and row["attempts"] == 1
+    assert queue.claim("worker-2") is None
+    queue.complete(job.id, text="hello", errors={"image": "boom"})
+    assert job.done()
+    assert job.status("text") == "done" and job.result("text") == "hello"
+    assert job.status("image") == "failed" and str(job.error("image")) == "boom"
+    assert [row["id"] for row in queue.recent("teacher")] == [job.id]
+
+
+def test_expired_worker_lease_is_reclaimed_then_failed(queue):
+    job = queue.enqueue("teacher", "Shapes", text_prompt="t")
+    for attempt in range(1, job_queue.MAX_ATTEMPTS + 1):
+        row = queue.claim(f"worker-{attempt}")
+        assert row["id"] == job.id and row["attempts"] == attempt
+        age_row(queue, job.id, 0, lease_until=time.time() - 1)
+    assert queue.claim("worker-last") is None
+    assert job.state() == "failed"
+
+
+def test_heartbeat_keeps_worker_lease(queue):
+    job = queue.enqueue("teacher", "Shapes", text_prompt="t")
+    queue.claim("worker-1")
+    queue.heartbeat(job.id)
+    assert queue.claim("worker-2") is None
+
+
+def test_long_running_inline_job_is_not_interrupted(queue):
+    job = inline_job()
+    queue.track("teacher", job, text_prompt="t")
+    # Older than a lease, but its process is alive and renewing it.
+    age_row(queue, job.id, job_queue.LEASE_SECONDS * 2)
+    handle = queue.handle(job.id)
+    assert handle.status("text") == "running"
+    job.parts["text"].set_result("done text")
+    assert handle.status("text") == "done" and handle.result("text") == "done text"
+
+
+def test_inline_job_of_stopped_app_is_interrupted(queue):
+    job = inline_job()
+    queue.track("teacher", job, text_prompt="t")
+    age_row(queue, job.id, 0, worker="app:gone", lease_until=time.time() - 1)
+    handle = queue.handle(job.id)
+    assert handle.status("text") == "failed"
+    assert str(handle.error("text")) == INTERRUPTED
+    # Workers never pick up inline jobs; the app owns their prompts and profile.
+    assert queue.claim("worker-1") is None
+
+
+def test_app_heartbeat_renews_inline_leases(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "HEARTBEAT_SECONDS", 0.01)
+    job = inline_job()
+    queue.track("teacher", job, text_prompt="t")
+    age_row(queue, job.id, 0, lease_until=time.time() - 1)
+    time.sleep(0.1)
+    assert queue.get(job.id)["lease_until"] > time.time()
+    assert queue.handle(job.id).status("text") == "running"
+
+
+def test_status_is_published_for_other_replicas(tmp_path, queue, state):
+    job = inline_job(parts=("text", "image"))
+    queue.track("teacher", job, text_prompt="t", image_prompt="i")
+    job.parts["text"].set_result("hello")
+    job.parts["image"].set_exception(RuntimeError("no image"))
+
+    other = JobQueue(str(tmp_path / "other.sqlite3"), state=state)
+    handle = other.handle(job.id)
+    assert set(handle.parts) == {"text", "image"}
+    assert handle.done()
+    assert handle.result("text") == "hello"
+    assert handle.status("image") == "failed"
+
+
+def test_purged_job_reports_failed_parts(queue, state):
+    job = queue.enqueue("teacher", "Shapes", text_prompt="t", image_prompt="i")
+    queue._conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+    queue._conn.commit()
+    state.delete(f"job:{job.id}")
+    assert job.done() and job.state() == "failed"
+    for name in ("text", "image"):
+        assert job.status(name) == "failed"
+        assert str(job.error(name)) == MISSING_JOB
+    assert job.result("text") is None and job.result("image") is None
+    assert job.elapsed() >= 0
+
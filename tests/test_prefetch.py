@@ -0,0 +1,70 @@
+# tests/test_prefetch.py
+from concurrent.futures import Future
+from pathlib import Path
+
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE, TEXT_MODEL
+from utils.cache import WorksheetCache
+from utils.prefetch import Prefetcher
+from utils.profile import PROFILE_DEFAULTS, PROMPT_FIELDS
+from utils.prompts import build_image_prompt, build_text_prompt
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class CachingRunner:
+    """Stand-in for JobRunner.prefetch that stores a placeholder result at once."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def prefetch(self, kind, prompt):
+        model, size = (TEXT_MODEL, None) if kind == "text" else (IMAGE_MODEL, IMAGE_SIZE)
+        if self.cache.contains(kind, prompt, model, size):
+            return None
+        self.cache.put(kind, prompt, model, b"prefetched", size)
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def home_page_session():
+    """What the home page holds: the main profile form's fields, no generator-tab ones."""
+    session = {key: (list(value) if isinstance(value, list) else value) for key, value in PROFILE_DEFAULTS.items()}
+    session.update(child_name="Ana", child_age=7, child_interests="trains", child_activity="Self-Help")
+    return session
+
+
+def test_predictions_follow_clicks():
+    prefetcher = Prefetcher(runner=None, top_k=2)
+    assert prefetcher.predict("Self-Help") == ["Personal Hygiene", "Daily Routines"]
+    prefetcher.record_click("Self-Help", "Household Skills")
+    assert prefetcher.predict("Self-Help") == ["Household Skills", "Personal Hygiene"]
+
+
+def test_budget_caps_prefetches(tmp_path):
+    runner = CachingRunner(WorksheetCache(str(tmp_path / "cache.sqlite3")))
+    prefetcher = Prefetcher(runner, top_k=3, concurrency=10, budget_usd=0.05)
+    # One text (0.002) and one image (0.04), then the next image is over budget.
+    assert prefetcher.warm("Self-Help", home_page_session()) == 3
+    assert prefetcher.issued == {"text": 2, "image": 1}
+    assert prefetcher.warm("Self-Help", home_page_session()) == 0
+
+
+def test_home_page_prefetch_is_hit_by_the_generator(tmp_path):
+    from streamlit.testing.v1 import AppTest
+
+    cache = WorksheetCache(str(tmp_path / "cache.sqlite3"))
+    prefetcher = Prefetcher(CachingRunner(cache), top_k=1, concurrency=10, budget_usd=10)
+    assert prefetcher.warm("Self-Help", home_page_session()) == 2
+
+    # The generator page fills in its own defaults for the fields the home page lacks.
+    at = AppTest.from_file(str(ROOT / "pages" / "ausome_chatbot.py"), default_timeout=30)
+    for key, value in home_page_session().items():
+        at.session_state[key] = value
+    at.run()
+    assert not at.exception
+    profile = {key: at.session_state[key] for key in PROMPT_FIELDS}
+    assert profile["sensory_profile"] and profile["comm_level"]
+
+    assert cache.contains("text", build_text_prompt("Personal Hygiene", profile), TEXT_MODEL)
+    assert cache.contains("image", build_image_prompt("Personal Hygiene", profile), IMAGE_MODEL, IMAGE_SIZE)
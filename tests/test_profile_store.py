@@ -0,0 +1,101 @@
+# tests/test_profile_store.py
+import datetime
+import sqlite3
+
+import pytest
+
+from utils.profile import profile_from_record
+from utils.profile_store import ProfileStore, age_band
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(str(tmp_path / "profiles.sqlite3"))
+
+
+def child(name, age=7, **fields):
+    return profile_from_record({"child_name": name, "child_age": age, **fields})
+
+
+def test_round_trip_and_lookup(store):
+    birthday = datetime.date(2018, 5, 1)
+    profile_id, _ = store.save(child("Ana", diagnosis="ASD Level 1", child_birthday=birthday,
+                                     sensory_needs="Weighted items; Movement breaks"), "teacher-a")
+    store.save(child("Ben", age=10), "teacher-a")
+    loaded = store.load(profile_id, "teacher-a")
+    assert loaded["child_birthday"] == birthday
+    assert loaded["sensory_needs"] == ["Weighted items", "Movement breaks"]
+    assert [m["child_name"] for m in store.find("teacher-a", name="a")] == ["Ana"]
+    assert [m["child_name"] for m in store.find("teacher-a", age_band="9-12")] == ["Ben"]
+    assert [m["child_name"] for m in store.find("teacher-a", diagnosis="asd level 1")] == ["Ana"]
+    assert age_band(7) == "6-8" and age_band("x") == ""
+
+
+def test_owners_cannot_see_each_others_profiles(store):
+    profile_id, _ = store.save(child("Ana", diagnosis="ASD", parent_contact="555-0100"), "teacher-a")
+    assert store.find("teacher-b") == []
+    assert store.find("teacher-b", name="Ana") == []
+    assert store.find("") == []
+    assert store.load(profile_id, "teacher-b") is None
+    assert store.load(profile_id, "") is None
+
+    # Saving over another owner's ID makes a new profile instead of changing theirs.
+    new_id, _ = store.save(child("Mallory"), "teacher-b", profile_id=profile_id)
+    assert new_id != profile_id
+    assert store.load(profile_id, "teacher-a")["child_name"] == "Ana"
+    store.delete(profile_id, "teacher-b")
+    assert store.load(profile_id, "teacher-a") is not None
+    store.delete(profile_id, "teacher-a")
+    assert store.load(profile_id, "teacher-a") is None
+
+
+def test_profiles_need_an_owner(store):
+    with pytest.raises(ValueError):
+        store.save(child("Ana"), "")
+    with pytest.raises(ValueError):
+        store.save_many([child("Ana")], None)
+
+
+def test_incremental_save_writes_only_changed_fields(store):
+    profile = child("Ana", allergies="peanuts")
+    profile_id, changed = store.save(profile, "teacher-a")
+    assert "allergies" in changed and "child_name" in changed
+    previous = store.load(profile_id, "teacher-a")
+
+    assert store.save(dict(previous), "teacher-a", profile_id=profile_id, previous=previous) == (profile_id, [])
+
+    edited = dict(previous, allergies="none", child_age=8)
+    changes = store._conn.total_changes
+    assert store.save(edited, "teacher-a", profile_id=profile_id, previous=previous) == (
+        profile_id, ["child_age", "allergies"])
+    # The profiles row plus one row per changed field.
+    assert store._conn.total_changes - changes == 3
+    loaded = store.load(profile_id, "teacher-a")
+    assert (loaded["allergies"], loaded["child_age"]) == ("none", 8)
+    assert [m["child_name"] for m in store.find("teacher-a", age_band="6-8")] == ["Ana"]
+
+
+def test_save_many_imports_a_roster(store):
+    ids = store.save_many([child("Ana"), child("Ben")], "teacher-a")
+    assert len(ids) == 2
+    assert [m["id"] for m in store.find("teacher-a")] == ids
+    assert store.find("teacher-b") == []
+
+
+def test_profiles_saved_before_owners_are_hidden(tmp_path):
+    path = str(tmp_path / "profiles.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, child_name TEXT NOT NULL,
+            name_key TEXT NOT NULL, child_age INTEGER, age_band TEXT NOT NULL DEFAULT '',
+            diagnosis TEXT NOT NULL DEFAULT '', updated REAL NOT NULL);
+        INSERT INTO profiles (child_name, name_key, updated) VALUES ('Ana', 'ana', 0);
+        """
+    )
+    conn.commit()
+    conn.close()
+    store = ProfileStore(path)
+    assert store.find("teacher-a") == []
+    store.save(child("Ben"), "teacher-a")
+    assert [m["child_name"] for m in store.find("teacher-a")] == ["Ben"]
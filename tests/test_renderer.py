@@ -0,0 +1,36 @@
+# tests/test_renderer.py
+import io
+
+from PIL import Image
+
+from utils.renderer import MARGIN, PAGE_SIZE, render_sheet, render_worksheet
+
+LONG_WORDS = ["Caterpillarsandbutterfly", "WWWWWWWWWWWWWWWWWWWWWWWW", "Toothbrushingroutine", "a"]
+
+
+def ink_outside_margins(png, top=300):
+    """Dark pixels left or right of the printable area, below the page header."""
+    image = Image.open(io.BytesIO(png)).convert("L")
+    width, height = image.size
+    strips = [(0, top, MARGIN - 5, height), (width - MARGIN + 5, top, width, height)]
+    return [box for box in strips if image.crop(box).getextrema()[0] < 128]
+
+
+def test_long_words_stay_on_the_page():
+    png = render_worksheet("Writing Practice", {"child_age": 4, "sensory_profile": "High"}, words=LONG_WORDS)
+    assert Image.open(io.BytesIO(png)).size == PAGE_SIZE
+    assert ink_outside_margins(png) == []
+
+
+def test_structured_word_list_stays_on_the_page():
+    sheet = {"title": "Words", "instruction": "Trace each word.", "items": [], "word_list": LONG_WORDS}
+    assert ink_outside_margins(render_sheet(sheet, {"child_age": 5}, "Writing Practice")) == []
+
+
+def test_short_words_keep_their_size():
+    # Short items are still drawn large: the row is mostly ink, not blank paper.
+    png = render_worksheet("Writing Practice", {"child_age": 4}, words=["a", "b"])
+    image = Image.open(io.BytesIO(png)).convert("L")
+    assert ink_outside_margins(png) == []
+    left, top, right, bottom = image.point(lambda value: 255 if value < 128 else 0).getbbox()
+    assert right - left > PAGE_SIZE[0] * 0.6
@@ -0,0 +1,184 @@
+# tests/test_resilience.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.backends import GenerationBackend
+from utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientBackend,
+    SharedTokenBucket,
+    TokenBucket,
+    backoff_delay,
+    is_retryable,
+)
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class ScriptedBackend(GenerationBackend):
+    """Raises or returns the scripted outcomes in order, then succeeds."""
+
+    name = "scripted"
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def generate_text(self, prompt, model=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_backend(outcomes, **kwargs):
+    settings = dict(max_retries=3, breaker_failures=2, breaker_reset_seconds=0.05)
+    settings.update(kwargs)
+    return ResilientBackend(ScriptedBackend(outcomes), **settings)
+
+
+def test_is_retryable():
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ApiError(400))
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_backoff_honors_retry_after():
+    assert backoff_delay(1, ApiError(429, retry_after=7)) == 7.0
+
+
+def test_backoff_grows_and_is_capped():
+    assert 0.5 <= backoff_delay(1) <= 1.0
+    assert 4.0 <= backoff_delay(4) <= 8.0
+    assert backoff_delay(30) <= 60.0
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("text", failures=2, reset_seconds=60)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_allows_one_trial_when_half_open():
+    breaker = CircuitBreaker("text", failures=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half-open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker("text", failures=1, reset_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_retries_until_success():
+    backend = make_backend([ApiError(500, retry_after=0), ApiError(500, retry_after=0)], breaker_failures=5)
+    assert asyncio.run(backend.generate_text("hi")) == "ok"
+    assert backend.inner.calls == 3
+
+
+def test_bad_request_is_not_retried():
+    backend = make_backend([ApiError(400)])
+    with pytest.raises(ApiError):
+        asyncio.run(backend.generate_text("hi"))
+    assert backend.inner.calls == 1
+    assert backend.breakers["text"].state == "closed"
+
+
+def test_rate_limits_do_not_open_breaker():
+    backend = make_backend([ApiError(429, retry_after=0)] * 3, max_retries=5)
+    assert asyncio.run(backend.generate_text("hi")) == "ok"
+    assert backend.breakers["text"].state == "closed"
+
+
+def test_half_open_trial_rate_limited_then_recovers():
+    # open -> half-open -> 429 on the trial -> the retry is the new trial and closes the breaker.
+    backend = make_backend([ApiError(500, retry_after=0), ApiError(500, retry_after=0)], max_retries=1)
+    with pytest.raises(ApiError):
+        asyncio.run(backend.generate_text("hi"))
+    breaker = backend.breakers["text"]
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(backend.generate_text("hi"))
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    backend.inner.outcomes = [ApiError(429, retry_after=0)]
+    assert asyncio.run(backend.generate_text("hi")) == "ok"
+    assert breaker.state == "closed"
+    assert asyncio.run(backend.generate_text("hi")) == "ok"
+
+
+def test_half_open_trial_rate_limited_out_of_retries_releases_trial():
+    backend = make_backend([ApiError(500, retry_after=0)], breaker_failures=1, max_retries=0)
+    with pytest.raises(ApiError):
+        asyncio.run(backend.generate_text("hi"))
+    time.sleep(0.06)
+    backend.inner.outcomes = [ApiError(429, retry_after=0)]
+    with pytest.raises(ApiError):
+        asyncio.run(backend.generate_text("hi"))
+    # The 429 settled the trial: the next call may try again instead of failing fast.
+    assert asyncio.run(backend.generate_text("hi")) == "ok"
+    assert backend.breakers["text"].state == "closed"
+
+
+def test_shared_bucket_is_shared_through_the_file(tmp_path):
+    # Two connections to one file stand in for two processes.
+    path = str(tmp_path / "limits.sqlite3")
+    first = SharedTokenBucket(path, "text_requests", rate_per_minute=60, capacity=2)
+    second = SharedTokenBucket(path, "text_requests", rate_per_minute=60, capacity=2)
+    other = SharedTokenBucket(path, "image_requests", rate_per_minute=60, capacity=2)
+    assert first._take(1) == 0 and second._take(1) == 0
+    assert 0 < first._take(1) <= 1.0
+    assert 0 < second._take(1) <= 1.0
+    assert other._take(2) == 0
+
+
+def test_replicas_share_one_rate_limit(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    replicas = [make_backend([], text_rpm=2, limits_path=path) for _ in range(2)]
+
+    async def call(backend):
+        return await asyncio.wait_for(backend.generate_text("hi"), 0.3)
+
+    assert asyncio.run(call(replicas[0])) == "ok"
+    assert asyncio.run(call(replicas[1])) == "ok"
+    # The account's two requests for this minute are used up, whichever replica asks.
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call(replicas[0]))
+
+
+def test_limits_are_split_between_hosts():
+    backend = make_backend([], text_rpm=500, text_tpm=200000, image_rpm=50, hosts=2, limits_path=None)
+    buckets = backend._get_buckets()
+    assert all(isinstance(bucket, TokenBucket) for bucket in buckets.values())
+    assert [bucket.capacity for bucket in buckets.values()] == [250, 100000, 25]
+
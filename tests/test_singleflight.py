@@ -0,0 +1,67 @@
+# tests/test_singleflight.py
+import concurrent.futures
+import threading
+
+from utils.singleflight import SingleFlight
+
+
+def test_callers_join_the_call_in_flight():
+    flight = SingleFlight()
+    pending = concurrent.futures.Future()
+    starts = []
+
+    def start():
+        starts.append(True)
+        return pending
+
+    first, joined_first = flight.do("key", start)
+    second, joined_second = flight.do("key", start)
+    assert first is second is pending
+    assert (joined_first, joined_second) == (False, True)
+    assert len(starts) == 1
+    assert flight.stats() == {"in_flight": 1, "started": 1, "coalesced": 1}
+
+
+def test_finished_calls_are_forgotten():
+    flight = SingleFlight()
+    first, _ = flight.do("key", concurrent.futures.Future)
+    first.set_result("done")
+    assert flight.get("key") is None
+    second, joined = flight.do("key", concurrent.futures.Future)
+    assert second is not first and not joined
+
+
+def test_failures_are_shared_then_forgotten():
+    flight = SingleFlight()
+    first, _ = flight.do("key", concurrent.futures.Future)
+    joined, _ = flight.do("key", concurrent.futures.Future)
+    first.set_exception(RuntimeError("boom"))
+    assert joined.exception() is first.exception()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    a, _ = flight.do("a", concurrent.futures.Future)
+    b, _ = flight.do("b", concurrent.futures.Future)
+    assert a is not b
+    assert flight.stats()["started"] == 2
+
+
+def test_concurrent_callers_start_once():
+    flight = SingleFlight()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    gate = threading.Event()
+    starts = []
+
+    def start():
+        starts.append(True)
+        return pool.submit(gate.wait)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as callers:
+        results = list(callers.map(lambda _: flight.do("key", start), range(32)))
+    gate.set()
+    pool.shutdown()
+    assert len(starts) == 1
+    assert len({id(future) for future, _ in results}) == 1
+    assert sum(joined for _, joined in results) == 31
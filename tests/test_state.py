@@ -0,0 +1,114 @@
+# tests/test_state.py
+import datetime
+
+import pytest
+
+from utils.state import RedisStateBackend, SessionStore, SqliteStateBackend, dumps
+
+
+class FakeRedis:
+    """The GET / SET EX / DEL subset of a Redis client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "redis":
+        return RedisStateBackend(client=FakeRedis())
+    return SqliteStateBackend(str(tmp_path / "state.sqlite3"))
+
+
+def test_round_trip(backend):
+    value = {"fields": {"child_age": 7, "child_birthday": datetime.date(2018, 5, 1), "tags": ["a", "b"]}}
+    backend.set("session:abc", value)
+    assert backend.get("session:abc") == value
+    backend.delete("session:abc")
+    assert backend.get("session:abc") is None
+
+
+def test_unknown_values_are_rejected(backend):
+    with pytest.raises(TypeError):
+        backend.set("key", {"when": object()})
+
+
+def test_sqlite_entries_expire(tmp_path):
+    backend = SqliteStateBackend(str(tmp_path / "state.sqlite3"))
+    backend.set("short", 1, ttl=-1)
+    backend.set("forever", 2, ttl=0)
+    assert backend.get("short") is None
+    assert backend.get("forever") == 2
+
+
+def test_sqlite_is_shared_between_processes_via_the_file(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    SqliteStateBackend(path).set("job:1", {"status": "done"})
+    assert SqliteStateBackend(path).get("job:1") == {"status": "done"}
+
+
+def test_session_store_skips_unchanged_snapshots(backend):
+    store = SessionStore(backend)
+    assert store.save("abc", {"fields": {"child_age": 7}})
+    assert not store.save("abc", {"fields": {"child_age": 7}})
+    assert store.save("abc", {"fields": {"child_age": 8}})
+    assert SessionStore(backend).load("abc") == {"fields": {"child_age": 8}}
+
+
+def test_session_store_writes_after_another_replica(backend):
+    # Two replicas serving the same session in turn.
+    first, second = SessionStore(backend), SessionStore(backend)
+    assert first.save("abc", {"fields": {"child_age": 7}})
+    assert second.save("abc", {"fields": {"child_age": 8}})
+    assert first.save("abc", {"fields": {"child_age": 7}})
+    assert backend.get("session:abc") == {"fields": {"child_age": 7}}
+
+
+# Identifying, contact, medical and behavioural details of the child.
+SENSITIVE_FIELDS = (
+    "child_name", "child_birthday", "parent_name", "parent_contact", "diagnosis", "diagnosis_date",
+    "diagnosed_by", "current_therapies", "allergies", "emergency_contact", "safety_concerns",
+    "eating_notes", "behavior_triggers", "behavior_management", "behavioral_notes",
+)
+
+
+def test_session_snapshot_keeps_private_fields_out():
+    from pages.child_profile import PRIVATE_FIELDS, SESSION_KEYS
+
+    assert not set(PRIVATE_FIELDS) & set(SESSION_KEYS)
+    assert not set(SENSITIVE_FIELDS) & set(SESSION_KEYS)
+    assert "saved_profile" not in SESSION_KEYS
+
+
+def _fill_session_and_sync():
+    import streamlit as st
+
+    from pages.child_profile import sync_session
+    from tests.test_state import SENSITIVE_FIELDS
+
+    for field in SENSITIVE_FIELDS:
+        st.session_state[field] = f"SECRET-{field}"
+    st.session_state["child_age"] = 7
+    st.session_state["saved_profile"] = {"allergies": "SECRET-saved"}
+    sync_session()
+
+
+def test_private_fields_never_reach_the_backend():
+    from streamlit.testing.v1 import AppTest
+
+    from utils.state import get_state_backend
+
+    at = AppTest.from_function(_fill_session_and_sync).run()
+    assert not at.exception
+    snapshot = get_state_backend().get(f"session:{at.query_params['teacher']}")
+    assert snapshot["fields"]["child_age"] == 7
+    assert "SECRET" not in dumps(snapshot)
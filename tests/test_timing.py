@@ -0,0 +1,46 @@
+# tests/test_timing.py
+import pytest
+
+from utils.timing import RerunTimings, get_rerun_timings, percentile, timed
+
+
+def test_percentile_is_nearest_rank():
+    ordered = list(range(1, 101))
+    assert percentile(ordered, 50) == 50
+    assert percentile(ordered, 95) == 95
+    assert percentile(ordered, 100) == 100
+    assert percentile([7], 95) == 7
+    assert percentile([1, 2], 0) == 1
+
+
+def test_summary_reports_last_and_percentiles():
+    timings = RerunTimings()
+    assert timings.summary("page") is None
+    for seconds in (0.3, 0.1, 0.2):
+        timings.record("page", seconds)
+    summary = timings.summary("page")
+    assert summary["count"] == 3
+    assert summary["last_ms"] == pytest.approx(200)
+    assert summary["p50_ms"] == pytest.approx(200)
+    assert summary["p95_ms"] == pytest.approx(300)
+    assert timings.names() == ["page"]
+
+
+def test_history_is_bounded():
+    timings = RerunTimings(history=3)
+    for seconds in (10, 1, 2, 3):
+        timings.record("page", seconds)
+    summary = timings.summary("page")
+    assert summary["count"] == 3
+    assert summary["p95_ms"] == 3000
+
+
+def test_timed_records_even_when_the_block_raises():
+    name = "tests.timed"
+    before = (get_rerun_timings().summary(name) or {"count": 0})["count"]
+    with timed(name):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed(name):
+            raise RuntimeError("st.rerun()")
+    assert get_rerun_timings().summary(name)["count"] == before + 2
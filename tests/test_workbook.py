@@ -0,0 +1,131 @@
+# tests/test_workbook.py
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image, PdfParser
+
+from utils.artifacts import ArtifactStore, PdfStream
+from utils.backends import FakeBackend, GenerationBackend
+from utils.cache import WorksheetCache
+from utils.workbook import MAX_PAGES, WorkbookJob
+
+PROFILE = {"child_name": "Sam", "child_age": 6, "child_interests": "trains"}
+
+
+class FailingImages(GenerationBackend):
+    name = "failing"
+
+    async def generate_image(self, prompt, model=None, size=None):
+        raise RuntimeError("image model down")
+
+
+@pytest.fixture
+def stores(tmp_path):
+    return WorksheetCache(str(tmp_path / "cache.sqlite3")), ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def pdf_pages(parser):
+    return [parser.read_indirect(ref) for ref in parser.pages]
+
+
+def pdf_page_sizes(path):
+    parser = PdfParser.PdfParser(path)
+    try:
+        return [tuple(page[b"MediaBox"][2:]) for page in pdf_pages(parser)]
+    finally:
+        parser.close()
+
+
+def build(workbook, backend, stores):
+    cache, artifacts = stores
+    return asyncio.run(workbook.run(backend, cache, artifacts))
+
+
+def test_pdf_stream_writes_one_page_per_image(tmp_path):
+    path = str(tmp_path / "out.pdf")
+    with open(path, "wb") as f:
+        pdf = PdfStream(f)
+        pdf.add_page(Image.new("L", (1275, 1650), 255))
+        pdf.add_page(Image.new("L", (1650, 1275), 0))
+        pdf.close()
+    assert pdf.page_count == 2
+    sizes = pdf_page_sizes(path)
+    assert sizes[0] == pytest.approx((612, 792))
+    # Fitted to a portrait letter page, not rotated.
+    assert sizes[1] == pytest.approx((612, 612 * 1275 / 1650), abs=0.01)
+
+
+def test_pdf_stream_keeps_the_pixels(tmp_path):
+    image = Image.new("L", (80, 40), 255)
+    image.paste(0, (0, 0, 40, 40))
+    buffer = io.BytesIO()
+    pdf = PdfStream(buffer)
+    pdf.add_page(image)
+    pdf.close()
+    parser = PdfParser.PdfParser(buf=buffer.getvalue())
+    xobject = parser.read_indirect(pdf_pages(parser)[0][b"Resources"][b"XObject"][b"Im0"])
+    data = xobject.decode()
+    # 1-bit rows of 80 px are 10 bytes: black (0) on the left, white (1) on the right.
+    assert data[:10] == b"\x00" * 5 + b"\xff" * 5
+
+
+def test_workbook_pages_in_plan_order(tmp_path, stores):
+    plan = [("CVC Blending", 2), ("Brushing Teeth", 1)]
+    workbook = WorkbookJob(PROFILE, plan, concurrency=3, root=str(tmp_path / "workbooks"))
+    build(workbook, FakeBackend(text_latency=0, image_latency=0, jitter=0), stores)
+    assert workbook.done() and not workbook.errors
+    assert [page["activity"] for page in workbook.pages] == ["CVC Blending", "CVC Blending", "Brushing Teeth"]
+    # Later copies of a locally drawn page use other words.
+    assert workbook.pages[0]["artifact_id"] != workbook.pages[1]["artifact_id"]
+    assert len(pdf_page_sizes(workbook.pdf_path)) == 3
+    # Only the manifest and the PDF are left; no temporary files.
+    assert sorted(os.listdir(tmp_path / "workbooks")) == [f"{workbook.id}.json", f"{workbook.id}.pdf"]
+
+
+def test_line_tracing_copies_differ(tmp_path, stores):
+    workbook = WorkbookJob(PROFILE, [("Line Tracing", 3)], root=str(tmp_path / "workbooks"))
+    build(workbook, FakeBackend(text_latency=0, image_latency=0, jitter=0), stores)
+    assert workbook.done() and not workbook.errors
+    assert len({page["artifact_id"] for page in workbook.pages}) == 3
+
+
+def test_failed_pages_resume_from_checkpoint(tmp_path, stores):
+    root = str(tmp_path / "workbooks")
+    plan = [("CVC Blending", 1), ("Brushing Teeth", 2)]
+    first = WorkbookJob(PROFILE, plan, root=root)
+    build(first, FailingImages(), stores)
+    assert len(first.errors) == 2
+    assert len(pdf_page_sizes(first.pdf_path)) == 1
+
+    backend = FakeBackend(text_latency=0, image_latency=0, jitter=0)
+    second = WorkbookJob(PROFILE, plan, root=root)
+    assert second.id == first.id
+    build(second, backend, stores)
+    assert second.resumed == 1
+    assert backend.calls["image"] == 2
+    assert not second.errors
+    assert len(pdf_page_sizes(second.pdf_path)) == 3
+
+
+def test_overlapping_builds_of_the_same_plan(tmp_path, stores):
+    root = str(tmp_path / "workbooks")
+    plan = [("CVC Blending", 3), ("Shape Tracing", 2)]
+    cache, artifacts = stores
+
+    async def both():
+        backend = FakeBackend(text_latency=0, image_latency=0, jitter=0)
+        jobs = [WorkbookJob(PROFILE, plan, concurrency=2, root=root) for _ in range(2)]
+        await asyncio.gather(*(job.run(backend, cache, artifacts) for job in jobs))
+        return jobs
+
+    jobs = asyncio.run(both())
+    assert all(job.done() and not job.errors for job in jobs)
+    assert len(pdf_page_sizes(jobs[0].pdf_path)) == 5
+    assert sorted(os.listdir(root)) == sorted([f"{jobs[0].id}.json", f"{jobs[0].id}.pdf"])
+
+
+def test_plan_over_the_page_limit_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        WorkbookJob(PROFILE, [("CVC Blending", MAX_PAGES + 1)], root=str(tmp_path))
@@ -0,0 +1,264 @@
+# utils/artifacts.py
+# Worksheet artifact store. Each generated image is normalized to an
+# optimized grayscale PNG and written to disk once, addressed by its content
+# hash, so sessions only keep a short ID. Display and download variants are
+# produced on demand and cached next to the master:
+#   preview - downscaled PNG for st.image
+#   print   - 1-bit PNG at full resolution (these are black & white sheets)
+#   pdf     - print-ready PDF sized to a letter page
+# The store is size-capped: the least recently used artifacts go first, and
+# anything stored or shown within ARTIFACT_KEEP_SECONDS is never pruned, so
+# running jobs and open pages keep their images.
+import hashlib
+import io
+import os
+import threading
+import time
+import zlib
+
+from utils.metrics import get_metrics
+
+ARTIFACT_DIR = os.getenv("AUSOME_ARTIFACT_DIR", os.path.join(".ausome_cache", "artifacts"))
+ARTIFACT_MAX_BYTES = int(os.getenv("AUSOME_ARTIFACT_MAX_MB", "1024")) * 1024 * 1024
+ARTIFACT_KEEP_SECONDS = float(os.getenv("AUSOME_ARTIFACT_KEEP_HOURS", "24")) * 3600
+PRUNE_EVERY_PUTS = 20
+PREVIEW_MAX_SIDE = 512
+PRINT_THRESHOLD = 160
+LETTER_INCHES = (8.5, 11)
+
+VARIANTS = {
+    "preview": ("png", "image/png"),
+    "print": ("png", "image/png"),
+    "pdf": ("pdf", "application/pdf"),
+}
+
+
+class ArtifactStore:
+    def __init__(self, root=ARTIFACT_DIR, max_bytes=ARTIFACT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._puts = 0
+        os.makedirs(root, exist_ok=True)
+
+    # ----------------------------
+    # PATHS
+    # ----------------------------
+    def _path(self, artifact_id, variant=None):
+        if variant is None:
+            name = f"{artifact_id}.png"
+        else:
+            name = f"{artifact_id}.{variant}.{VARIANTS[variant][0]}"
+        return os.path.join(self.root, artifact_id[:2], name)
+
+    def exists(self, artifact_id):
+        return os.path.exists(self._path(artifact_id))
+
+    def touch(self, artifact_id):
+        """Mark an artifact as in use (so prune keeps it); False if it is no longer stored."""
+        try:
+            os.utime(self._path(artifact_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    # ----------------------------
+    # MASTER IMAGE
+    # ----------------------------
+    def put(self, image_bytes):
+        """Store an image once (by content hash) and return its artifact ID."""
+        artifact_id = hashlib.sha256(image_bytes).hexdigest()[:32]
+        path = self._path(artifact_id)
+        if self.touch(artifact_id):
+            return artifact_id
+        from PIL import Image
+
+        with get_metrics().stage("artifact_store"):
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                image = image.convert("L")
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG", optimize=True)
+            self._write(path, buffer.getvalue())
+        with self._lock:
+            self._puts += 1
+            due = self._puts % PRUNE_EVERY_PUTS == 0
+        if due:
+            self.prune()
+        return artifact_id
+
+    def get(self, artifact_id):
+        with open(self._path(artifact_id), "rb") as f:
+            return f.read()
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    # ----------------------------
+    # VARIANTS
+    # ----------------------------
+    def variant_path(self, artifact_id, variant):
+        """
+        Path of a variant file, rendering it on first use. Raises
+        FileNotFoundError if the artifact was pruned (check touch() first).
+        """
+        path = self._path(artifact_id, variant)
+        if not self.touch(artifact_id):
+            raise FileNotFoundError(f"Artifact {artifact_id} is no longer stored")
+        if not os.path.exists(path):
+            from PIL import Image
+
+            with get_metrics().stage("variant_render", variant=variant):
+                with Image.open(self._path(artifact_id)) as image:
+                    data = _render_variant(image, variant)
+                self._write(path, data)
+        return path
+
+    def variant(self, artifact_id, variant):
+        with open(self.variant_path(artifact_id, variant), "rb") as f:
+            return f.read()
+
+    # ----------------------------
+    # EVICTION
+    # ----------------------------
+    def prune(self, keep_seconds=ARTIFACT_KEEP_SECONDS):
+        """
+        Drop least recently used artifacts, each with its variants, until the
+        store fits max_bytes. Artifacts used within keep_seconds are kept
+        even if the store stays over the cap.
+        """
+        with self._lock:
+            groups = {}
+            total = 0
+            for folder, _, names in os.walk(self.root):
+                for name in names:
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    group = groups.setdefault(name.split(".")[0], {"used": 0.0, "size": 0, "paths": []})
+                    group["paths"].append(path)
+                    group["size"] += stat.st_size
+                    if name.count(".") == 1:
+                        group["used"] = stat.st_mtime  # the master's mtime is its last use
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            cutoff = time.time() - keep_seconds
+            for group in sorted(groups.values(), key=lambda group: group["used"]):
+                if total <= self.max_bytes or group["used"] >= cutoff:
+                    break
+                for path in group["paths"]:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= group["size"]
+
+
+def _render_variant(image, variant):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    if variant == "preview":
+        preview = image.copy()
+        preview.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Image.LANCZOS)
+        preview.save(buffer, format="PNG", optimize=True)
+    elif variant == "print":
+        _one_bit(image).save(buffer, format="PNG", optimize=True)
+    elif variant == "pdf":
+        # Fit the sheet to a letter page by choosing the resolution.
+        dpi = max(image.width / LETTER_INCHES[0], image.height / LETTER_INCHES[1])
+        _one_bit(image).save(buffer, format="PDF", resolution=dpi)
+    else:
+        raise ValueError(f"Unknown artifact variant: {variant}")
+    return buffer.getvalue()
+
+
+def _page_points(image):
+    """Page size in points that fits the sheet to a letter page (same rule as the pdf variant)."""
+    dpi = max(image.width / LETTER_INCHES[0], image.height / LETTER_INCHES[1])
+    return image.width / dpi * 72, image.height / dpi * 72
+
+
+class PdfStream:
+    """
+    Multi-page print PDF written one page at a time to an open binary file.
+    Each page's 1-bit image is compressed and written straight away, so
+    memory stays flat however many pages are added. Object 1 is the catalog
+    and object 2 the page tree; both are written by close() once every page
+    is known, followed by the cross-reference table.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._offsets = {}
+        self._pages = []
+        self._next_id = 3
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, body, stream=None, object_id=None):
+        if object_id is None:
+            object_id = self._next_id
+            self._next_id += 1
+        self._offsets[object_id] = self._f.tell()
+        self._f.write(f"{object_id} 0 obj\n".encode("ascii"))
+        if stream is None:
+            self._f.write(body.encode("ascii") + b"\nendobj\n")
+        else:
+            self._f.write(body.replace(">>", f" /Length {len(stream)} >>", 1).encode("ascii"))
+            self._f.write(b"\nstream\n" + stream + b"\nendstream\nendobj\n")
+        return object_id
+
+    def add_page(self, image):
+        """Append one sheet (any PIL image) as a page of its own."""
+        sheet = _one_bit(image)
+        width, height = _page_points(sheet)
+        # Packed 1-bit rows; in DeviceGray 1 is white, as in Pillow's "1" mode.
+        image_id = self._object(
+            f"<< /Type /XObject /Subtype /Image /Width {sheet.width} /Height {sheet.height} "
+            "/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode >>",
+            zlib.compress(sheet.tobytes(), 6),
+        )
+        content_id = self._object("<< >>", f"q {width:.2f} 0 0 {height:.2f} 0 0 cm /Im0 Do Q".encode("ascii"))
+        self._pages.append(self._object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ))
+
+    @property
+    def page_count(self):
+        return len(self._pages)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._pages)
+        self._object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>", object_id=2)
+        self._object("<< /Type /Catalog /Pages 2 0 R >>", object_id=1)
+        xref = self._f.tell()
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[object_id]:010d} 00000 n \n" for object_id in range(1, self._next_id)]
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._f.write("".join(lines).encode("ascii"))
+
+
+def _one_bit(image):
+    from PIL import Image
+
+    return image.convert("L").point(lambda v: 255 if v > PRINT_THRESHOLD else 0).convert("1", dither=Image.Dither.NONE)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Process-wide artifact store shared by every Streamlit session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,325 @@
+# utils/backends.py
+# Generation backends. The app talks to a GenerationBackend instead of a
+# module-level OpenAI client, so a local FakeBackend can stand in for the
+# API when benchmarking or developing offline (AUSOME_BACKEND=fake).
+import asyncio
+import base64
+import functools
+import json
+import os
+import random
+import struct
+import zlib
+
+from utils.metrics import get_metrics
+
+TEXT_MODEL = "gpt-4.1-mini"
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+# Image models that accept n > 1 in one request (dall-e-3 only allows n=1).
+NATIVE_N_MODELS = ("dall-e-2",)
+
+# Shared keep-alive HTTP pool for the OpenAI client. Retries and deadlines
+# are handled by utils.resilience, so the SDK's own retries are disabled.
+POOL_MAX_CONNECTIONS = int(os.getenv("AUSOME_POOL_MAX_CONNECTIONS", "50"))
+POOL_MAX_KEEPALIVE = int(os.getenv("AUSOME_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_SECONDS = 60.0
+CONNECT_TIMEOUT_SECONDS = 5.0
+READ_TIMEOUT_SECONDS = 120.0
+
+
+class GenerationBackend:
+    """Async interface every backend implements."""
+
+    name = "base"
+
+    async def generate_text(self, prompt, model=TEXT_MODEL):
+        """Return the full completion text."""
+        raise NotImplementedError
+
+    async def stream_text(self, prompt, on_chunk, model=TEXT_MODEL):
+        """Call on_chunk(text) per token chunk; return total tokens (or None)."""
+        raise NotImplementedError
+
+    async def generate_json(self, prompt, schema, model=TEXT_MODEL):
+        """Return the completion parsed as JSON, constrained to the given JSON schema."""
+        raise NotImplementedError
+
+    async def generate_image(self, prompt, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        """Return decoded PNG bytes."""
+        raise NotImplementedError
+
+    async def generate_images(self, prompt, n, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        """Return n PNG variants; by default n concurrent single-image calls."""
+        return list(await asyncio.gather(*(self.generate_image(prompt, model, size) for _ in range(n))))
+
+
+def supports_native_n(model):
+    return model in NATIVE_N_MODELS
+
+
+# ----------------------------
+# OPENAI BACKEND
+# ----------------------------
+class OpenAIBackend(GenerationBackend):
+    name = "openai"
+
+    def __init__(self, api_key=None, base_url=None):
+        self._api_key = api_key
+        # OPENAI_BASE_URL (read by the SDK) or base_url can point at a local fake server.
+        self._base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        # Created lazily on the event loop thread so its HTTP pool binds to that loop.
+        if self._client is None:
+            from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+
+            # The SDK's own HTTP types (httpx or httpx2, depending on the SDK version).
+            limits_type = type(DEFAULT_CONNECTION_LIMITS)
+            http_client = DefaultAsyncHttpxClient(
+                limits=limits_type(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=POOL_KEEPALIVE_SECONDS,
+                ),
+                timeout=Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+            )
+            self._client = AsyncOpenAI(
+                api_key=self._api_key or os.getenv("OPENAI_API_KEY"),
+                base_url=self._base_url,
+                http_client=http_client,
+                max_retries=0,
+            )
+        return self._client
+
+    async def generate_text(self, prompt, model=TEXT_MODEL):
+        with get_metrics().stage("text_api", model=model) as sample:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            if response.usage is not None:
+                sample["prompt_tokens"] = response.usage.prompt_tokens
+                sample["completion_tokens"] = response.usage.completion_tokens
+        return response.choices[0].message.content
+
+    async def generate_json(self, prompt, schema, model=TEXT_MODEL):
+        with get_metrics().stage("text_api", model=model, structured=True) as sample:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "worksheet", "schema": schema, "strict": True},
+                }
+            )
+            if response.usage is not None:
+                sample["prompt_tokens"] = response.usage.prompt_tokens
+                sample["completion_tokens"] = response.usage.completion_tokens
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"The model declined to create this worksheet: {message.refusal}")
+        return json.loads(message.content)
+
+    async def stream_text(self, prompt, on_chunk, model=TEXT_MODEL):
+        with get_metrics().stage("text_api", model=model, stream=True) as sample:
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            total_tokens = None
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    on_chunk(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None) is not None:
+                    total_tokens = chunk.usage.total_tokens
+                    sample["prompt_tokens"] = chunk.usage.prompt_tokens
+                    sample["completion_tokens"] = chunk.usage.completion_tokens
+        return total_tokens
+
+    async def generate_image(self, prompt, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        metrics = get_metrics()
+        with metrics.stage("image_api", model=model, size=size) as sample:
+            response = await self.client.images.generate(
+                model=model,
+                prompt=prompt,
+                size=size,
+                quality="standard",
+                n=1,
+                response_format="b64_json"
+            )
+            sample["images"] = len(response.data)
+        with metrics.stage("image_decode"):
+            return base64.b64decode(response.data[0].b64_json)
+
+    async def generate_images(self, prompt, n, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        if not supports_native_n(model):
+            return await super().generate_images(prompt, n, model, size)
+        metrics = get_metrics()
+        with metrics.stage("image_api", model=model, size=size) as sample:
+            response = await self.client.images.generate(
+                model=model,
+                prompt=prompt,
+                size=size,
+                n=n,
+                response_format="b64_json"
+            )
+            sample["images"] = len(response.data)
+        with metrics.stage("image_decode"):
+            return [base64.b64decode(item.b64_json) for item in response.data]
+
+
+# ----------------------------
+# FAKE BACKEND
+# ----------------------------
+class FakeAPIError(Exception):
+    """Injected failure shaped like an openai.APIStatusError."""
+
+    def __init__(self, message, status_code=500, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = type("FakeResponse", (), {"headers": headers})()
+
+
+@functools.lru_cache(maxsize=8)
+def placeholder_png(size=IMAGE_SIZE):
+    """A blank white grayscale PNG of the requested size, built without Pillow."""
+    width, height = (int(part) for part in size.split("x"))
+    raw = b"".join(b"\x00" + b"\xff" * width for _ in range(height))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+FAKE_ACTIVITY_TEXT = (
+    "Let's practice together! Look at each picture and say the word out loud. "
+    "1. Point to the first word. 2. Say each sound slowly. 3. Blend the sounds. "
+    "4. Trace the word with your finger. Great job, you did it!"
+)
+
+
+def fake_sheet(prompt):
+    """Structured worksheet for the topic named in a sheet prompt ("Topic: ...")."""
+    topic = next(
+        (line.split(":", 1)[1].strip() for line in prompt.splitlines() if line.strip().startswith("Topic:")),
+        "Practice",
+    )
+    words = [word for word in topic.lower().replace("-", " ").split() if word.isalpha()]
+    return {
+        "title": topic.title(),
+        "instruction": "Do one step at a time.",
+        "items": [
+            f"Point to the word {topic.lower()}.",
+            "Say each word out loud.",
+            "Trace each word with your finger.",
+            "Color the box when you are done.",
+        ],
+        "word_list": (words + ["cat", "sun", "map", "dog"])[:8],
+    }
+
+
+class FakeBackend(GenerationBackend):
+    """
+    Local stand-in with configurable latency (seconds, +/- jitter fraction)
+    and failure injection: failure_rate raises 500s, rate_limit_rate raises
+    429s with a Retry-After header.
+    """
+
+    name = "fake"
+
+    def __init__(self, text_latency=1.5, image_latency=12.0, jitter=0.2,
+                 failure_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=None):
+        self.text_latency = text_latency
+        self.image_latency = image_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.calls = {"text": 0, "image": 0}
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            text_latency=float(os.getenv("AUSOME_FAKE_TEXT_LATENCY", "1.5")),
+            image_latency=float(os.getenv("AUSOME_FAKE_IMAGE_LATENCY", "12")),
+            failure_rate=float(os.getenv("AUSOME_FAKE_FAILURE_RATE", "0")),
+            rate_limit_rate=float(os.getenv("AUSOME_FAKE_RATE_LIMIT_RATE", "0")),
+        )
+
+    def _latency(self, base):
+        return max(0.0, base * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def _maybe_fail(self):
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            raise FakeAPIError("Rate limit reached (fake)", status_code=429, retry_after=self.retry_after)
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise FakeAPIError("Internal server error (fake)", status_code=500)
+
+    async def generate_text(self, prompt, model=TEXT_MODEL):
+        self.calls["text"] += 1
+        # Token counts are word counts, so cost accounting can be exercised offline.
+        with get_metrics().stage("text_api", model=model) as sample:
+            await asyncio.sleep(self._latency(self.text_latency))
+            self._maybe_fail()
+            sample["prompt_tokens"] = len(prompt.split())
+            sample["completion_tokens"] = len(FAKE_ACTIVITY_TEXT.split())
+        return FAKE_ACTIVITY_TEXT
+
+    async def generate_json(self, prompt, schema, model=TEXT_MODEL):
+        self.calls["text"] += 1
+        sheet = fake_sheet(prompt)
+        with get_metrics().stage("text_api", model=model, structured=True) as sample:
+            await asyncio.sleep(self._latency(self.text_latency))
+            self._maybe_fail()
+            sample["prompt_tokens"] = len(prompt.split())
+            sample["completion_tokens"] = len(json.dumps(sheet).split())
+        return sheet
+
+    async def stream_text(self, prompt, on_chunk, model=TEXT_MODEL):
+        self.calls["text"] += 1
+        words = FAKE_ACTIVITY_TEXT.split(" ")
+        total = self._latency(self.text_latency)
+        with get_metrics().stage("text_api", model=model, stream=True) as sample:
+            # Roughly a fifth of the time goes to the first token, like the real API.
+            await asyncio.sleep(total * 0.2)
+            self._maybe_fail()
+            step = total * 0.8 / len(words)
+            for index, word in enumerate(words):
+                on_chunk(word if index == 0 else " " + word)
+                await asyncio.sleep(step)
+            sample["prompt_tokens"] = len(prompt.split())
+            sample["completion_tokens"] = len(words)
+        return len(prompt.split()) + len(words)
+
+    async def generate_image(self, prompt, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        self.calls["image"] += 1
+        with get_metrics().stage("image_api", model=model, size=size) as sample:
+            await asyncio.sleep(self._latency(self.image_latency))
+            self._maybe_fail()
+            sample["images"] = 1
+        return placeholder_png(size)
+
+
+def get_backend(name=None):
+    """Backend selected by name or the AUSOME_BACKEND env var (default: openai)."""
+    name = (name or os.getenv("AUSOME_BACKEND", "openai")).lower()
+    if name == "fake":
+        return FakeBackend.from_env()
+    if name == "openai":
+        return OpenAIBackend()
+    raise ValueError(f"Unknown generation backend: {name}")
@@ -0,0 +1,84 @@
+# utils/background.py
+# Pastel page background shared by every page. pages/ausome.jpeg is
+# downscaled and re-encoded as WebP once per process (and kept on disk, so
+# a restarted server skips even that), then embedded in one CSS string.
+# Reruns only re-send the cached string; nothing is read or encoded again.
+import base64
+import functools
+import hashlib
+import io
+import os
+
+import streamlit as st
+
+from utils.cache import CACHE_DIR
+
+BACKGROUND_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages", "ausome.jpeg")
+BACKGROUND_MAX_SIDE = 1280
+BACKGROUND_QUALITY = 70
+MIME_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+
+def _encode(path):
+    """(extension, bytes) of the downscaled background; WebP when Pillow supports it."""
+    from PIL import Image, features
+
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        image.thumbnail((BACKGROUND_MAX_SIDE, BACKGROUND_MAX_SIDE))
+        buffer = io.BytesIO()
+        if features.check("webp"):
+            image.save(buffer, format="WEBP", quality=BACKGROUND_QUALITY)
+            return "webp", buffer.getvalue()
+        image.save(buffer, format="JPEG", quality=BACKGROUND_QUALITY, optimize=True, progressive=True)
+        return "jpg", buffer.getvalue()
+
+
+def _encoded_background(path):
+    """Encoded background, reused from the cache directory when the source is unchanged."""
+    stat = os.stat(path)
+    key = hashlib.sha256(
+        f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime}:{BACKGROUND_MAX_SIDE}:{BACKGROUND_QUALITY}".encode("utf-8")
+    ).hexdigest()[:16]
+    for extension in MIME_TYPES:
+        cached_path = os.path.join(CACHE_DIR, f"background-{key}.{extension}")
+        if os.path.exists(cached_path):
+            with open(cached_path, "rb") as f:
+                return extension, f.read()
+    extension, data = _encode(path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        cached_path = os.path.join(CACHE_DIR, f"background-{key}.{extension}")
+        with open(f"{cached_path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{cached_path}.tmp", cached_path)
+    except OSError:
+        pass  # read-only deploy: encode again next start
+    return extension, data
+
+
+@functools.lru_cache(maxsize=4)
+def background_css(path=BACKGROUND_IMAGE):
+    """The <style> block for the page background, built once per process."""
+    try:
+        extension, data = _encoded_background(path)
+    except OSError:
+        return ""
+    mime = MIME_TYPES[extension]
+    encoded = base64.b64encode(data).decode("ascii")
+    return f"""
+    <style>
+    .stApp {{
+        background-image: url("data:{mime};base64,{encoded}");
+        background-size: cover;
+        background-position: center;
+        background-attachment: fixed;
+    }}
+    </style>
+    """
+
+
+def apply_background():
+    css = background_css()
+    if css:
+        st.markdown(css, unsafe_allow_html=True)
@@ -0,0 +1,167 @@
+# utils/batch.py
+import asyncio
+import csv
+import io
+import json
+import logging
+import re
+import threading
+import time
+import zipfile
+
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE, TEXT_MODEL
+from utils.profile import as_profile, profile_from_record
+from utils.prompts import build_image_prompt, build_text_prompt
+from utils.renderer import can_render, render_worksheet
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = 4
+
+
+# ----------------------------
+# ROSTER LOADING
+# ----------------------------
+def load_roster(data, filename):
+    """
+    Parse a CSV or JSON roster into complete profile dicts. JSON may be a
+    list of objects or {"children": [...]}; CSV columns use the same field
+    names as the child profile form.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        records = json.loads(data)
+        if isinstance(records, dict):
+            records = records.get("children", [])
+    else:
+        records = list(csv.DictReader(io.StringIO(data)))
+
+    profiles = [profile_from_record(record) for record in records]
+    return [profile for profile in profiles if profile.get("child_name")]
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(value)).strip("_") or "worksheet"
+
+
+# ----------------------------
+# BATCH JOB
+# ----------------------------
+class BatchJob:
+    """
+    One roster run. Identical prompts (same age/profile/activity) are only
+    generated once, across a bounded pool of workers. Retries, rate limits
+    and backoff are handled by the backend (utils.resilience.ResilientBackend).
+    """
+
+    def __init__(self, profiles, activity_type, include_text=True, include_image=True,
+                 concurrency=BATCH_CONCURRENCY):
+        self.profiles = profiles
+        self.activity_type = activity_type
+        self.include_text = include_text
+        self.include_image = include_image
+        self.concurrency = concurrency
+        self.started = time.time()
+        self.finished_at = None
+        self.results = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+        # (kind, prompt) -> indexes of the children that share it. Locally
+        # rendered sheets are keyed by the profile snapshot instead of a prompt.
+        self.requests = {}
+        render_locally = can_render(activity_type)
+        for index, profile in enumerate(profiles):
+            if include_text:
+                self.requests.setdefault(("text", build_text_prompt(activity_type, profile)), []).append(index)
+            if include_image and render_locally:
+                self.requests.setdefault(("render", as_profile(profile)), []).append(index)
+            elif include_image:
+                self.requests.setdefault(("image", build_image_prompt(activity_type, profile)), []).append(index)
+
+    @property
+    def total(self):
+        return len(self.requests)
+
+    @property
+    def completed(self):
+        with self._lock:
+            return len(self.results) + len(self.errors)
+
+    def done(self):
+        return self.finished_at is not None
+
+    async def _call(self, backend, kind, prompt):
+        if kind == "text":
+            return await backend.generate_text(prompt)
+        return await backend.generate_image(prompt)
+
+    async def _worker(self, backend, cache, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                kind, prompt = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                if kind == "render":
+                    # Structured sheet drawn locally; "prompt" is the ChildProfile.
+                    value = await loop.run_in_executor(None, render_worksheet, self.activity_type, prompt)
+                else:
+                    model, size = (TEXT_MODEL, None) if kind == "text" else (IMAGE_MODEL, IMAGE_SIZE)
+                    # SQLite calls block, so they run off the shared event loop.
+                    value = await asyncio.to_thread(cache.get, kind, prompt, model, size)
+                    if value is None:
+                        value = await self._call(backend, kind, prompt)
+                        await asyncio.to_thread(cache.put, kind, prompt, model, value, size)
+                    elif kind == "text":
+                        value = value.decode("utf-8")
+                with self._lock:
+                    self.results[(kind, prompt)] = value
+            except Exception as e:
+                with self._lock:
+                    self.errors[(kind, prompt)] = e
+
+    async def run(self, backend, cache):
+        queue = asyncio.Queue()
+        for request in self.requests:
+            queue.put_nowait(request)
+        workers = [self._worker(backend, cache, queue) for _ in range(max(1, self.concurrency))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            self.finished_at = time.time()
+        return self
+
+    # ----------------------------
+    # ZIP OUTPUT
+    # ----------------------------
+    def to_zip(self):
+        """One folder per child with the worksheet PNG and/or activity text."""
+        buffer = io.BytesIO()
+        activity = _safe_name(self.activity_type)
+        failures = []
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            used = set()
+            for index, profile in enumerate(self.profiles):
+                folder = _safe_name(profile.get("child_name"))
+                if folder in used:
+                    folder = f"{folder}_{index + 1}"
+                used.add(folder)
+                for (kind, prompt), indexes in self.requests.items():
+                    if index not in indexes:
+                        continue
+                    if (kind, prompt) in self.errors:
+                        failures.append(f"{profile.get('child_name')} ({kind}): {self.errors[(kind, prompt)]}")
+                        continue
+                    value = self.results.get((kind, prompt))
+                    if value is None:
+                        continue
+                    if kind == "text":
+                        archive.writestr(f"{folder}/{activity}.txt", value)
+                    else:
+                        archive.writestr(f"{folder}/{activity}.png", value)
+            if failures:
+                archive.writestr("errors.txt", "\n".join(failures))
+        return buffer.getvalue()
@@ -0,0 +1,212 @@
+# utils/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+CACHE_DIR = os.getenv("AUSOME_CACHE_DIR", ".ausome_cache")
+CACHE_MAX_BYTES = int(os.getenv("AUSOME_CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_TTL_SECONDS = int(os.getenv("AUSOME_CACHE_TTL_HOURS", "168")) * 3600
+# Hits only note their access time in memory; the LRU order on disk is
+# updated in one batch with the next write, or after this many hits / seconds.
+ACCESS_FLUSH_EVERY = 64
+ACCESS_FLUSH_SECONDS = 30.0
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so re-indented copies of the same prompt share a key."""
+    return " ".join((prompt or "").split())
+
+
+def cache_key(kind, prompt, model, size=None, variant=None):
+    """
+    Content address for a generation: hash of kind, model, size and normalized
+    prompt. variant (1..N) addresses the extra images of a multi-variant run.
+    """
+    payload = {"kind": kind, "model": model, "size": size, "prompt": normalize_prompt(prompt)}
+    if variant is not None:
+        payload["variant"] = variant
+    payload = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class WorksheetCache:
+    """
+    Persistent on-disk cache for generated worksheet text and images.
+    Entries are evicted least-recently-used once the total size passes
+    max_bytes, and ignored (then deleted) once older than ttl_seconds.
+    """
+
+    def __init__(self, path=None, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "worksheets.sqlite3")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+
+    # ----------------------------
+    # LOOKUP
+    # ----------------------------
+    def get(self, kind, prompt, model, size=None, variant=None):
+        """Return the cached bytes for this generation, or None on a miss."""
+        return self.get_by_key(cache_key(kind, prompt, model, size, variant))
+
+    def contains(self, kind, prompt, model, size=None):
+        """True if a fresh entry exists. Does not touch hit/miss counters or LRU order."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created FROM entries WHERE key = ?", (cache_key(kind, prompt, model, size),)
+            ).fetchone()
+        return row is not None and not (self.ttl_seconds and time.time() - row[0] > self.ttl_seconds)
+
+    def get_stale(self, kind, prompt, model, size=None):
+        """
+        Fallback lookup while the API is unavailable: returns an entry even
+        past its TTL (if not yet evicted) and leaves counters and LRU untouched.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ?", (cache_key(kind, prompt, model, size),)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def get_by_key(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl_seconds and now - created > self.ttl_seconds:
+                self._accessed.pop(key, None)
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            # Hot reads stay read-only; see ACCESS_FLUSH_EVERY.
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_EVERY or \
+                    time.monotonic() - self._last_flush > ACCESS_FLUSH_SECONDS:
+                self._flush_accessed_locked()
+                self._conn.commit()
+            self.hits += 1
+            return value
+
+    def _flush_accessed_locked(self):
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE entries SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._last_flush = time.monotonic()
+
+    # ----------------------------
+    # STORE
+    # ----------------------------
+    def put(self, kind, prompt, model, value, size=None, variant=None):
+        """Store bytes (or text, stored as UTF-8) for this generation and return its key."""
+        key = cache_key(kind, prompt, model, size, variant)
+        self.put_by_key(key, kind, value)
+        return key
+
+    def put_by_key(self, key, kind, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, sqlite3.Binary(value), len(value), now, now),
+            )
+            self._accessed.pop(key, None)
+            self._flush_accessed_locked()
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now):
+        if self.ttl_seconds:
+            cur = self._conn.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,)
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    # ----------------------------
+    # STATS
+    # ----------------------------
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by every Streamlit session."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = WorksheetCache()
+        return _cache
@@ -0,0 +1,176 @@
+# utils/compaction.py
+# Prompt compaction. Built prompts pass through one stage that:
+#   - drops profile lines whose value is empty / None / N/A,
+#   - drops section headers left with no lines under them,
+#   - removes repeated rule bullets (the ASD rules and the custom-topic
+#     requirements share several) and persona lines image models ignore,
+#   - strips indentation and blank-line runs,
+#   - enforces a per-model token budget, shortening the longest free-text
+#     profile values first and truncating only as a last resort.
+# Tokens are counted with tiktoken when it is installed (optional) and with
+# a local estimate otherwise. Before/after counts go to utils.metrics.
+import functools
+import math
+import os
+import re
+
+from utils.metrics import get_metrics
+
+COMPACTION_ENABLED = os.getenv("AUSOME_PROMPT_COMPACTION", "1") != "0"
+
+# Prompt token budgets. dall-e-3 also caps prompts at 4000 characters.
+TOKEN_BUDGETS = {"gpt-4.1-mini": 1500, "dall-e-3": 700}
+DEFAULT_TOKEN_BUDGET = 1500
+MAX_PROMPT_CHARS = {"dall-e-3": 4000}
+IMAGE_MODELS = ("dall-e-2", "dall-e-3", "gpt-image-1")
+
+EMPTY_VALUES = {"", "none", "n/a", "na", "null", "[]", "()", "-"}
+# "- Label: value" lines; the label is short, the value may be free text.
+_FIELD_LINE = re.compile(r"^\s*[-•]\s*([^:\n]{1,40}):\s*(.*)$")
+_BULLET_LINE = re.compile(r"^\s*[-•]\s*(.+)$")
+_HEADER_LINE = re.compile(r"^[^-•\s][^:]{0,60}:\s*$")
+_PERSONA_LINE = re.compile(r"^\s*You are (an? )?(AI|expert|assistant)\b", re.IGNORECASE)
+# Words, punctuation and whitespace runs (indentation costs tokens too).
+_ESTIMATE_PIECES = re.compile(r"\w+|[^\w\s]|[ \t]{2,}")
+
+
+# ----------------------------
+# TOKEN COUNTING
+# ----------------------------
+@functools.lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # No cached BPE files and no network: fall back to the estimate.
+        return None
+
+
+def _estimate(piece):
+    return 1 if piece.isspace() else math.ceil(len(piece) / 4)
+
+
+def count_tokens(text, model):
+    """Token count from tiktoken if available, else a local estimate (~4 chars per token)."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(_estimate(piece) for piece in _ESTIMATE_PIECES.findall(text))
+
+
+def _truncate_tokens(text, model, budget):
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:budget])
+    pieces = 0
+    for match in _ESTIMATE_PIECES.finditer(text):
+        pieces += _estimate(match.group())
+        if pieces > budget:
+            return text[:match.start()].rstrip()
+    return text
+
+
+# ----------------------------
+# COMPACTION
+# ----------------------------
+def _normalize_rule(text):
+    return re.sub(r"[^a-z0-9&]+", " ", text.lower()).strip()
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip())
+
+
+def _strip_lines(prompt, model):
+    kept = []
+    seen_rules = set()
+    raw_lines = prompt.splitlines()
+    for index, raw in enumerate(raw_lines):
+        line = raw.strip()
+        if not line:
+            if kept and kept[-1] != "":
+                kept.append("")
+            continue
+        if model in IMAGE_MODELS and _PERSONA_LINE.match(line):
+            continue
+        field = _FIELD_LINE.match(line)
+        if field and field.group(2).strip().lower() in EMPTY_VALUES:
+            following = next((other for other in raw_lines[index + 1:] if other.strip()), "")
+            # "- Each cell should contain:" introduces nested lines; keep it.
+            if _indent(following) <= _indent(raw):
+                continue
+        bullet = _BULLET_LINE.match(line)
+        if bullet and not field:
+            rule = _normalize_rule(bullet.group(1))
+            if rule in seen_rules:
+                continue
+            seen_rules.add(rule)
+        kept.append(line)
+
+    # Drop headers ("Child Profile:") whose section ended up empty.
+    result = []
+    for index, line in enumerate(kept):
+        if _HEADER_LINE.match(line):
+            following = next((other for other in kept[index + 1:] if other), "")
+            if not following or _HEADER_LINE.match(following):
+                continue
+        if line == "" and result and result[-1] == "":
+            continue
+        result.append(line)
+    while result and result[-1] == "":
+        result.pop()
+    while result and result[0] == "":
+        result.pop(0)
+    return result
+
+
+def _fit_budget(lines, model, budget):
+    """Shorten the longest profile values until the prompt fits the budget."""
+    text = "\n".join(lines)
+    while count_tokens(text, model) > budget:
+        longest = None
+        for index, line in enumerate(lines):
+            field = _FIELD_LINE.match(line)
+            if field and len(field.group(2).split()) > 3:
+                if longest is None or len(line) > len(lines[longest]):
+                    longest = index
+        if longest is None:
+            return _truncate_tokens(text, model, budget)
+        label, value = _FIELD_LINE.match(lines[longest]).groups()
+        words = value.split()
+        lines[longest] = f"- {label}: {' '.join(words[:len(words) // 2])}…"
+        text = "\n".join(lines)
+    return text
+
+
+@functools.lru_cache(maxsize=2048)
+def _compact(prompt, model):
+    before = count_tokens(prompt, model)
+    text = _fit_budget(_strip_lines(prompt, model), model, TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET))
+    max_chars = MAX_PROMPT_CHARS.get(model)
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+    return text, before, count_tokens(text, model)
+
+
+def compact_prompt(prompt, model):
+    """Compacted prompt for model; records tokens before/after in the metrics."""
+    if not COMPACTION_ENABLED:
+        return prompt
+    text, before, after = _compact(prompt, model)
+    metrics = get_metrics()
+    metrics.count("prompt_tokens_before_total", before)
+    metrics.count("prompt_tokens_after_total", after)
+    return text
+
+
+def compaction_report(prompt, model):
+    """{"before": tokens, "after": tokens, "saved": tokens} for one prompt."""
+    _, before, after = _compact(prompt, model)
+    return {"before": before, "after": after, "saved": before - after}
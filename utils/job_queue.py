@@ -0,0 +1,392 @@
+# utils/job_queue.py
+# Durable generation jobs in SQLite, shared by the Streamlit app and the
+# worker pool (ausome_worker.py).
+#   - AUSOME_JOB_QUEUE=worker: the generator page enqueues jobs and polls
+#     their row; separate worker processes claim and run them, so closing a
+#     tab loses nothing and generation/rendering does not compete with UI
+#     reruns. Workers scale independently of the app.
+#   - AUSOME_JOB_QUEUE=inline (default): jobs run in the app's JobRunner as
+#     before (streaming text, image variants) and are only recorded here.
+# Either way every job ends up in the teacher's "My recent worksheets" list.
+# Claimed jobs hold a lease that the worker renews; a job whose worker died
+# goes back to the queue once the lease expires. Inline jobs hold a lease
+# too, renewed by the app process that runs them (APP_WORKER); once it
+# lapses the app has restarted and the job is reported as interrupted.
+# Every status change is also published to the state backend (utils.state)
+# as "job:<id>" (status, result text, artifact ID, errors), so a session
+# restored on another replica can still follow or open its job.
+import concurrent.futures
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.artifacts import VARIANTS, get_artifact_store
+from utils.profile import PROMPT_FIELDS, as_profile
+from utils.profile_store import DATA_DIR
+from utils.resilience import describe_error
+from utils.state import get_state_backend
+
+JOB_QUEUE_MODE = os.getenv("AUSOME_JOB_QUEUE", "inline")
+LEASE_SECONDS = float(os.getenv("AUSOME_JOB_LEASE_SECONDS", "300"))
+HEARTBEAT_SECONDS = 15.0
+MISSING_IMAGE = "This worksheet image is no longer saved. Please generate it again."
+INTERRUPTED = "This worksheet was interrupted by a server restart. Please generate it again."
+MISSING_JOB = "This worksheet is no longer saved. Please generate it again."
+MAX_ATTEMPTS = 3
+RECENT_LIMIT = 20
+# Worker name of inline jobs run by this app process (unique per process).
+APP_WORKER = f"app:{uuid.uuid4().hex[:12]}"
+
+
+def _profile_record(profile):
+    """JSON-safe snapshot of the prompt fields (the worker has no session state)."""
+    if profile is None:
+        return None
+    snapshot = as_profile(profile)
+    return {name: getattr(snapshot, name) for name in PROMPT_FIELDS}
+
+
+def _outcome(parts):
+    """(text, artifact_id, errors) from finished GenerationJob parts."""
+    text, artifact_id, errors = None, None, {}
+    for name, future in parts.items():
+        error = future.exception()
+        kind = "text" if name == "text" else "image"
+        if error is not None:
+            errors.setdefault(kind, describe_error(error))
+        elif kind == "text":
+            text = future.result()
+        elif name == "image" or artifact_id is None:
+            # The chosen image wins; otherwise the first variant that finished.
+            artifact_id = future.result()
+    if artifact_id is not None:
+        errors.pop("image", None)
+    return text, artifact_id, errors
+
+
+# ----------------------------
+# QUEUE
+# ----------------------------
+class JobQueue:
+    def __init__(self, path=None, state=None):
+        self.state = state or get_state_backend()
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "jobs.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        # Several processes write here: WAL plus a generous busy timeout.
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                text_prompt TEXT,
+                image_prompt TEXT,
+                profile TEXT,
+                status TEXT NOT NULL,
+                text_result TEXT,
+                artifact_id TEXT,
+                errors TEXT NOT NULL DEFAULT '{}',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created REAL NOT NULL,
+                lease_until REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+            """
+        )
+        self._conn.commit()
+
+    def _insert(self, job_id, owner, topic, text_prompt, image_prompt, profile, status, worker=None,
+                lease_until=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, owner, topic, text_prompt, image_prompt, profile, status, worker, created, "
+                "lease_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, topic, text_prompt, image_prompt,
+                 json.dumps(_profile_record(profile)), status, worker, time.time(), lease_until),
+            )
+            self._conn.commit()
+        self._publish(job_id)
+
+    def enqueue(self, owner, topic, text_prompt=None, image_prompt=None, profile=None):
+        """Queue a job for the worker pool; returns a QueuedJob handle."""
+        job_id = uuid.uuid4().hex
+        self._insert(job_id, owner, topic, text_prompt, image_prompt, profile, "queued")
+        return self.handle(job_id)
+
+    def track(self, owner, job, text_prompt=None, image_prompt=None, profile=None):
+        """Record a GenerationJob running in this process; its row is completed when it finishes."""
+        self._insert(
+            job.id, owner, job.topic, text_prompt, image_prompt, profile, "running",
+            worker=APP_WORKER, lease_until=time.time() + LEASE_SECONDS,
+        )
+        self._start_app_heartbeat()
+        parts = dict(job.parts)
+        if not parts:
+            self.complete(job.id)
+            return
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def part_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self.complete(job.id, *_outcome(parts))
+
+        for future in parts.values():
+            future.add_done_callback(part_done)
+
+    def _start_app_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._renew_app_leases, name="job-lease", daemon=True)
+        self._heartbeat.start()
+
+    def _renew_app_leases(self):
+        """Keep this process's inline jobs leased (and published) while it is alive."""
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                rows = self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'running' RETURNING id",
+                    (time.time() + LEASE_SECONDS, APP_WORKER),
+                ).fetchall()
+                self._conn.commit()
+            for row in rows:
+                self._publish(row["id"])
+
+    def set_image(self, job_id, artifact_id):
+        """Replace the job's image (e.g. with the variant the teacher picked)."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET artifact_id = ? WHERE id = ?", (artifact_id, job_id))
+            self._conn.commit()
+        self._publish(job_id)
+
+    # ----------------------------
+    # WORKER SIDE
+    # ----------------------------
+    def claim(self, worker):
+        """Take the oldest queued job (or one whose lease expired), or return None."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, "
+                "errors = json_object('text', 'The worker stopped too many times.', "
+                "'image', 'The worker stopped too many times.') "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, MAX_ATTEMPTS),
+            )
+            row = self._conn.execute(
+                """
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, lease_until = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued'
+                       OR (status = 'running' AND lease_until < ? AND worker NOT LIKE 'app:%')
+                    ORDER BY created LIMIT 1
+                )
+                RETURNING *
+                """,
+                (worker, now + LEASE_SECONDS, now),
+            ).fetchone()
+            self._conn.commit()
+        if row is None:
+            return None
+        self._publish(row["id"])
+        row = dict(row)
+        row["profile"] = json.loads(row["profile"]) if row["profile"] else None
+        return row
+
+    def heartbeat(self, job_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                (time.time() + LEASE_SECONDS, job_id),
+            )
+            self._conn.commit()
+
+    def complete(self, job_id, text=None, artifact_id=None, errors=None):
+        errors = errors or {}
+        with self._lock:
+            row = self._conn.execute("SELECT text_prompt, image_prompt FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            wanted = (row["text_prompt"] is not None) + (row["image_prompt"] is not None)
+            status = "failed" if wanted and len(errors) >= wanted else "done"
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, text_result = ?, artifact_id = COALESCE(artifact_id, ?), "
+                "errors = ?, finished = ?, lease_until = NULL WHERE id = ?",
+                (status, text, artifact_id, json.dumps(errors), time.time(), job_id),
+            )
+            self._conn.commit()
+        self._publish(job_id)
+
+    # ----------------------------
+    # SHARED STATUS
+    # ----------------------------
+    def _publish(self, job_id):
+        """Copy the job's status (not its prompts or profile) to the state backend."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, owner, topic, status, text_result, artifact_id, errors, worker, created, finished, lease_until, "
+                "text_prompt IS NOT NULL AS has_text, image_prompt IS NOT NULL AS has_image FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is not None:
+            self.state.set(f"job:{job_id}", dict(row))
+
+    # ----------------------------
+    # LOOKUP
+    # ----------------------------
+    def get(self, job_id):
+        """The job's row, or its published status if it ran on another replica."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is not None:
+            return dict(row)
+        record = self.state.get(f"job:{job_id}")
+        if record is None:
+            return None
+        # Published records only say which parts were requested.
+        record["text_prompt"] = "" if record.pop("has_text") else None
+        record["image_prompt"] = "" if record.pop("has_image") else None
+        return record
+
+    def handle(self, job_id):
+        row = self.get(job_id)
+        return QueuedJob(self, row) if row is not None else None
+
+    def recent(self, owner, limit=RECENT_LIMIT):
+        """Newest jobs first: [{"id", "topic", "status", "created", "finished"}, ...]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, topic, status, created, finished, text_prompt, image_prompt FROM jobs "
+                "WHERE owner = ? ORDER BY created DESC LIMIT ?",
+                (owner, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            workers = self._conn.execute(
+                "SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'running' AND worker NOT LIKE 'app%'"
+            ).fetchone()[0]
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({status: count for status, count in rows})
+        counts["busy_workers"] = workers
+        return counts
+
+
+# ----------------------------
+# JOB HANDLE
+# ----------------------------
+class QueuedJob:
+    """
+    Read side of a queued job with the same interface as GenerationJob
+    (parts, status, result, error, done, elapsed), so the generator page
+    polls either one the same way. State is read from the queue each time.
+    """
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row["id"]
+        self.topic = row["topic"]
+        self.started = row["created"]
+        self.parts = {}
+        if row["text_prompt"] is not None:
+            self.parts["text"] = None
+        if row["image_prompt"] is not None:
+            self.parts["image"] = None
+        self.streams = {}
+        self.variants = {}
+        self.image_prompt = None
+
+    def _row(self):
+        row = self.queue.get(self.id)
+        if row is None:
+            # Purged, or its published status expired: report every part as failed.
+            return {
+                "status": "failed", "errors": json.dumps({"text": MISSING_JOB, "image": MISSING_JOB}),
+                "text_result": None, "artifact_id": None, "created": self.started, "finished": None,
+            }
+        if row["status"] == "running" and (row.get("worker") or "").startswith("app"):
+            # Rows from before app leases have none: fall back to the job's age.
+            lease_until = row.get("lease_until") or row["created"] + LEASE_SECONDS
+            if lease_until < time.time():
+                # The app process running it stopped renewing its lease; nobody will finish it.
+                return {**row, "status": "failed", "errors": json.dumps({"text": INTERRUPTED, "image": INTERRUPTED})}
+        return row
+
+    def done(self):
+        return self._row()["status"] in ("done", "failed")
+
+    def state(self):
+        """"queued", "running", "done" or "failed" for the job as a whole."""
+        return self._row()["status"]
+
+    def _errors(self, row):
+        errors = json.loads(row["errors"])
+        if "image" in self.parts and "image" not in errors and row["status"] == "done" and not (
+            row["artifact_id"] and get_artifact_store().exists(row["artifact_id"])
+        ):
+            # Old worksheets can outlive their image (the artifact store is size-capped).
+            errors["image"] = MISSING_IMAGE
+        return errors
+
+    def status(self, name):
+        row = self._row()
+        if row["status"] not in ("done", "failed"):
+            return "running"
+        return "failed" if name in self._errors(row) else "done"
+
+    def result(self, name):
+        row = self._row()
+        return row["text_result"] if name == "text" else row["artifact_id"]
+
+    def error(self, name):
+        message = self._errors(self._row()).get(name)
+        return RuntimeError(message) if message else None
+
+    def elapsed(self):
+        finished = self._row()["finished"]
+        return (finished or time.time()) - self.started
+
+
+# ----------------------------
+# EXECUTION (worker processes)
+# ----------------------------
+def run_queued_job(queue, runner, row):
+    """Run one claimed job on a JobRunner, renewing its lease until it finishes."""
+    job = runner.submit(
+        row["topic"],
+        text_prompt=row["text_prompt"],
+        image_prompt=row["image_prompt"],
+        profile=row["profile"],
+    )
+    pending = set(job.parts.values())
+    while pending:
+        _, pending = concurrent.futures.wait(pending, timeout=HEARTBEAT_SECONDS)
+        if pending:
+            queue.heartbeat(row["id"])
+    text, artifact_id, errors = _outcome(job.parts)
+    if artifact_id is not None:
+        # Render previews and downloads here rather than in the app's reruns.
+        for variant in VARIANTS:
+            runner.artifacts.variant_path(artifact_id, variant)
+    queue.complete(row["id"], text, artifact_id, errors)
@@ -0,0 +1,435 @@
+# utils/jobs.py
+import asyncio
+import concurrent.futures
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+
+from utils.artifacts import get_artifact_store
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE, TEXT_MODEL, get_backend, supports_native_n
+from utils.cache import cache_key, get_cache
+from utils.metrics import get_metrics
+from utils.profile import as_profile
+from utils.prompts import build_sheet_prompt, build_text_prompt
+from utils.renderer import can_render, has_layout, render_sheet, render_worksheet
+from utils.resilience import CircuitOpenError, ResilientBackend, is_retryable
+from utils.singleflight import SingleFlight
+from utils.structured import WORKSHEET_SCHEMA, parse_sheet, sheet_markdown
+
+logger = logging.getLogger(__name__)
+
+# Ages whose cached text for the same topic may stand in while the API is down.
+FALLBACK_AGE_SPREAD = 2
+
+
+# ----------------------------
+# TEXT STREAM BUFFER
+# ----------------------------
+class TextStream:
+    """
+    Thread-safe token buffer filled on the job loop and drained by the
+    Streamlit script thread (e.g. through st.write_stream).
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._cond = threading.Condition()
+        self.finished = False
+        self.started = time.time()
+        self.first_token_at = None
+        self.finished_at = None
+        self.total_tokens = None
+
+    def push(self, chunk):
+        with self._cond:
+            if self.first_token_at is None:
+                self.first_token_at = time.time()
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, total_tokens=None):
+        with self._cond:
+            self.finished = True
+            self.finished_at = time.time()
+            self.total_tokens = total_tokens
+            self._cond.notify_all()
+
+    def iter_chunks(self, poll_seconds=0.1):
+        """Yield chunks from the start of the stream until it finishes."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._chunks) and not self.finished:
+                    self._cond.wait(poll_seconds)
+                pending = self._chunks[index:]
+                index = len(self._chunks)
+                finished = self.finished
+            for chunk in pending:
+                yield chunk
+            if finished and index >= len(self._chunks):
+                return
+
+    def text(self):
+        with self._cond:
+            return "".join(self._chunks)
+
+    def metrics(self):
+        """Time-to-first-token, total time (seconds) and total tokens for this request."""
+        return {
+            "ttft": (self.first_token_at - self.started) if self.first_token_at else None,
+            "total": (self.finished_at - self.started) if self.finished_at else None,
+            "tokens": self.total_tokens,
+        }
+
+
+# ----------------------------
+# JOB HANDLE
+# ----------------------------
+class GenerationJob:
+    """
+    Handle for one "generate" action. Each part ("text", "image") is a
+    concurrent.futures.Future running on the shared event loop, so the
+    handle can live in st.session_state and be polled across reruns.
+    Text parts resolve to the activity text, image parts to an artifact ID
+    in the ArtifactStore (never raw image bytes).
+    """
+
+    def __init__(self, topic):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.started = time.time()
+        self.parts = {}
+        self.streams = {}
+        # Multi-variant runs: part name ("variant-1", ...) -> variant number.
+        self.image_prompt = None
+        self.variants = {}
+
+    def done(self):
+        return all(future.done() for future in self.parts.values())
+
+    def status(self, name):
+        future = self.parts[name]
+        if not future.done():
+            return "running"
+        return "failed" if future.exception() is not None else "done"
+
+    def result(self, name):
+        return self.parts[name].result()
+
+    def error(self, name):
+        future = self.parts[name]
+        return future.exception() if future.done() else None
+
+    def elapsed(self):
+        return time.time() - self.started
+
+
+def _should_fall_back(error):
+    return isinstance(error, CircuitOpenError) or is_retryable(error)
+
+
+def _fallback_prompts(topic, profile):
+    """Text prompts for the same topic at nearby ages, closest first."""
+    try:
+        age = int(as_profile(profile).child_age)
+    except (TypeError, ValueError):
+        return ()
+    ages = sorted(
+        (candidate for candidate in range(age - FALLBACK_AGE_SPREAD, age + FALLBACK_AGE_SPREAD + 1)
+         if candidate != age and candidate > 0),
+        key=lambda candidate: abs(candidate - age),
+    )
+    return tuple(build_text_prompt(topic, {"child_age": candidate}) for candidate in ages)
+
+
+def _completed(value):
+    future = concurrent.futures.Future()
+    future.set_result(value)
+    return future
+
+
+def _then(source, fn):
+    """Future for fn(source.result()); failures are passed through unchanged."""
+    future = concurrent.futures.Future()
+
+    def copy(done):
+        if done.exception() is not None:
+            future.set_exception(done.exception())
+            return
+        try:
+            future.set_result(fn(done.result()))
+        except Exception as e:
+            future.set_exception(e)
+
+    source.add_done_callback(copy)
+    return future
+
+
+def _item_future(source, index):
+    """Future for source.result()[index], so each variant can be polled on its own."""
+    return _then(source, lambda result: result[index])
+
+
+# ----------------------------
+# JOB RUNNER
+# ----------------------------
+class JobRunner:
+    """Runs backend calls on a background event loop shared by all sessions."""
+
+    def __init__(self, backend=None, cache=None, artifacts=None):
+        self.backend = backend or ResilientBackend(get_backend())
+        self.cache = cache or get_cache()
+        self.artifacts = artifacts or get_artifact_store()
+        # Identical calls already in flight (from any session or a prefetch)
+        # are joined instead of re-issued.
+        self.inflight = SingleFlight()
+        self._streams = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="ausome-jobs", daemon=True
+        )
+        self._thread.start()
+
+    async def _text_task(self, prompt, fallbacks=()):
+        try:
+            text = await self.backend.generate_text(prompt)
+        except Exception as e:
+            text = self._fallback_text(e, prompt, fallbacks)
+            if text is None:
+                raise
+            return text
+        self.cache.put("text", prompt, TEXT_MODEL, text)
+        return text
+
+    async def _text_stream_task(self, prompt, stream, fallbacks=()):
+        total_tokens = None
+        try:
+            total_tokens = await self.backend.stream_text(prompt, stream.push)
+        except Exception as e:
+            text = None if stream.text() else self._fallback_text(e, prompt, fallbacks)
+            if text is None:
+                raise
+            stream.push(text)
+            return text
+        finally:
+            stream.finish(total_tokens)
+        text = stream.text()
+        self.cache.put("text", prompt, TEXT_MODEL, text)
+        metrics = stream.metrics()
+        logger.info(
+            "text stream: ttft=%.2fs total=%.2fs tokens=%s",
+            metrics["ttft"] or 0.0, metrics["total"] or 0.0, metrics["tokens"]
+        )
+        return text
+
+    async def _image_task(self, prompt, render=None):
+        try:
+            image_data = await self.backend.generate_image(prompt)
+        except Exception as e:
+            if not _should_fall_back(e):
+                raise
+            image_data = self.cache.get_stale("image", prompt, IMAGE_MODEL, IMAGE_SIZE)
+            if image_data is None and render is None:
+                raise
+            get_metrics().count("fallback_total")
+            logger.warning("image fallback (%s): %s", "cache" if image_data else "local render", e)
+            if image_data is None:
+                return await self._render_task(*render)
+        else:
+            self.cache.put("image", prompt, IMAGE_MODEL, image_data, IMAGE_SIZE)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.artifacts.put, image_data)
+
+    async def _variant_task(self, prompt, variant):
+        image_data = await self.backend.generate_image(prompt)
+        self.cache.put("image", prompt, IMAGE_MODEL, image_data, IMAGE_SIZE, variant=variant)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.artifacts.put, image_data)
+
+    async def _native_variants_task(self, prompt, variants):
+        images = await self.backend.generate_images(prompt, len(variants))
+        loop = asyncio.get_running_loop()
+        artifact_ids = []
+        for variant, image_data in zip(variants, images):
+            self.cache.put("image", prompt, IMAGE_MODEL, image_data, IMAGE_SIZE, variant=variant)
+            artifact_ids.append(await loop.run_in_executor(None, self.artifacts.put, image_data))
+        return artifact_ids
+
+    def _fallback_text(self, error, prompt, fallbacks):
+        """Cached text for this prompt (even if stale) or the same topic at a nearby age."""
+        if not _should_fall_back(error):
+            return None
+        for candidate in (prompt, *fallbacks):
+            value = self.cache.get_stale("text", candidate, TEXT_MODEL)
+            if value is not None:
+                get_metrics().count("fallback_total")
+                logger.warning("text fallback from cache: %s", error)
+                return value.decode("utf-8")
+        return None
+
+    async def _sheet_task(self, prompt):
+        sheet = parse_sheet(await self.backend.generate_json(prompt, WORKSHEET_SCHEMA))
+        self.cache.put("sheet", prompt, TEXT_MODEL, json.dumps(sheet))
+        return sheet
+
+    async def _sheet_render_task(self, sheet_future, profile, activity_type):
+        sheet = await asyncio.wrap_future(sheet_future)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.artifacts.put(render_sheet(sheet, profile, activity_type))
+        )
+
+    def _render_artifact(self, activity_type, profile):
+        return self.artifacts.put(render_worksheet(activity_type, profile))
+
+    async def _render_task(self, activity_type, profile):
+        # Pillow drawing is CPU-bound; keep it off the event loop.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._render_artifact, activity_type, profile)
+
+    async def _batch_task(self, batch):
+        return await batch.run(self.backend, self.cache)
+
+    def submit_batch(self, batch):
+        """Run a utils.batch.BatchJob on the shared loop; returns a Future."""
+        return self._run(self._batch_task(batch))
+
+    def submit_workbook(self, workbook):
+        """Run a utils.workbook.WorkbookJob on the shared loop; returns a Future."""
+        return self._run(workbook.run(self.backend, self.cache, self.artifacts))
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def prefetch(self, kind, prompt):
+        """
+        Warm the cache for one text or image prompt in the background.
+        Returns the Future, or None if it is already cached or in flight.
+        """
+        model, size = (TEXT_MODEL, None) if kind == "text" else (IMAGE_MODEL, IMAGE_SIZE)
+        key = cache_key(kind, prompt, model, size)
+        if self.inflight.get(key) is not None or self.cache.contains(kind, prompt, model, size):
+            return None
+        task = self._text_task if kind == "text" else self._image_task
+        future, joined = self.inflight.do(key, functools.partial(self._start, task, prompt))
+        return None if joined else future
+
+    def _start(self, task, prompt):
+        return self._run(task(prompt))
+
+    def _start_text_stream(self, key, prompt, fallbacks=()):
+        stream = TextStream()
+        self._streams[key] = stream
+        future = self._run(self._text_stream_task(prompt, stream, fallbacks))
+        future.add_done_callback(lambda _: self._streams.pop(key, None))
+        return future
+
+    def _submit_variants(self, job, prompt, count):
+        """
+        One part per variant ("variant-1" ... "variant-N"), each resolving to an
+        artifact ID as soon as its own call finishes. Variants already cached
+        for this prompt (e.g. rejected by another teacher) are reused.
+        """
+        job.image_prompt = prompt
+        missing = []
+        for variant in range(1, count + 1):
+            name = f"variant-{variant}"
+            job.variants[name] = variant
+            key = cache_key("image", prompt, IMAGE_MODEL, IMAGE_SIZE, variant)
+            cached = None if self.inflight.get(key) else self.cache.get(
+                "image", prompt, IMAGE_MODEL, IMAGE_SIZE, variant=variant
+            )
+            if cached is not None:
+                job.parts[name] = _completed(self.artifacts.put(cached))
+            elif supports_native_n(IMAGE_MODEL):
+                missing.append(variant)
+            else:
+                # dall-e-3 only allows n=1: one concurrent call per variant.
+                task = functools.partial(self._variant_task, variant=variant)
+                job.parts[name], _ = self.inflight.do(key, functools.partial(self._start, task, prompt))
+        if missing:
+            future = self._run(self._native_variants_task(prompt, missing))
+            for index, variant in enumerate(missing):
+                job.parts[f"variant-{variant}"] = _item_future(future, index)
+
+    def choose_variant(self, job, name):
+        """
+        Make the picked variant the job's image and the prompt's main cached
+        image; the other variants stay cached for matching prompts.
+        """
+        image_data = self.cache.get("image", job.image_prompt, IMAGE_MODEL, IMAGE_SIZE, variant=job.variants[name])
+        if image_data is not None:
+            self.cache.put("image", job.image_prompt, IMAGE_MODEL, image_data, IMAGE_SIZE)
+        job.parts["image"] = job.parts[name]
+
+    def submit(self, topic, text_prompt=None, image_prompt=None, stream_text=False, profile=None, variants=1):
+        """
+        Start text and/or image generation concurrently and return a GenerationJob.
+        Cached results resolve immediately without touching the API, and a
+        prompt already in flight (from another session or a prefetch) is
+        joined rather than sent again. With stream_text, text tokens are
+        exposed through job.streams["text"]. When a profile is given and
+        topic is a structured activity, the image is rendered locally
+        instead of calling the image model. With variants > 1 the image is
+        generated that many times concurrently (see _submit_variants) and the
+        caller picks one with choose_variant.
+        """
+        job = GenerationJob(topic)
+        if text_prompt is not None:
+            key = cache_key("text", text_prompt, TEXT_MODEL)
+            cached = None if self.inflight.get(key) else self.cache.get("text", text_prompt, TEXT_MODEL)
+            if cached is not None:
+                job.parts["text"] = _completed(cached.decode("utf-8"))
+            else:
+                fallbacks = _fallback_prompts(topic, profile) if profile is not None else ()
+                if stream_text:
+                    start = functools.partial(self._start_text_stream, key, text_prompt, fallbacks)
+                else:
+                    start = functools.partial(
+                        self._start, functools.partial(self._text_task, fallbacks=fallbacks), text_prompt
+                    )
+                job.parts["text"], _ = self.inflight.do(key, start)
+                stream = self._streams.get(key)
+                if stream is not None:
+                    job.streams["text"] = stream
+        if image_prompt is not None and profile is not None and can_render(topic):
+            job.parts["image"] = self._run(self._render_task(topic, as_profile(profile)))
+        elif image_prompt is not None and variants > 1:
+            self._submit_variants(job, image_prompt, variants)
+        elif image_prompt is not None:
+            key = cache_key("image", image_prompt, IMAGE_MODEL, IMAGE_SIZE)
+            cached = None if self.inflight.get(key) else self.cache.get("image", image_prompt, IMAGE_MODEL, IMAGE_SIZE)
+            if cached is not None:
+                job.parts["image"] = _completed(self.artifacts.put(cached))
+            else:
+                # Structured sheets can still be drawn locally if the image API is down.
+                render = (topic, as_profile(profile)) if profile is not None and has_layout(topic) else None
+                job.parts["image"], _ = self.inflight.do(
+                    key, functools.partial(self._start, functools.partial(self._image_task, render=render), image_prompt)
+                )
+        return job
+
+    def submit_structured(self, topic, profile, want_text=True, want_image=True):
+        """
+        Structured worksheet (see utils.structured): one JSON-schema chat call,
+        shown as the activity text and drawn locally as the worksheet image.
+        The sheet is cached by its prompt (topic and child age), so another
+        child of the same age gets the same worksheet without any API call.
+        """
+        job = GenerationJob(topic)
+        profile = as_profile(profile)
+        prompt = build_sheet_prompt(topic, profile)
+        key = cache_key("sheet", prompt, TEXT_MODEL)
+        cached = None if self.inflight.get(key) else self.cache.get("sheet", prompt, TEXT_MODEL)
+        if cached is not None:
+            sheet = _completed(parse_sheet(cached))
+        else:
+            sheet, _ = self.inflight.do(key, functools.partial(self._start, self._sheet_task, prompt))
+        if want_text:
+            job.parts["text"] = _then(sheet, sheet_markdown)
+        if want_image:
+            job.parts["image"] = self._run(self._sheet_render_task(sheet, profile, topic))
+        return job
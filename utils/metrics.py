@@ -0,0 +1,189 @@
+# utils/metrics.py
+# Hot-path instrumentation. Each stage of a generation records its wall time:
+#   prompt_build   - building the worksheet / text prompt
+#   text_api       - chat.completions.create (plain or streamed)
+#   image_api      - images.generate
+#   image_decode   - base64 decode of the returned image
+#   artifact_store - normalizing and writing the image to the artifact store
+#   local_render   - Pillow rendering of structured worksheets
+#   variant_render - preview / print / PDF variants for display and download
+# API stages also count tokens, images and estimated cost. Every sample is
+# logged as one JSON line on the "ausome.metrics" logger (and appended to
+# AUSOME_METRICS_LOG if set); rolling summaries are available as
+# Prometheus-style text for the admin page.
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from utils.timing import percentile
+
+logger = logging.getLogger("ausome.metrics")
+
+METRICS_HISTORY = 1000
+METRICS_LOG = os.getenv("AUSOME_METRICS_LOG")
+
+# USD list prices: per token for text models, per image for image models.
+TEXT_PRICES = {"gpt-4.1-mini": {"prompt": 0.40 / 1_000_000, "completion": 1.60 / 1_000_000}}
+IMAGE_PRICES = {"dall-e-3": {"1024x1024": 0.040, "1024x1792": 0.080, "1792x1024": 0.080}}
+
+
+class Metrics:
+    def __init__(self, history=METRICS_HISTORY, log_path=METRICS_LOG):
+        self._samples = defaultdict(lambda: deque(maxlen=history))
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+        self._log_path = log_path
+
+    # ----------------------------
+    # RECORDING
+    # ----------------------------
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        Time the wrapped block as one sample of stage `name`. The yielded dict
+        can be filled with token counts (prompt_tokens, completion_tokens),
+        images and model before the block ends.
+        """
+        started = time.perf_counter()
+        try:
+            yield fields
+        except Exception as exc:
+            fields["error"] = type(exc).__name__
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **fields)
+
+    def observe(self, name, seconds, **fields):
+        model = fields.get("model", "")
+        with self._lock:
+            self._counters[("stage_calls_total", name, "")] += 1
+            if fields.get("error"):
+                self._counters[("stage_errors_total", name, "")] += 1
+            else:
+                self._samples[name].append(seconds)
+            for kind in ("prompt", "completion"):
+                tokens = fields.get(f"{kind}_tokens")
+                if tokens:
+                    self._counters[(f"{kind}_tokens_total", "", model)] += tokens
+            if fields.get("images"):
+                self._counters[("images_total", "", model)] += fields["images"]
+            cost = estimate_cost(fields)
+            if cost:
+                self._counters[("cost_usd_total", "", model)] += cost
+        self._log({"stage": name, "seconds": round(seconds, 6), **fields})
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[(name, "", "")] += value
+
+    def _log(self, record):
+        line = json.dumps({"ts": round(time.time(), 3), **record}, default=str)
+        logger.info(line)
+        if self._log_path:
+            with self._lock, open(self._log_path, "a") as f:
+                f.write(line + "\n")
+
+    # ----------------------------
+    # READING
+    # ----------------------------
+    def stage_summary(self):
+        """Rolling count / p50 / p95 / mean per stage, in milliseconds."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            errors = {key[1]: value for key, value in self._counters.items() if key[0] == "stage_errors_total"}
+        rows = []
+        for name in sorted(samples):
+            ordered = sorted(samples[name])
+            if not ordered:
+                continue
+            rows.append({
+                "stage": name,
+                "count": len(ordered),
+                "errors": int(errors.get(name, 0)),
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+            })
+        return rows
+
+    def totals(self):
+        """Token, image and cost counters summed over models."""
+        with self._lock:
+            counters = dict(self._counters)
+        totals = defaultdict(float)
+        for (name, stage, _), value in counters.items():
+            if not stage:
+                totals[name] += value
+        return dict(totals)
+
+    def prometheus_text(self, gauges=None):
+        """Exposition-format text: counters, stage quantiles and extra gauges."""
+        with self._lock:
+            counters = dict(self._counters)
+        lines = []
+        for (name, stage, model), value in sorted(counters.items()):
+            labels = _labels(stage=stage, model=model)
+            lines.append(f"ausome_{name}{labels} {value:g}")
+        for row in self.stage_summary():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                labels = _labels(stage=row["stage"], quantile=quantile)
+                lines.append(f"ausome_stage_seconds{labels} {row[key] / 1000:.6f}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"ausome_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    parts = [f'{key}="{value}"' for key, value in labels.items() if value]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def estimate_cost(fields):
+    """Estimated USD for one API call from its model, tokens and image count."""
+    model = fields.get("model")
+    if model in TEXT_PRICES:
+        prices = TEXT_PRICES[model]
+        return (fields.get("prompt_tokens") or 0) * prices["prompt"] + \
+            (fields.get("completion_tokens") or 0) * prices["completion"]
+    if model in IMAGE_PRICES and fields.get("images"):
+        return fields["images"] * IMAGE_PRICES[model].get(fields.get("size"), 0.0)
+    return 0.0
+
+
+def timed_stage(name):
+    """Decorator recording every call of a sync or async function as stage `name`."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_metrics().stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide metrics shared by every Streamlit session and worker thread."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
@@ -0,0 +1,120 @@
+# utils/prefetch.py
+# Opt-in speculative prefetch. Once the focus and age are known, the next
+# "Generate" click is almost always one of a handful of activity types, so
+# we warm the cache for the most likely ones under a spend budget and a cap
+# on in-flight calls. The click then resolves from the cache (or joins the
+# prefetch that is still running) instead of starting a fresh call.
+import collections
+import os
+import threading
+import time
+
+from utils.profile import generator_profile
+from utils.prompts import build_image_prompt, build_text_prompt
+from utils.renderer import can_render
+
+PREFETCH_TOP_K = int(os.getenv("AUSOME_PREFETCH_TOP_K", "2"))
+PREFETCH_CONCURRENCY = int(os.getenv("AUSOME_PREFETCH_CONCURRENCY", "2"))
+PREFETCH_BUDGET_USD = float(os.getenv("AUSOME_PREFETCH_BUDGET_USD", "1.00"))
+PREFETCH_BUDGET_WINDOW_SECONDS = 24 * 3600
+
+# Rough list prices per call, used only to enforce the budget.
+ESTIMATED_COST_USD = {"text": 0.002, "image": 0.04}
+
+# Candidates per focus, in the order the generator tab offers them.
+FOCUS_ACTIVITIES = {
+    "Cognitive": ["CVC Blending", "Shape Tracing", "Line Tracing", "Alphabet Tracing", "Writing Practice"],
+    "Self-Help": ["Personal Hygiene", "Daily Routines", "Household Skills"],
+}
+
+
+class Prefetcher:
+    """Process-wide prefetcher; learns which activities are clicked most per focus."""
+
+    def __init__(self, runner, top_k=PREFETCH_TOP_K, concurrency=PREFETCH_CONCURRENCY,
+                 budget_usd=PREFETCH_BUDGET_USD, window_seconds=PREFETCH_BUDGET_WINDOW_SECONDS):
+        self.runner = runner
+        self.top_k = top_k
+        self.concurrency = concurrency
+        self.budget_usd = budget_usd
+        self.window_seconds = window_seconds
+        self.clicks = collections.defaultdict(collections.Counter)
+        self.issued = collections.Counter()
+        self._spend = collections.deque()  # (timestamp, usd)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def record_click(self, focus, activity_type):
+        """Count a real "Generate" click so future predictions follow usage."""
+        with self._lock:
+            self.clicks[focus][activity_type] += 1
+
+    def predict(self, focus):
+        """Top-k activity types for this focus: most clicked first, then menu order."""
+        candidates = FOCUS_ACTIVITIES.get(focus, [])
+        with self._lock:
+            counts = self.clicks[focus]
+            ranked = sorted(candidates, key=lambda name: (-counts[name], candidates.index(name)))
+        return ranked[:self.top_k]
+
+    def spent(self):
+        with self._lock:
+            self._expire_locked(time.time())
+            return sum(usd for _, usd in self._spend)
+
+    def _expire_locked(self, now):
+        while self._spend and now - self._spend[0][0] > self.window_seconds:
+            self._spend.popleft()
+
+    def _reserve(self, kind):
+        """Take a concurrency slot and budget for one call; returns the spend entry or None."""
+        entry = (time.time(), ESTIMATED_COST_USD[kind])
+        with self._lock:
+            self._expire_locked(entry[0])
+            if self._in_flight >= self.concurrency:
+                return None
+            if sum(usd for _, usd in self._spend) + entry[1] > self.budget_usd:
+                return None
+            self._in_flight += 1
+            self._spend.append(entry)
+            return entry
+
+    def _refund(self, entry):
+        with self._lock:
+            self._in_flight -= 1
+            if entry in self._spend:
+                self._spend.remove(entry)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def warm(self, focus, profile, include_images=True):
+        """
+        Start prefetches for the likely activities of this profile. Cheap to
+        call on every rerun: cached or in-flight prompts are skipped.
+        Returns the number of calls started.
+        """
+        # Same defaults as the generator page, or the prompts (and cache keys) differ.
+        profile = generator_profile(profile)
+        started = 0
+        for activity_type in self.predict(focus):
+            requests = [("text", build_text_prompt(activity_type, profile))]
+            # Structured sheets are rendered locally, so only custom images are worth paying for.
+            if include_images and not can_render(activity_type):
+                requests.append(("image", build_image_prompt(activity_type, profile)))
+            for kind, prompt in requests:
+                entry = self._reserve(kind)
+                if entry is None:
+                    return started
+                future = self.runner.prefetch(kind, prompt)
+                if future is None:
+                    # Already cached or in flight: hand the slot and budget back.
+                    self._refund(entry)
+                    continue
+                future.add_done_callback(self._release)
+                with self._lock:
+                    self.issued[kind] += 1
+                started += 1
+        return started
+
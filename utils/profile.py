@@ -0,0 +1,196 @@
+# utils/profile.py
+
+# Every child profile field and its empty value. Shared by the profile
+# form (ensure_session_state), roster imports and prompt building.
+PROFILE_DEFAULTS = {
+    # Basic Info
+    "child_name": "",
+    "child_age": "",
+    "child_birthday": "",
+    "child_gender": "",
+    "parent_name": "",
+    "parent_contact": "",
+
+    # Diagnosis
+    "diagnosis": "",
+    "diagnosis_date": "",
+    "diagnosed_by": "",
+    "current_therapies": [],
+
+    # Communication
+    "communication_method": "",
+    "expressive_level": "",
+    "receptive_level": "",
+    "communication_challenges": [],
+
+    # Sensory
+    "sensory_sensitivities": [],
+    "sensory_needs": [],
+    "calming_strategies": [],
+
+    # Strengths & Interests
+    "child_strengths": "",
+    "child_interests": "",
+
+    # Behavior
+    "behavior_triggers": "",
+    "behavior_management": "",
+
+    # Learning
+    "learning_style": "",
+    "academic_focus": "",
+
+    # Routines
+    "routine_morning": "",
+    "routine_school": "",
+    "routine_bedtime": "",
+    "eating_notes": "",
+
+    # Safety
+    "allergies": "",
+    "emergency_contact": "",
+    "safety_concerns": "",
+}
+
+# Fields stored as lists (multiselects in the profile form).
+LIST_FIELDS = tuple(key for key, value in PROFILE_DEFAULTS.items() if isinstance(value, list))
+
+
+def profile_from_record(record):
+    """
+    Build a complete profile dict from a roster row or saved record.
+    Missing fields get their defaults, list fields may be given as
+    "a; b" strings, and extra columns (e.g. sensory_profile) are kept.
+    """
+    profile = {key: (list(value) if isinstance(value, list) else value)
+               for key, value in PROFILE_DEFAULTS.items()}
+    for key, value in record.items():
+        if key is None:
+            continue
+        key = key.strip()
+        if key in LIST_FIELDS and isinstance(value, str):
+            value = [item.strip() for item in value.replace(",", ";").split(";") if item.strip()]
+        elif isinstance(value, str):
+            value = value.strip()
+        profile[key] = value
+
+    age = profile.get("child_age")
+    if isinstance(age, str) and age.isdigit():
+        profile["child_age"] = int(age)
+    return profile
+
+
+# ----------------------------
+# IMMUTABLE PROMPT PROFILE
+# ----------------------------
+# Profile fields that prompts actually read. Some come from the generator
+# page's profile tab rather than the main profile form.
+PROMPT_FIELDS = (
+    "child_name",
+    "child_age",
+    "learning_style",
+    "academic_level",
+    "behavioral_notes",
+    "child_strengths",
+    "child_interests",
+    "sensory_profile",
+    "sensory_triggers",
+    "comm_level",
+    "comm_methods",
+)
+
+
+class ChildProfile:
+    """
+    Frozen snapshot of the prompt fields of a child profile. It is hashable,
+    so prompts built from it can be memoized, and it needs no Streamlit.
+    """
+
+    __slots__ = PROMPT_FIELDS
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            value = fields.get(name, "")
+            if value is None:
+                value = ""
+            elif isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Snapshot st.session_state, a roster row or any dict-like profile."""
+        return cls(**{name: mapping.get(name, "") for name in cls.__slots__})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChildProfile is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ChildProfile is immutable")
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, ChildProfile) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"ChildProfile(child_name={self.child_name!r}, child_age={self.child_age!r})"
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+
+def as_profile(profile):
+    """Return profile as a ChildProfile, snapshotting mappings as needed."""
+    if isinstance(profile, ChildProfile):
+        return profile
+    return ChildProfile.from_mapping(profile)
+
+
+# ----------------------------
+# GENERATOR DEFAULTS
+# ----------------------------
+# What the generator page's profile tab shows for a field that is still
+# unset (the main profile form does not ask for all of them), plus the focus.
+# Prompts built away from that page, e.g. by the prefetcher, start from the
+# same values so they hit the same cache keys as the generator's requests.
+GENERATOR_DEFAULTS = {
+    "child_name": "",
+    "child_age": 5,
+    "learning_style": "Visual",
+    "academic_level": "Preschool",
+    "behavioral_notes": "",
+    "child_strengths": "",
+    "child_interests": "",
+    "sensory_profile": "Medium",
+    "sensory_triggers": "",
+    "comm_level": "Basic Words",
+    "comm_methods": "",
+    "child_activity": "Cognitive",
+}
+
+
+def generator_value(name, value):
+    """One field as the generator page's widgets hold it (single choice, age 1-18)."""
+    default = GENERATOR_DEFAULTS[name]
+    if isinstance(value, list):
+        value = value[0] if value else default
+    if name == "child_age":
+        try:
+            value = min(max(int(value), 1), 18)
+        except (TypeError, ValueError):
+            value = default
+    elif value is None:
+        value = default
+    return value
+
+
+def generator_profile(mapping):
+    """The ChildProfile the generator page would build from this session or record."""
+    return ChildProfile(**{
+        name: generator_value(name, mapping.get(name, GENERATOR_DEFAULTS[name])) for name in PROMPT_FIELDS
+    })
@@ -0,0 +1,203 @@
+# utils/profile_store.py
+# Persistent child profiles in SQLite. Each profile is a row in `profiles`
+# (indexed by name, age band and diagnosis for fast lookup) plus one row
+# per field in `profile_fields`, so "Save Profile" only writes the fields
+# that actually changed. Every profile belongs to one owner (the teacher's
+# session ID) and is only found, loaded or changed under that owner.
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.profile import PROFILE_DEFAULTS, PROMPT_FIELDS
+
+DATA_DIR = os.getenv("AUSOME_DATA_DIR", ".ausome_data")
+
+# Main profile form fields plus the extra ones the generator page edits.
+STORED_FIELDS = tuple(PROFILE_DEFAULTS) + tuple(f for f in PROMPT_FIELDS if f not in PROFILE_DEFAULTS)
+
+AGE_BANDS = ((1, 5, "1-5"), (6, 8, "6-8"), (9, 12, "9-12"), (13, 18, "13-18"))
+
+
+def age_band(age):
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return ""
+    for low, high, label in AGE_BANDS:
+        if low <= age <= high:
+            return label
+    return ""
+
+
+def _encode(value):
+    if isinstance(value, datetime.date):
+        return json.dumps({"__date__": value.isoformat()})
+    return json.dumps(value)
+
+
+def _decode(text):
+    value = json.loads(text)
+    if isinstance(value, dict) and "__date__" in value:
+        return datetime.date.fromisoformat(value["__date__"])
+    return value
+
+
+class ProfileStore:
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "profiles.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL DEFAULT '',
+                child_name TEXT NOT NULL,
+                name_key TEXT NOT NULL,
+                child_age INTEGER,
+                age_band TEXT NOT NULL DEFAULT '',
+                diagnosis TEXT NOT NULL DEFAULT '',
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS profile_fields (
+                profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (profile_id, field)
+            );
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")}
+        if "owner" not in columns:
+            # Profiles saved before owners existed stay unowned, so nobody can list them.
+            self._conn.execute("ALTER TABLE profiles ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._conn.executescript(
+            """
+            DROP INDEX IF EXISTS profiles_name;
+            DROP INDEX IF EXISTS profiles_age_band;
+            DROP INDEX IF EXISTS profiles_diagnosis;
+            CREATE INDEX IF NOT EXISTS profiles_owner_name ON profiles (owner, name_key);
+            CREATE INDEX IF NOT EXISTS profiles_owner_age_band ON profiles (owner, age_band);
+            CREATE INDEX IF NOT EXISTS profiles_owner_diagnosis ON profiles (owner, diagnosis COLLATE NOCASE);
+            """
+        )
+        self._conn.commit()
+
+    # ----------------------------
+    # LOOKUP
+    # ----------------------------
+    def find(self, owner, name=None, age_band=None, diagnosis=None, limit=200):
+        """The owner's profile summaries (id, child_name, child_age, diagnosis) matching the filters."""
+        if not owner:
+            return []
+        clauses, params = ["owner = ?"], [owner]
+        if name:
+            clauses.append("name_key LIKE ?")
+            params.append(name.strip().lower() + "%")
+        if age_band:
+            clauses.append("age_band = ?")
+            params.append(age_band)
+        if diagnosis:
+            clauses.append("diagnosis = ? COLLATE NOCASE")
+            params.append(diagnosis.strip())
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, child_name, child_age, diagnosis FROM profiles WHERE {' AND '.join(clauses)} "
+                "ORDER BY name_key LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            {"id": row[0], "child_name": row[1], "child_age": row[2], "diagnosis": row[3]}
+            for row in rows
+        ]
+
+    def load(self, profile_id, owner):
+        """Full profile dict (every stored field), or None if the owner has no such profile."""
+        if not owner:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value FROM profile_fields JOIN profiles ON profiles.id = profile_id "
+                "WHERE profile_id = ? AND owner = ?",
+                (profile_id, owner),
+            ).fetchall()
+        if not rows:
+            return None
+        return {field: _decode(value) for field, value in rows}
+
+    # ----------------------------
+    # SAVE
+    # ----------------------------
+    def save(self, profile, owner, profile_id=None, previous=None):
+        """
+        Create or update one of the owner's profiles and return
+        (profile_id, changed_fields). With previous (the last loaded/saved
+        snapshot), only fields that differ from it are written.
+        """
+        if not owner:
+            raise ValueError("profiles must have an owner")
+        with self._lock:
+            result = self._save_locked(profile, owner, profile_id, previous)
+            self._conn.commit()
+        return result
+
+    def save_many(self, profiles, owner):
+        """Bulk import (e.g. a classroom roster) in one transaction; returns the new IDs."""
+        if not owner:
+            raise ValueError("profiles must have an owner")
+        with self._lock:
+            ids = [self._save_locked(profile, owner, None, None)[0] for profile in profiles]
+            self._conn.commit()
+        return ids
+
+    def _save_locked(self, profile, owner, profile_id, previous):
+        snapshot = {field: profile.get(field, PROFILE_DEFAULTS.get(field, "")) for field in STORED_FIELDS}
+        if profile_id is not None and previous is not None:
+            changed = {field: value for field, value in snapshot.items() if previous.get(field) != value}
+        else:
+            changed = snapshot
+        if profile_id is not None and not changed:
+            return profile_id, []
+
+        name = str(snapshot.get("child_name") or "").strip()
+        age = snapshot.get("child_age")
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            age = None
+        diagnosis = str(snapshot.get("diagnosis") or "").strip()
+        now = time.time()
+
+        if profile_id is not None:
+            updated = self._conn.execute(
+                "UPDATE profiles SET child_name = ?, name_key = ?, child_age = ?, age_band = ?, "
+                "diagnosis = ?, updated = ? WHERE id = ? AND owner = ?",
+                (name, name.lower(), age, age_band(age), diagnosis, now, profile_id, owner),
+            ).rowcount
+            if not updated:
+                # Deleted, or another owner's: save a new profile instead of touching it.
+                profile_id, changed = None, snapshot
+        if profile_id is None:
+            cursor = self._conn.execute(
+                "INSERT INTO profiles (owner, child_name, name_key, child_age, age_band, diagnosis, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (owner, name, name.lower(), age, age_band(age), diagnosis, now),
+            )
+            profile_id = cursor.lastrowid
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO profile_fields (profile_id, field, value) VALUES (?, ?, ?)",
+            [(profile_id, field, _encode(value)) for field, value in changed.items()],
+        )
+        return profile_id, list(changed)
+
+    def delete(self, profile_id, owner):
+        with self._lock:
+            if self._conn.execute("DELETE FROM profiles WHERE id = ? AND owner = ?", (profile_id, owner)).rowcount:
+                self._conn.execute("DELETE FROM profile_fields WHERE profile_id = ?", (profile_id,))
+            self._conn.commit()
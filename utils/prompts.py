@@ -0,0 +1,229 @@
+# utils/prompts.py
+# Prompt builders shared by the generator page, batch jobs and benchmarks.
+# Builders accept a ChildProfile or any profile mapping (st.session_state,
+# a roster row) and never import Streamlit. Static sections are rendered
+# once at import time and finished prompts are memoized per profile. Every
+# public builder returns the prompt after utils.compaction for its model.
+import functools
+
+from utils.backends import IMAGE_MODEL, TEXT_MODEL
+from utils.compaction import compact_prompt, compaction_report
+from utils.metrics import timed_stage
+from utils.profile import as_profile
+
+# ----------------------------
+# STATIC SECTIONS (rendered once)
+# ----------------------------
+ASD_DESIGN_RULES = """Follow ASD-friendly design:
+- Black & white only
+- Thick outlines, minimal details
+- Structured and predictable layout
+- Very simple instructions
+- Wide spacing
+"""
+
+_WORKSHEET_BASE_TEMPLATE = """
+You are an AI that generates sensory-friendly worksheets for children with ASD.
+
+Child Profile:
+- Age: {child_age}
+- Learning Style: {learning_style}
+- Behavioral Notes: {behavioral_notes}
+- Strengths & Interests: {child_interests}
+- Sensory Sensitivity: {sensory_profile}
+- Communication Level: {comm_level}
+
+""" + ASD_DESIGN_RULES
+
+_CHILD_CONTEXT_TEMPLATE = """
+Child Profile:
+- Name: {child_name}
+- Age: {child_age}
+- Learning Style: {learning_style}
+- Academic Level: {academic_level}
+
+Behavioral Information:
+- Notes: {behavioral_notes}
+
+Strengths & Interests:
+- Strengths: {child_strengths}
+- Interests: {child_interests}
+
+Sensory Profile:
+- Sensitivity Level: {sensory_profile}
+- Triggers: {sensory_triggers}
+
+Communication Profile:
+- Level: {comm_level}
+- Methods: {comm_methods}
+"""
+
+# Topics are concatenated rather than formatted so braces in free text are safe.
+_CUSTOM_TOPIC_HEAD = """
+Generate a sensory-friendly worksheet based on this topic:
+\""""
+
+_CUSTOM_TOPIC_TAIL = """"
+
+Requirements:
+- Black & white only
+- Simple illustrations
+- Very simple instructions
+- Structured layout
+- Header: "Name: ________"
+"""
+
+_TEXT_PROMPT_TEMPLATE = """
+    You are an expert SPED teacher.
+    Create an autism-friendly worksheet activity for a child age {child_age}.
+    Topic: {topic}
+
+    Include:
+    - clear instructions
+    - 3 to 5 items
+    - simple, encouraging tone
+    - very child-friendly language
+    """
+
+_SHEET_PROMPT_TEMPLATE = """
+    Create an autism-friendly worksheet for a child age {child_age}.
+    Topic: {topic}
+
+    Fill in:
+    - title: a short title
+    - instruction: one very simple sentence
+    - items: 3 to 5 short tasks or questions, one per line on the sheet
+    - word_list: up to 12 single words the child reads, traces or writes (e.g. CVC words, shape names, letters)
+    Use a simple, encouraging tone and very child-friendly language.
+    """
+
+IMAGE_PROMPT_PREFIX = "Black & white sensory-friendly worksheet for a child with ASD. "
+
+# ----------------------------
+# ACTIVITY TEMPLATE REGISTRY
+# ----------------------------
+ACTIVITY_TEMPLATES = {}
+
+
+def register_activity(name, instructions):
+    """Register (or replace) the worksheet instructions for an activity type."""
+    ACTIVITY_TEMPLATES[name] = instructions
+    _worksheet_prompt.cache_clear()
+
+
+# ----------------------------
+# CHILD CONTEXT FUNCTION
+# ----------------------------
+def _field(value):
+    # List fields (e.g. interests from a roster) read as "a, b" rather than a tuple repr.
+    return ", ".join(str(item) for item in value) if isinstance(value, tuple) else value
+
+
+def build_child_context(profile, model=TEXT_MODEL):
+    profile = as_profile(profile)
+    context = _CHILD_CONTEXT_TEMPLATE.format(**{name: _field(profile.get(name)) for name in profile.__slots__})
+    return compact_prompt(context, model)
+
+
+# ----------------------------
+# WORKSHEET PROMPT FUNCTION
+# ----------------------------
+@functools.lru_cache(maxsize=256)
+def _worksheet_base(profile):
+    return _WORKSHEET_BASE_TEMPLATE.format(
+        child_age=profile.child_age,
+        learning_style=_field(profile.learning_style),
+        behavioral_notes=_field(profile.behavioral_notes),
+        child_interests=_field(profile.child_interests),
+        sensory_profile=_field(profile.sensory_profile),
+        comm_level=_field(profile.comm_level),
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _worksheet_prompt(activity_type, profile):
+    base_profile = _worksheet_base(profile)
+    instructions = ACTIVITY_TEMPLATES.get(activity_type)
+    if instructions is not None:
+        return base_profile + instructions
+    # Default custom topic
+    return base_profile + _CUSTOM_TOPIC_HEAD + activity_type + _CUSTOM_TOPIC_TAIL
+
+
+@timed_stage("prompt_build")
+def build_worksheet_prompt(activity_type, profile, model=IMAGE_MODEL):
+    return compact_prompt(_worksheet_prompt(activity_type, as_profile(profile)), model)
+
+
+# ----------------------------
+# TEXT ACTIVITY PROMPT FUNCTION
+# ----------------------------
+def _text_prompt(activity_type, profile):
+    child_age = as_profile(profile).child_age
+    return _TEXT_PROMPT_TEMPLATE.format(
+        child_age=child_age if child_age != "" else "N/A",
+        topic=activity_type,
+    )
+
+
+@timed_stage("prompt_build")
+def build_text_prompt(activity_type, profile):
+    return compact_prompt(_text_prompt(activity_type, profile), TEXT_MODEL)
+
+
+# ----------------------------
+# STRUCTURED SHEET PROMPT FUNCTION
+# ----------------------------
+def _sheet_prompt(activity_type, profile):
+    child_age = as_profile(profile).child_age
+    return _SHEET_PROMPT_TEMPLATE.format(
+        child_age=child_age if child_age != "" else "N/A",
+        topic=activity_type,
+    )
+
+
+@timed_stage("prompt_build")
+def build_sheet_prompt(activity_type, profile):
+    """Prompt for utils.structured: depends only on the topic and the child's age."""
+    return compact_prompt(_sheet_prompt(activity_type, profile), TEXT_MODEL)
+
+
+# ----------------------------
+# IMAGE PROMPT FUNCTION
+# ----------------------------
+def _image_prompt(activity_type, profile):
+    return IMAGE_PROMPT_PREFIX + _worksheet_prompt(activity_type, as_profile(profile))
+
+
+@timed_stage("prompt_build")
+def build_image_prompt(activity_type, profile):
+    return compact_prompt(_image_prompt(activity_type, profile), IMAGE_MODEL)
+
+
+def prompt_token_report(activity_type, profile):
+    """Prompt tokens before and after compaction for the text, image and structured sheet prompts."""
+    return {
+        "text": compaction_report(_text_prompt(activity_type, profile), TEXT_MODEL),
+        "image": compaction_report(_image_prompt(activity_type, profile), IMAGE_MODEL),
+        "sheet": compaction_report(_sheet_prompt(activity_type, profile), TEXT_MODEL),
+    }
+
+
+# ----------------------------
+# BUILT-IN ACTIVITIES
+# ----------------------------
+register_activity("CVC Blending", """Create a black-and-white, sensory-friendly phonics worksheet focused on CVC word blending.
+            Include:
+            - A clear name header line: “Name: ___________”
+            - A short, simple instruction: “Read the sounds. Blend the word.”
+            - A table with 4 columns and 3 rows.
+            - Each cell should contain:
+                • One CVC word (e.g., tap, gap, cap, mop, dog, sun, bed, lip)
+                • The word should be in large, clear font.
+            - Use only beginner-level CVC words.
+            - Avoid pictures unless explicitly requested.
+            - Keep layout low-visual-clutter for ASD-friendly processing.""")
+register_activity("Alphabet Tracing", "Generate an alphabet tracing worksheet (uppercase + lowercase) with simple related objects and dotted lines to trace.")
+register_activity("Line Tracing", "Generate a line tracing worksheet with straight, zigzag, curved, and wavy lines.")
+register_activity("Shape Tracing", "Generate a shape tracing worksheet with square, circle, triangle, star, heart, etc., with labels and dashed lines.")
+register_activity("Writing Practice", "Generate a handwriting practice worksheet with large model letters/numbers and multiple rows of dotted traceable characters.")
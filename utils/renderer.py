@@ -0,0 +1,385 @@
+# utils/renderer.py
+# Deterministic local renderer for the structured worksheet types. These
+# sheets are just a header, a grid of words or dotted letters and dashed
+# lines, so drawing them with Pillow takes milliseconds and never garbles
+# text. Free-form custom topics go to the image model, unless they come as a
+# structured worksheet (utils.structured), which render_sheet draws here.
+# Pillow is imported where it is used, so importing this module (as every
+# generator page does) stays cheap until a sheet is drawn.
+import functools
+import io
+import math
+import os
+
+from utils.metrics import timed_stage
+from utils.profile import as_profile
+
+LOCAL_RENDER_ENABLED = os.getenv("AUSOME_LOCAL_RENDER", "1") != "0"
+
+# US Letter portrait at 150 dpi: prints at full page size.
+PAGE_SIZE = (1275, 1650)
+MARGIN = 90
+INK = 0
+GUIDE = 150
+PAPER = 255
+
+CVC_WORDS = [
+    "cat", "hat", "map", "tap", "gap", "cap", "pan", "bag",
+    "pig", "sit", "lip", "big", "dog", "mop", "top", "log",
+    "sun", "bug", "cup", "hut", "bed", "hen", "net", "web",
+]
+ALPHABET_WORDS = {
+    "A": "apple", "B": "ball", "C": "cat", "D": "dog", "E": "egg", "F": "fish",
+    "G": "goat", "H": "hat", "I": "igloo", "J": "jam", "K": "kite", "L": "lion",
+    "M": "moon", "N": "nest", "O": "owl", "P": "pig", "Q": "queen", "R": "rain",
+    "S": "sun", "T": "tree", "U": "umbrella", "V": "van", "W": "web", "X": "box",
+    "Y": "yo-yo", "Z": "zebra",
+}
+
+SHAPE_NAMES = ("Square", "Circle", "Triangle", "Star", "Heart", "Diamond")
+# Line Tracing draws four of these; the first four are the default sheet.
+LINE_KINDS = ("straight", "zigzag", "curved", "wavy", "steps", "arches", "diagonal")
+
+INSTRUCTIONS = {
+    "CVC Blending": "Read the sounds. Blend the word.",
+    "Line Tracing": "Trace each line from the dot.",
+    "Shape Tracing": "Trace each shape.",
+    "Alphabet Tracing": "Trace the letters.",
+    "Writing Practice": "Trace, then write your own.",
+}
+
+
+def has_layout(activity_type):
+    """True if a local layout exists, whether or not local rendering is enabled."""
+    return activity_type in INSTRUCTIONS
+
+
+def can_render(activity_type):
+    return LOCAL_RENDER_ENABLED and has_layout(activity_type)
+
+
+# ----------------------------
+# DRAWING HELPERS
+# ----------------------------
+@functools.lru_cache(maxsize=32)
+def _font(size):
+    from PIL import ImageFont
+
+    for name in ("DejaVuSans-Bold.ttf", "DejaVuSans.ttf", "Arial Bold.ttf", "arialbd.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def _scale(profile):
+    """Bigger print and fewer items for younger or highly sensitive children."""
+    try:
+        age = int(profile.child_age)
+    except (TypeError, ValueError):
+        age = 6
+    scale = 1.25 if age <= 5 else 1.0 if age <= 8 else 0.85
+    if profile.sensory_profile == "High":
+        scale *= 1.1
+    return scale
+
+
+def _text_center(draw, xy, text, size, fill=INK):
+    draw.text(xy, text, font=_font(size), fill=fill, anchor="mm")
+
+
+def _wrap(text, size, width):
+    """Split text into lines that fit width pixels at this font size."""
+    font = _font(size)
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and font.getlength(candidate) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _fit_size(text, size, width, minimum=20):
+    while size > minimum and _font(size).getlength(text) > width:
+        size -= 4
+    return size
+
+
+def _dotted_text(image, xy, text, size, spacing=7):
+    """Draw text as a dotted, traceable glyph."""
+    from PIL import Image, ImageDraw
+
+    font = _font(size)
+    mask = Image.new("L", image.size, 0)
+    ImageDraw.Draw(mask).text(xy, text, font=font, fill=255, anchor="mm")
+    left, top, right, bottom = mask.getbbox() or (0, 0, 0, 0)
+    draw = ImageDraw.Draw(image)
+    radius = max(1, spacing // 3)
+    pixels = mask.load()
+    for y in range(top, bottom, spacing):
+        for x in range(left, right, spacing):
+            if pixels[x, y] > 128:
+                draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=INK)
+
+
+def _dashed_path(draw, points, width=6, dash=18, gap=12, fill=INK):
+    """Dashed polyline through points."""
+    carry = 0.0
+    drawing = True
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        length = math.hypot(x2 - x1, y2 - y1)
+        position = 0.0
+        while position < length:
+            run = (dash if drawing else gap) - carry
+            end = min(length, position + run)
+            if drawing:
+                t1, t2 = position / length, end / length
+                draw.line(
+                    (x1 + (x2 - x1) * t1, y1 + (y2 - y1) * t1, x1 + (x2 - x1) * t2, y1 + (y2 - y1) * t2),
+                    fill=fill, width=width
+                )
+            if end - position < run:
+                carry += end - position
+                break
+            carry = 0.0
+            drawing = not drawing
+            position = end
+
+
+def _page(instruction, title=None):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", PAGE_SIZE, PAPER)
+    draw = ImageDraw.Draw(image)
+    draw.text((MARGIN, MARGIN), "Name: ____________________", font=_font(44), fill=INK)
+    y = MARGIN + 120
+    if title:
+        _text_center(draw, (PAGE_SIZE[0] // 2, y), title, _fit_size(title, 64, PAGE_SIZE[0] - 2 * MARGIN))
+        y += 100
+    for line in _wrap(instruction, 52, PAGE_SIZE[0] - 2 * MARGIN)[:2]:
+        _text_center(draw, (PAGE_SIZE[0] // 2, y), line, 52)
+        y += 66
+    return image, draw, y + 14
+
+
+# ----------------------------
+# WORKSHEET LAYOUTS
+# ----------------------------
+def _cvc(image, draw, top, profile, words):
+    if not words:
+        # Rotate the built-in list by age: deterministic, but not every sheet is identical.
+        try:
+            offset = int(profile.child_age) * 4 % len(CVC_WORDS)
+        except (TypeError, ValueError):
+            offset = 0
+        words = CVC_WORDS[offset:] + CVC_WORDS[:offset]
+    words = list(words)[:12]
+    cols, rows = 4, 3
+    width = (PAGE_SIZE[0] - 2 * MARGIN) / cols
+    height = (PAGE_SIZE[1] - top - MARGIN) / rows
+    size = int(96 * _scale(profile))
+    for index, word in enumerate(words):
+        col, row = index % cols, index // cols
+        x0, y0 = MARGIN + col * width, top + row * height
+        draw.rectangle((x0, y0, x0 + width, y0 + height), outline=INK, width=5)
+        _text_center(draw, (x0 + width / 2, y0 + height / 2), word, size)
+
+
+def _lines(image, draw, top, profile, words):
+    kinds = [word.lower() for word in words or () if word.lower() in LINE_KINDS][:4] or list(LINE_KINDS[:4])
+    left, right = MARGIN + 60, PAGE_SIZE[0] - MARGIN
+    band = (PAGE_SIZE[1] - top - MARGIN) / len(kinds)
+    amplitude = band * 0.25
+    for index, kind in enumerate(kinds):
+        mid = top + band * index + band / 2
+        steps = 120
+        points = []
+        for step in range(steps + 1):
+            t = step / steps
+            x = left + (right - left) * t
+            if kind == "straight":
+                y = mid
+            elif kind == "zigzag":
+                phase = (t * 6) % 1
+                y = mid + amplitude * (1 - 4 * abs(phase - 0.5))
+            elif kind == "curved":
+                y = mid + amplitude - 2 * amplitude * math.sin(math.pi * t)
+            elif kind == "steps":
+                y = mid + (amplitude if int(t * 6) % 2 else -amplitude)
+            elif kind == "arches":
+                y = mid + amplitude - 2 * amplitude * abs(math.sin(math.pi * 3 * t))
+            elif kind == "diagonal":
+                y = mid - amplitude + 2 * amplitude * t
+            else:
+                y = mid + amplitude * math.sin(2 * math.pi * 3 * t)
+            points.append((x, y))
+        x, y = points[0]
+        draw.ellipse((x - 16, y - 16, x + 16, y + 16), fill=INK)
+        _dashed_path(draw, points, width=int(8 * _scale(profile)))
+
+
+def _shape_points(kind, cx, cy, r):
+    if kind == "Circle":
+        return [(cx + r * math.cos(a / 60 * 2 * math.pi), cy + r * math.sin(a / 60 * 2 * math.pi)) for a in range(61)]
+    if kind == "Square":
+        return [(cx - r, cy - r), (cx + r, cy - r), (cx + r, cy + r), (cx - r, cy + r), (cx - r, cy - r)]
+    if kind == "Triangle":
+        return [(cx, cy - r), (cx + r, cy + r * 0.8), (cx - r, cy + r * 0.8), (cx, cy - r)]
+    if kind == "Diamond":
+        return [(cx, cy - r), (cx + r * 0.75, cy), (cx, cy + r), (cx - r * 0.75, cy), (cx, cy - r)]
+    if kind == "Star":
+        points = []
+        for i in range(11):
+            radius = r if i % 2 == 0 else r * 0.45
+            angle = -math.pi / 2 + i * math.pi / 5
+            points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+        return points
+    # Heart
+    points = []
+    for i in range(61):
+        t = i / 60 * 2 * math.pi
+        x = 16 * math.sin(t) ** 3
+        y = 13 * math.cos(t) - 5 * math.cos(2 * t) - 2 * math.cos(3 * t) - math.cos(4 * t)
+        points.append((cx + x * r / 17, cy - y * r / 17))
+    return points
+
+
+def _shapes(image, draw, top, profile, words):
+    shapes = list(words or SHAPE_NAMES)[:6]
+    cols, rows = 2, 3
+    width = (PAGE_SIZE[0] - 2 * MARGIN) / cols
+    height = (PAGE_SIZE[1] - top - MARGIN) / rows
+    radius = min(width, height) * 0.3
+    for index, shape in enumerate(shapes):
+        col, row = index % cols, index // cols
+        cx = MARGIN + col * width + width / 2
+        cy = top + row * height + height / 2 - 20
+        _dashed_path(draw, _shape_points(shape.title(), cx, cy, radius), width=int(7 * _scale(profile)))
+        _text_center(draw, (cx, cy + radius + 45), shape.lower(), 44)
+
+
+def _tracing_rows(image, draw, top, profile, items, labels=None):
+    rows = len(items)
+    height = (PAGE_SIZE[1] - top - MARGIN) / rows
+    size = int(min(height * 0.6, 130 * _scale(profile)))
+    right = PAGE_SIZE[0] - MARGIN - (200 if labels else 0)
+    # Every row has the model plus at least one copy to trace, so long words
+    # (a structured word_list allows up to 24 characters) get a smaller font.
+    widest = max(items, key=_font(size).getlength, default="")
+    while size > 20 and 2 * (_font(size).getlength(widest) + size * 0.4) > right - MARGIN:
+        size -= 4
+    for index, item in enumerate(items):
+        y = top + index * height + height / 2
+        step = _font(size).getlength(item) + size * 0.4
+        draw.line((MARGIN, y + size * 0.42, PAGE_SIZE[0] - MARGIN, y + size * 0.42), fill=GUIDE, width=3)
+        x = MARGIN + step / 2
+        _text_center(draw, (x, y), item, size)
+        x += step
+        while x + step / 2 <= right:
+            _dotted_text(image, (x, y), item, size, spacing=max(6, size // 12))
+            x += step
+        if labels:
+            _text_center(draw, (PAGE_SIZE[0] - MARGIN - 90, y), labels[index], 36)
+
+
+def _alphabet(image, draw, top, profile, words):
+    letters = [w[0].upper() for w in (words or "ABCDEF") if w.strip()][:6]
+    items = [letter + letter.lower() for letter in letters]
+    labels = [ALPHABET_WORDS.get(letter, "") for letter in letters]
+    _tracing_rows(image, draw, top, profile, items, labels)
+
+
+def _writing(image, draw, top, profile, words):
+    items = list(words or ["a", "b", "c", "1", "2", "3"])[:6]
+    _tracing_rows(image, draw, top, profile, items)
+
+
+def _sheet_items(image, draw, top, profile, sheet):
+    """Numbered items with a dashed answer line each, and a word bank along the bottom."""
+    words = sheet["word_list"]
+    cols = 4
+    bank_height = math.ceil(len(words) / cols) * 120 + 70 if words else 0
+    bottom = PAGE_SIZE[1] - MARGIN - bank_height
+    items = sheet["items"]
+    height = (bottom - top) / len(items)
+    size = int(46 * _scale(profile))
+    text_left = MARGIN + 90
+    for index, item in enumerate(items):
+        y0 = top + index * height
+        draw.ellipse((MARGIN, y0 + 10, MARGIN + 60, y0 + 70), outline=INK, width=4)
+        _text_center(draw, (MARGIN + 30, y0 + 40), str(index + 1), 36)
+        # Long items get a smaller font rather than losing words.
+        item_size = size
+        lines = _wrap(item, item_size, PAGE_SIZE[0] - MARGIN - text_left)
+        while item_size > 28 and len(lines) * item_size * 1.25 > height - 90:
+            item_size -= 4
+            lines = _wrap(item, item_size, PAGE_SIZE[0] - MARGIN - text_left)
+        y = y0 + 40
+        for line in lines:
+            draw.text((text_left, y), line, font=_font(item_size), fill=INK, anchor="lm")
+            y += item_size * 1.25
+        line_y = min(y0 + height - 30, y + 50)
+        _dashed_path(draw, [(text_left, line_y), (PAGE_SIZE[0] - MARGIN, line_y)], width=4, fill=GUIDE)
+    if words:
+        draw.text((MARGIN, bottom + 40), "Words:", font=_font(40), fill=INK, anchor="lm")
+        width = (PAGE_SIZE[0] - 2 * MARGIN) / cols
+        for index, word in enumerate(words):
+            col, row = index % cols, index // cols
+            x0, y0 = MARGIN + col * width, bottom + 80 + row * 120
+            draw.rectangle((x0 + 10, y0, x0 + width - 10, y0 + 100), outline=INK, width=4)
+            _text_center(draw, (x0 + width / 2, y0 + 50), word, _fit_size(word, int(48 * _scale(profile)), width - 40))
+
+
+LAYOUTS = {
+    "CVC Blending": _cvc,
+    "Line Tracing": _lines,
+    "Shape Tracing": _shapes,
+    "Alphabet Tracing": _alphabet,
+    "Writing Practice": _writing,
+}
+
+
+@timed_stage("local_render")
+def render_worksheet(activity_type, profile, words=None):
+    """
+    Render a structured worksheet as grayscale PNG bytes. words overrides
+    the built-in word list, letters, characters or shape names.
+    """
+    profile = as_profile(profile)
+    image, draw, top = _page(INSTRUCTIONS[activity_type])
+    LAYOUTS[activity_type](image, draw, top, profile, words)
+    return _png(image)
+
+
+@timed_stage("local_render")
+def render_sheet(sheet, profile, activity_type=None):
+    """
+    Render a utils.structured worksheet: a built-in layout fed with the
+    sheet's word list when the activity has one, otherwise the title,
+    numbered items and a word bank.
+    """
+    profile = as_profile(profile)
+    if has_layout(activity_type):
+        image, draw, top = _page(sheet["instruction"] or INSTRUCTIONS[activity_type])
+        words = sheet["word_list"]
+        if activity_type == "Shape Tracing":
+            words = [word for word in words if word.title() in SHAPE_NAMES]
+        elif activity_type == "Line Tracing":
+            words = [word for word in words if word.lower() in LINE_KINDS]
+        LAYOUTS[activity_type](image, draw, top, profile, words or None)
+    else:
+        image, draw, top = _page(sheet["instruction"], title=sheet["title"])
+        _sheet_items(image, draw, top, profile, sheet)
+    return _png(image)
+
+
+def _png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,369 @@
+# utils/resilience.py
+# Resilient wrapper around a GenerationBackend. Every API call goes through:
+#   - a token-bucket limiter sized to the account's RPM / TPM (and images/min),
+#     shared by every app replica and worker process on the host through
+#     DATA_DIR/limits.sqlite3, so N processes still stay under the account's
+#     limits (AUSOME_RATE_LIMIT_HOSTS splits them between several hosts),
+#   - a per-call deadline,
+#   - jittered exponential backoff that honors Retry-After, with a shared
+#     cooldown so one 429 pauses every caller instead of each retrying alone,
+#   - a circuit breaker per kind that fails fast while the API is down, so
+#     the JobRunner can fall back to cached or locally rendered output.
+# Limits are set through environment variables (AUSOME_TEXT_RPM, ...).
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE, TEXT_MODEL, GenerationBackend, supports_native_n
+from utils.metrics import get_metrics
+from utils.profile_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+TEXT_RPM = float(os.getenv("AUSOME_TEXT_RPM", "500"))
+TEXT_TPM = float(os.getenv("AUSOME_TEXT_TPM", "200000"))
+IMAGE_RPM = float(os.getenv("AUSOME_IMAGE_RPM", "50"))
+# Hosts that each run their own replicas/workers against the same account;
+# every host gets an equal share of the limits above.
+RATE_LIMIT_HOSTS = max(1, int(os.getenv("AUSOME_RATE_LIMIT_HOSTS", "1")))
+# "shared" (default): one set of buckets per host in DATA_DIR/limits.sqlite3.
+# "local": per-process buckets (a single process, or tests).
+RATE_LIMITER = os.getenv("AUSOME_RATE_LIMITER", "shared")
+RATE_LIMIT_PATH = os.path.join(DATA_DIR, "limits.sqlite3") if RATE_LIMITER == "shared" else None
+TEXT_DEADLINE_SECONDS = float(os.getenv("AUSOME_TEXT_DEADLINE", "60"))
+IMAGE_DEADLINE_SECONDS = float(os.getenv("AUSOME_IMAGE_DEADLINE", "120"))
+MAX_RETRIES = int(os.getenv("AUSOME_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+BREAKER_FAILURES = int(os.getenv("AUSOME_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("AUSOME_BREAKER_RESET_SECONDS", "30"))
+# Completion tokens reserved per text call before the real usage is known.
+COMPLETION_TOKEN_ESTIMATE = 800
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+    def __init__(self, kind, retry_in):
+        super().__init__(f"{kind} generation is temporarily unavailable (retry in {retry_in:.0f}s)")
+        self.kind = kind
+        self.retry_in = retry_in
+
+
+# ----------------------------
+# ERROR CLASSIFICATION
+# ----------------------------
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, TimeoutError) or \
+        type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(error):
+    """Seconds from the error's Retry-After header, or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, error=None):
+    """Retry-After if the server sent one, else jittered exponential backoff."""
+    delay = retry_after(error) if error is not None else None
+    if delay is None:
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+        delay *= random.uniform(0.5, 1.0)
+    return delay
+
+
+def describe_error(error):
+    """Short message for teachers instead of the raw exception text."""
+    if isinstance(error, CircuitOpenError):
+        return "The AI service is not responding right now. Please try again in a minute."
+    if isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return "The AI service took too long to answer. Please try again."
+    if getattr(error, "status_code", None) == 429:
+        return "The AI service is busy. Please try again in a moment."
+    return str(error)
+
+
+# ----------------------------
+# TOKEN BUCKET
+# ----------------------------
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity (one minute's worth by default)."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available, then take them."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose level lives in a SQLite file, so every process that
+    opens the same path and name draws from one bucket. Each take is a
+    short IMMEDIATE transaction, run off the event loop.
+    """
+
+    def __init__(self, path, name, rate_per_minute, capacity=None):
+        self.path = path
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._lock = asyncio.Lock()
+        self._conn_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _take(self, amount):
+        """Take `amount` tokens if they are there; returns 0, or the seconds until they will be."""
+        with self._conn_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens = self.capacity if row is None else min(
+                    self.capacity, row[0] + max(0.0, now - row[1]) * self.rate
+                )
+                wait = 0.0
+                if tokens >= amount:
+                    tokens -= amount
+                else:
+                    wait = (amount - tokens) / self.rate
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (self.name, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available in the shared bucket, then take them."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                wait = await asyncio.to_thread(self._take, amount)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+
+# ----------------------------
+# CIRCUIT BREAKER
+# ----------------------------
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls and rejects calls for
+    reset_seconds; then lets one trial call through (half-open) and closes
+    again if it succeeds.
+    """
+
+    def __init__(self, kind, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.kind = kind
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state_locked()
+            if state == "open" or (state == "half-open" and self._trial_running):
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+                raise CircuitOpenError(self.kind, retry_in)
+            if state == "half-open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def cancel_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            reopen = self._trial_running
+            self._trial_running = False
+            if reopen or (self.opened_at is None and self.consecutive_failures >= self.failures):
+                self.opened_at = time.monotonic()
+                get_metrics().count("circuit_open_total")
+                logger.warning("%s circuit opened after %d failures", self.kind, self.consecutive_failures)
+
+
+# ----------------------------
+# RESILIENT BACKEND
+# ----------------------------
+class ResilientBackend(GenerationBackend):
+    """Wraps another backend with rate limits, deadlines, retries and a breaker."""
+
+    def __init__(self, inner, text_rpm=TEXT_RPM, text_tpm=TEXT_TPM, image_rpm=IMAGE_RPM,
+                 text_deadline=TEXT_DEADLINE_SECONDS, image_deadline=IMAGE_DEADLINE_SECONDS,
+                 max_retries=MAX_RETRIES, breaker_failures=BREAKER_FAILURES,
+                 breaker_reset_seconds=BREAKER_RESET_SECONDS, limits_path=RATE_LIMIT_PATH,
+                 hosts=RATE_LIMIT_HOSTS):
+        self.inner = inner
+        self.name = f"resilient-{inner.name}"
+        self.max_retries = max_retries
+        self.deadlines = {"text": text_deadline, "image": image_deadline}
+        self.breakers = {
+            kind: CircuitBreaker(kind, breaker_failures, breaker_reset_seconds)
+            for kind in ("text", "image")
+        }
+        self._limits = (text_rpm / hosts, text_tpm / hosts, image_rpm / hosts)
+        self._limits_path = limits_path
+        self._buckets = None
+        self._cooldown_until = 0.0
+
+    def __getattr__(self, name):
+        # Backend-specific attributes (e.g. FakeBackend.calls) pass through.
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def _get_buckets(self):
+        # asyncio.Lock must be created on the loop that uses it.
+        if self._buckets is None:
+            limits = dict(zip(("text_requests", "text_tokens", "image_requests"), self._limits))
+            if self._limits_path:
+                self._buckets = {
+                    name: SharedTokenBucket(self._limits_path, name, rate) for name, rate in limits.items()
+                }
+            else:
+                self._buckets = {name: TokenBucket(rate) for name, rate in limits.items()}
+        return self._buckets
+
+    async def _limit(self, kind, prompt, images=1):
+        buckets = self._get_buckets()
+        if kind == "text":
+            await buckets["text_requests"].acquire()
+            await buckets["text_tokens"].acquire(len(prompt) // 4 + COMPLETION_TOKEN_ESTIMATE)
+        else:
+            await buckets["image_requests"].acquire(images)
+
+    async def _call(self, kind, prompt, make_call, can_retry=lambda: True, images=1):
+        breaker = self.breakers[kind]
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                wait = self._cooldown_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await self._limit(kind, prompt, images)
+                result = await asyncio.wait_for(make_call(), self.deadlines[kind])
+            except asyncio.CancelledError:
+                breaker.cancel_trial()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    breaker.record_success()  # the API answered; the request itself was bad
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    # Rate limits mean the API is up; only outages count toward the
+                    # breaker. A half-open trial is released so the retry can be the trial.
+                    breaker.cancel_trial()
+                else:
+                    breaker.record_failure()
+                attempt += 1
+                if attempt > self.max_retries or not can_retry():
+                    raise
+                delay = backoff_delay(attempt, e)
+                if getattr(e, "status_code", None) == 429:
+                    # Pause every caller, not just this one.
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                get_metrics().count("api_retries_total")
+                logger.warning("%s retry %d in %.1fs: %r", kind, attempt, delay, e)
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+
+    async def generate_text(self, prompt, model=TEXT_MODEL):
+        return await self._call("text", prompt, lambda: self.inner.generate_text(prompt, model))
+
+    async def generate_json(self, prompt, schema, model=TEXT_MODEL):
+        return await self._call("text", prompt, lambda: self.inner.generate_json(prompt, schema, model))
+
+    async def stream_text(self, prompt, on_chunk, model=TEXT_MODEL):
+        emitted = []
+
+        def push(chunk):
+            emitted.append(True)
+            on_chunk(chunk)
+
+        # Once tokens reached the page a retry would duplicate them.
+        return await self._call(
+            "text", prompt, lambda: self.inner.stream_text(prompt, push, model),
+            can_retry=lambda: not emitted,
+        )
+
+    async def generate_image(self, prompt, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        return await self._call("image", prompt, lambda: self.inner.generate_image(prompt, model, size))
+
+    async def generate_images(self, prompt, n, model=IMAGE_MODEL, size=IMAGE_SIZE):
+        if not supports_native_n(model):
+            # One limited, retried call per variant.
+            return await super().generate_images(prompt, n, model, size)
+        return await self._call(
+            "image", prompt, lambda: self.inner.generate_images(prompt, n, model, size), images=n
+        )
+
+    def status(self):
+        return {kind: breaker.state for kind, breaker in self.breakers.items()}
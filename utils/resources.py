@@ -0,0 +1,56 @@
+# utils/resources.py
+# Process-wide objects shared by every Streamlit session. They are created
+# once per server process through st.cache_resource, so in-flight work and
+# coalesced results outlive reruns and are visible to all teachers at once.
+# Each accessor imports its module on first use: a page that never touches
+# the job runner (e.g. the home page) does not load the SDK, Pillow or NumPy.
+import streamlit as st
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner():
+    """Shared job runner: event loop, backend, cache and in-flight request pool."""
+    from utils.jobs import JobRunner
+    return JobRunner()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Durable job table shared with the worker pool (ausome_worker.py)."""
+    from utils.job_queue import JobQueue
+    return JobQueue()
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    from utils.prefetch import Prefetcher
+    return Prefetcher(get_job_runner())
+
+
+@st.cache_resource(show_spinner=False)
+def get_profile_store():
+    from utils.profile_store import ProfileStore
+    return ProfileStore()
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """Session snapshots in the shared state backend (AUSOME_STATE_BACKEND)."""
+    from utils.state import SessionStore, get_state_backend
+    return SessionStore(get_state_backend())
+
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache():
+    """Nearest-neighbour index over past custom topics."""
+    from utils.cache import get_cache
+    from utils.semantic_cache import SemanticTopicCache
+    return SemanticTopicCache(get_cache())
+
+
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Read .env once per server process instead of on every rerun."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
@@ -0,0 +1,221 @@
+# utils/semantic_cache.py
+# Near-duplicate lookup for free-text ("Other/Custom") topics. Topics are
+# normalized (lowercased, stop words dropped, words stemmed) and embedded as
+# hashed bags of stems and character trigrams; a NumPy matrix of the unit
+# vectors is the nearest-neighbour index. "brushing teeth", "Brushing my
+# teeth" and "tooth brushing routine" land close together, so the generator
+# can offer the earlier worksheet before paying for a new one.
+#
+# Only topics are stored (in SQLite); vectors are rebuilt on load, so the
+# embedding can change without a migration. Each entry remembers the prompts
+# it was generated with, and a match is only offered while those results are
+# still in the worksheet cache.
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE, TEXT_MODEL
+from utils.cache import CACHE_DIR
+from utils.metrics import get_metrics
+
+SEMANTIC_THRESHOLD = float(os.getenv("AUSOME_SEMANTIC_THRESHOLD", "0.75"))
+EMBEDDING_DIM = 1024
+TRIGRAM_WEIGHT = 0.5
+
+STOP_WORDS = {
+    "a", "an", "and", "the", "my", "your", "our", "his", "her", "their", "to", "of", "for",
+    "in", "on", "at", "with", "how", "about", "i", "me", "we", "is", "are", "be",
+    # Filler that every worksheet topic could carry.
+    "activity", "activities", "worksheet", "worksheets", "routine", "routines",
+    "skill", "skills", "practice", "practicing", "lesson", "learning", "time",
+}
+IRREGULAR = {
+    "teeth": "tooth", "feet": "foot", "children": "child", "mice": "mouse",
+    "clothes": "cloth", "men": "man", "women": "woman", "ate": "eat", "tying": "tie",
+}
+SUFFIXES = ("ings", "ing", "ies", "es", "ed", "ly", "s")
+
+
+# ----------------------------
+# NORMALIZE & EMBED
+# ----------------------------
+def _stem(word):
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+            break
+    # "brushing" -> "brush", "running" -> "run"
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouls":
+        word = word[:-1]
+    # "make" / "making" -> "mak"
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def normalize_topic(topic):
+    words = re.findall(r"[a-z]+", (topic or "").lower())
+    return " ".join(sorted({_stem(word) for word in words if word not in STOP_WORDS}))
+
+
+def _bucket(feature):
+    # crc32 is stable across processes, unlike hash().
+    return zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM
+
+
+def embed_topic(topic):
+    """Unit vector for a topic (zero vector if nothing meaningful is left)."""
+    import numpy as np
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for stem in normalize_topic(topic).split():
+        vector[_bucket(stem)] += 1.0
+        padded = f" {stem} "
+        for index in range(len(padded) - 2):
+            vector[_bucket("#" + padded[index:index + 3])] += TRIGRAM_WEIGHT
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# ----------------------------
+# INDEX
+# ----------------------------
+class SemanticTopicCache:
+    def __init__(self, cache, path=None, threshold=SEMANTIC_THRESHOLD):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "topics.sqlite3")
+        self.cache = cache
+        self.threshold = threshold
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS topics (
+                normalized TEXT NOT NULL,
+                child_age TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                text_prompt TEXT,
+                image_prompt TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (normalized, child_age)
+            )
+            """
+        )
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT normalized, child_age, topic, text_prompt, image_prompt FROM topics ORDER BY updated"
+        ).fetchall()
+        self._entries = [self._entry(*row) for row in rows]
+        self._positions = {(entry["normalized"], entry["child_age"]): i for i, entry in enumerate(self._entries)}
+        # Embeddings are built on the first add or lookup, so pages that only
+        # show stats() do not load numpy.
+        self._matrix = None
+        self._ages = None
+
+    def _index(self):
+        """The embedding matrix and ages of all entries (call with the lock held)."""
+        import numpy as np
+
+        if self._matrix is None:
+            self._matrix = (
+                np.vstack([embed_topic(entry["topic"]) for entry in self._entries])
+                if self._entries else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            )
+            self._ages = np.array([entry["child_age"] for entry in self._entries], dtype=object)
+        return self._matrix, self._ages
+
+    @staticmethod
+    def _entry(normalized, child_age, topic, text_prompt, image_prompt):
+        return {
+            "normalized": normalized,
+            "child_age": child_age,
+            "topic": topic,
+            "text_prompt": text_prompt,
+            "image_prompt": image_prompt,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, topic, child_age, text_prompt=None, image_prompt=None):
+        """Remember a custom-topic generation (and the prompts it used) for this age."""
+        import numpy as np
+
+        normalized = normalize_topic(topic)
+        if not normalized:
+            return
+        child_age = str(child_age)
+        with self._lock:
+            position = self._positions.get((normalized, child_age))
+            if position is not None:
+                # Same topic again: keep any prompt the earlier run had that this one lacks.
+                previous = self._entries[position]
+                text_prompt = text_prompt or previous["text_prompt"]
+                image_prompt = image_prompt or previous["image_prompt"]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO topics (normalized, child_age, topic, text_prompt, image_prompt, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (normalized, child_age, topic, text_prompt, image_prompt, time.time()),
+            )
+            self._conn.commit()
+            entry = self._entry(normalized, child_age, topic, text_prompt, image_prompt)
+            if position is not None:
+                self._entries[position] = entry
+                return
+            matrix, ages = self._index()
+            self._positions[(normalized, child_age)] = len(self._entries)
+            self._entries.append(entry)
+            self._matrix = np.vstack([matrix, embed_topic(topic)[None, :]])
+            self._ages = np.append(ages, child_age)
+
+    def lookup(self, topic, child_age, need_text=False, need_image=False):
+        """
+        Closest earlier topic for this age whose needed results are still
+        cached, as {"topic", "similarity", "text_prompt", "image_prompt"}, or
+        None. The same topic text is skipped: the exact cache already covers it.
+        """
+        import numpy as np
+
+        query = embed_topic(topic)
+        with self._lock:
+            self.lookups += 1
+            if not len(self._entries) or not query.any():
+                return None
+            matrix, ages = self._index()
+            scores = matrix @ query
+            scores[ages != str(child_age)] = -1.0
+            candidates = np.argsort(scores)[::-1]
+            entries = [self._entries[i] for i in candidates[:5] if scores[i] >= self.threshold]
+            similarities = [float(scores[i]) for i in candidates[:len(entries)]]
+        for entry, similarity in zip(entries, similarities):
+            if entry["topic"] == topic:
+                continue
+            if need_text and not (entry["text_prompt"] and self.cache.contains("text", entry["text_prompt"], TEXT_MODEL)):
+                continue
+            if need_image and not (
+                entry["image_prompt"]
+                and self.cache.contains("image", entry["image_prompt"], IMAGE_MODEL, IMAGE_SIZE)
+            ):
+                continue
+            with self._lock:
+                self.hits += 1
+            get_metrics().count("semantic_hits_total")
+            return {**entry, "similarity": similarity}
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topics": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            }
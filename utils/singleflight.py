@@ -0,0 +1,50 @@
+# utils/singleflight.py
+import threading
+
+
+class SingleFlight:
+    """
+    Request coalescing. The first caller for a key starts the work; callers
+    that arrive while it is still running get the same Future instead of
+    issuing a duplicate API call. Keys are forgotten once the work finishes,
+    after which results come from the cache.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def do(self, key, start):
+        """
+        Return (future, joined). start() is only called, and must return a
+        concurrent.futures.Future, when nothing is in flight for key.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, True
+            future = start()
+            self._calls[key] = future
+            self.started += 1
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future, False
+
+    def get(self, key):
+        with self._lock:
+            return self._calls.get(key)
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "coalesced": self.coalesced,
+            }
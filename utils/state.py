@@ -0,0 +1,174 @@
+# utils/state.py
+# Shared state for running several Streamlit replicas (processes or nodes)
+# without sticky sessions. What a teacher's session needs on its next
+# request - the working child profile, focus and generator options, the
+# current job - is snapshotted here under the session ID kept in the URL,
+# and job status records (with the result's artifact ID) are published by
+# utils.job_queue. A request that lands on another replica, or on a
+# restarted one, restores the session from here.
+#   AUSOME_STATE_BACKEND=sqlite (default): DATA_DIR/state.sqlite3, shared by
+#     every process on one host (or on one shared volume).
+#   AUSOME_STATE_BACKEND=redis: any Redis-protocol server (Redis, Valkey,
+#     KeyDB or a local stand-in) at AUSOME_REDIS_URL, for replicas on
+#     several nodes. Needs the `redis` package.
+# Backends only need GET, SET with expiry and DEL; values are JSON.
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.profile_store import DATA_DIR
+
+STATE_BACKEND = os.getenv("AUSOME_STATE_BACKEND", "sqlite")
+REDIS_URL = os.getenv("AUSOME_REDIS_URL", "redis://localhost:6379/0")
+STATE_TTL_SECONDS = float(os.getenv("AUSOME_STATE_TTL_DAYS", "30")) * 86400
+PRUNE_EVERY_SETS = 200
+
+
+def _default(value):
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in the state backend")
+
+
+def _hook(value):
+    if "__date__" in value:
+        return datetime.date.fromisoformat(value["__date__"])
+    return value
+
+
+def dumps(value):
+    return json.dumps(value, default=_default)
+
+
+def loads(text):
+    return json.loads(text, object_hook=_hook)
+
+
+# ----------------------------
+# BACKENDS
+# ----------------------------
+class StateBackend:
+    """Key-value store for JSON-serializable values (a subset of Redis: GET, SET EX, DEL)."""
+
+    name = "base"
+
+    def get(self, key):
+        """Return the stored value, or None if it is missing or expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=STATE_TTL_SECONDS):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class SqliteStateBackend(StateBackend):
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            path = os.path.join(DATA_DIR, "state.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        self._sets = 0
+        # Every replica process on the host writes here: WAL plus a busy timeout.
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM state WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return loads(row[0])
+
+    def set(self, key, value, ttl=STATE_TTL_SECONDS):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires) VALUES (?, ?, ?)", (key, dumps(value), expires)
+            )
+            self._sets += 1
+            if self._sets % PRUNE_EVERY_SETS == 0:
+                self._conn.execute("DELETE FROM state WHERE expires < ?", (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class RedisStateBackend(StateBackend):
+    name = "redis"
+
+    def __init__(self, url=REDIS_URL, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else loads(value)
+
+    def set(self, key, value, ttl=STATE_TTL_SECONDS):
+        self.client.set(key, dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+def make_state_backend(name=STATE_BACKEND):
+    if name == "redis":
+        return RedisStateBackend()
+    if name == "sqlite":
+        return SqliteStateBackend()
+    raise ValueError(f"Unknown AUSOME_STATE_BACKEND: {name}")
+
+
+# ----------------------------
+# SESSIONS
+# ----------------------------
+class SessionStore:
+    """Session snapshots (plain dicts) under "session:<id>"; unchanged snapshots are not rewritten."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def load(self, session_id):
+        return self.backend.get(f"session:{session_id}")
+
+    def save(self, session_id, snapshot):
+        """
+        Write the snapshot if it differs from the stored one; returns True if
+        written. The comparison is against the backend, not a per-process
+        memo, because another replica may have written the session since.
+        """
+        stored = self.backend.get(f"session:{session_id}")
+        if stored is not None and dumps(stored) == dumps(snapshot):
+            return False
+        self.backend.set(f"session:{session_id}", snapshot)
+        return True
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend():
+    """Process-wide state backend (the job queue and the app share it)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = make_state_backend()
+        return _backend
@@ -0,0 +1,76 @@
+# utils/structured.py
+# Structured worksheets. One small chat call returns the worksheet as JSON
+# (title, instruction, 3-5 items, word list) under a strict JSON schema;
+# the same result is shown as the activity text and drawn by the local
+# renderer, so no image-model call is needed. Results are cached under the
+# sheet prompt, which depends only on the topic and the child's age.
+import json
+import os
+import re
+
+STRUCTURED_DEFAULT = os.getenv("AUSOME_STRUCTURED_MODE", "0") == "1"
+
+MIN_ITEMS = 3
+MAX_ITEMS = 5
+MAX_WORDS = 12
+
+WORKSHEET_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "Short worksheet title."},
+        "instruction": {"type": "string", "description": "One very simple instruction sentence."},
+        "items": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": MIN_ITEMS,
+            "maxItems": MAX_ITEMS,
+            "description": "Short tasks or questions, one per line on the sheet.",
+        },
+        "word_list": {
+            "type": "array",
+            "items": {"type": "string"},
+            "maxItems": MAX_WORDS,
+            "description": "Single words the child reads, traces or writes.",
+        },
+    },
+    "required": ["title", "instruction", "items", "word_list"],
+    "additionalProperties": False,
+}
+
+
+def _clean(text, limit):
+    return re.sub(r"\s+", " ", str(text)).strip()[:limit]
+
+
+def parse_sheet(data):
+    """
+    Validate and normalize a structured result (dict or JSON text). Raises
+    ValueError if it cannot be used for a worksheet.
+    """
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if not isinstance(data, dict):
+        raise ValueError("Structured worksheet is not a JSON object")
+    items = [_clean(item, 160) for item in data.get("items") or [] if str(item).strip()]
+    if len(items) < MIN_ITEMS:
+        raise ValueError(f"Structured worksheet has {len(items)} items (need {MIN_ITEMS})")
+    words = []
+    for word in data.get("word_list") or []:
+        word = _clean(word, 24)
+        if word and word.lower() not in (w.lower() for w in words):
+            words.append(word)
+    return {
+        "title": _clean(data.get("title") or "Worksheet", 60),
+        "instruction": _clean(data.get("instruction") or "", 120),
+        "items": items[:MAX_ITEMS],
+        "word_list": words[:MAX_WORDS],
+    }
+
+
+def sheet_markdown(sheet):
+    """The activity text shown on the page for a structured worksheet."""
+    lines = [f"### {sheet['title']}", "", f"**{sheet['instruction']}**", ""]
+    lines += [f"{index}. {item}" for index, item in enumerate(sheet["items"], start=1)]
+    if sheet["word_list"]:
+        lines += ["", "**Words:** " + ", ".join(sheet["word_list"])]
+    return "\n".join(lines)
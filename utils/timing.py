@@ -0,0 +1,67 @@
+# utils/timing.py
+# Per-rerun script timing. Every full page run and every fragment rerun
+# records how long the script took, so the cost of a widget interaction can
+# be compared before and after restructuring a page.
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+RERUN_HISTORY = 200
+
+
+class RerunTimings:
+    def __init__(self, history=RERUN_HISTORY):
+        self._samples = defaultdict(lambda: deque(maxlen=history))
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    def summary(self, name):
+        """Last, p50 and p95 script time in milliseconds (None before the first run)."""
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return {
+            "count": len(samples),
+            "last_ms": samples[-1] * 1000,
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+        }
+
+    def names(self):
+        with self._lock:
+            return sorted(self._samples)
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+@contextmanager
+def timed(name):
+    """Record the wall time of the wrapped block, even when it ends in st.rerun()."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_rerun_timings().record(name, time.perf_counter() - started)
+
+
+_timings = None
+_timings_lock = threading.Lock()
+
+
+def get_rerun_timings():
+    """Process-wide rerun timings shared by every Streamlit session."""
+    global _timings
+    with _timings_lock:
+        if _timings is None:
+            _timings = RerunTimings()
+        return _timings
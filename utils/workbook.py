@@ -0,0 +1,216 @@
+# utils/workbook.py
+# Weekly workbooks: one child, a plan of activities x pages, generated
+# concurrently into a single multi-page PDF.
+#   - Every finished page is checkpointed (its artifact ID in a small JSON
+#     manifest next to the PDF), so a failed or interrupted build resumes
+#     and only the missing pages are generated again.
+#   - The PDF is written page by page in plan order as soon as the pages
+#     before it are ready (utils.artifacts.PdfStream), so at most a few
+#     page images are in memory whatever the size of the packet.
+# The workbook ID is derived from the plan and the child's prompt fields:
+# building the same packet again for the same child picks up where the
+# last run stopped.
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from utils.artifacts import PdfStream
+from utils.backends import IMAGE_MODEL, IMAGE_SIZE
+from utils.profile import PROMPT_FIELDS, as_profile
+from utils.profile_store import DATA_DIR
+from utils.prompts import build_image_prompt
+from utils.renderer import ALPHABET_WORDS, CVC_WORDS, LINE_KINDS, SHAPE_NAMES, can_render, render_worksheet
+from utils.resilience import describe_error
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_DIR = os.path.join(DATA_DIR, "workbooks")
+WORKBOOK_CONCURRENCY = 4
+MAX_PAGES = 40
+
+# Built-in word pools and how many items fit on one sheet; later copies of
+# the same activity move along the pool so the pages differ.
+_PAGE_POOLS = {
+    "CVC Blending": (CVC_WORDS, 12),
+    "Line Tracing": (list(LINE_KINDS), 4),
+    "Shape Tracing": (list(SHAPE_NAMES), 6),
+    "Alphabet Tracing": (list(ALPHABET_WORDS), 6),
+    "Writing Practice": ([letter.lower() for letter in ALPHABET_WORDS], 6),
+}
+
+
+def _page_words(activity_type, copy):
+    """Word list for copy N of a locally drawn activity (None: the layout's default)."""
+    if copy == 1 or activity_type not in _PAGE_POOLS:
+        return None
+    pool, count = _PAGE_POOLS[activity_type]
+    start = (copy - 1) * count % len(pool)
+    return (pool[start:] + pool[:start])[:count]
+
+
+def _workbook_id(profile, plan):
+    record = {name: getattr(profile, name) for name in PROMPT_FIELDS}
+    text = json.dumps({"profile": record, "plan": plan}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+# ----------------------------
+# WORKBOOK JOB
+# ----------------------------
+class WorkbookJob:
+    """
+    One workbook build. plan is [(activity_type, pages), ...]; pages are
+    laid out in that order. Run it on the JobRunner loop with
+    runner.submit_workbook(job) and poll completed / pages_written.
+    """
+
+    def __init__(self, profile, plan, concurrency=WORKBOOK_CONCURRENCY, root=WORKBOOK_DIR):
+        self.profile = as_profile(profile)
+        self.plan = [(activity_type, int(count)) for activity_type, count in plan if int(count) > 0]
+        self.concurrency = concurrency
+        self.id = _workbook_id(self.profile, self.plan)
+        self.manifest_path = os.path.join(root, f"{self.id}.json")
+        self.pdf_path = os.path.join(root, f"{self.id}.pdf")
+        self.pages = [
+            {"activity": activity_type, "copy": copy, "artifact_id": None, "error": None}
+            for activity_type, count in self.plan
+            for copy in range(1, count + 1)
+        ]
+        if len(self.pages) > MAX_PAGES:
+            raise ValueError(f"A workbook can have at most {MAX_PAGES} pages ({len(self.pages)} planned)")
+        self.started = time.time()
+        self.finished_at = None
+        self.pages_written = 0
+        self.resumed = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def total(self):
+        return len(self.pages)
+
+    @property
+    def completed(self):
+        with self._lock:
+            return sum(1 for page in self.pages if page["artifact_id"] or page["error"])
+
+    @property
+    def errors(self):
+        return [page for page in self.pages if page["error"]]
+
+    def done(self):
+        return self.finished_at is not None
+
+    # ----------------------------
+    # CHECKPOINTS
+    # ----------------------------
+    def _load_checkpoint(self, artifacts):
+        """Mark pages finished by an earlier run whose images are still stored."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                saved = json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            return
+        for page, old in zip(self.pages, saved):
+            if (old["activity"], old["copy"]) == (page["activity"], page["copy"]) and old.get("artifact_id") \
+                    and artifacts.touch(old["artifact_id"]):
+                page["artifact_id"] = old["artifact_id"]
+                self.resumed += 1
+
+    def _temp_file(self, suffix, mode="wb"):
+        """A file of this build's own next to the workbook (builds of the same plan may overlap)."""
+        return tempfile.NamedTemporaryFile(
+            mode, dir=os.path.dirname(self.pdf_path), prefix=f"{self.id}.", suffix=suffix, delete=False
+        )
+
+    def _checkpoint(self):
+        with self._lock:
+            data = json.dumps({"id": self.id, "child": self.profile.child_name, "plan": self.plan, "pages": self.pages})
+            with self._temp_file(".json.tmp", "w") as f:
+                f.write(data)
+            os.replace(f.name, self.manifest_path)
+
+    # ----------------------------
+    # GENERATION
+    # ----------------------------
+    async def _generate(self, backend, cache, artifacts, page):
+        loop = asyncio.get_running_loop()
+        activity_type, copy = page["activity"], page["copy"]
+        if can_render(activity_type):
+            words = _page_words(activity_type, copy)
+            image_data = await loop.run_in_executor(None, render_worksheet, activity_type, self.profile, words)
+        else:
+            # Copy 1 shares the generator's cached image; later copies are cached as variants.
+            prompt = build_image_prompt(activity_type, self.profile)
+            variant = copy if copy > 1 else None
+            image_data = cache.get("image", prompt, IMAGE_MODEL, IMAGE_SIZE, variant=variant)
+            if image_data is None:
+                image_data = await backend.generate_image(prompt)
+                cache.put("image", prompt, IMAGE_MODEL, image_data, IMAGE_SIZE, variant=variant)
+        return await loop.run_in_executor(None, artifacts.put, image_data)
+
+    async def _worker(self, backend, cache, artifacts, queue, ready):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            page = self.pages[index]
+            try:
+                artifact_id = await self._generate(backend, cache, artifacts, page)
+                with self._lock:
+                    page["artifact_id"] = artifact_id
+            except Exception as e:
+                logger.warning("workbook %s: page %d (%s) failed: %s", self.id, index + 1, page["activity"], e)
+                with self._lock:
+                    page["error"] = describe_error(e)
+            finally:
+                ready[index].set()
+            await loop.run_in_executor(None, self._checkpoint)
+
+    def _write_page(self, pdf, artifacts, artifact_id):
+        from PIL import Image
+
+        with Image.open(artifacts.variant_path(artifact_id, "print")) as image:
+            pdf.add_page(image)
+
+    async def _write_pdf(self, artifacts, ready):
+        """Append pages in plan order as they become ready; failed pages are left out."""
+        loop = asyncio.get_running_loop()
+        f = self._temp_file(".pdf.part")
+        try:
+            with f:
+                pdf = PdfStream(f)
+                for index, page in enumerate(self.pages):
+                    await ready[index].wait()
+                    if page["artifact_id"]:
+                        await loop.run_in_executor(None, self._write_page, pdf, artifacts, page["artifact_id"])
+                        self.pages_written = pdf.page_count
+                pdf.close()
+            os.replace(f.name, self.pdf_path)
+        except BaseException:
+            os.remove(f.name)
+            raise
+
+    async def run(self, backend, cache, artifacts):
+        self._load_checkpoint(artifacts)
+        ready = [asyncio.Event() for _ in self.pages]
+        queue = asyncio.Queue()
+        for index, page in enumerate(self.pages):
+            if page["artifact_id"]:
+                ready[index].set()
+            else:
+                queue.put_nowait(index)
+        workers = [self._worker(backend, cache, artifacts, queue, ready) for _ in range(max(1, self.concurrency))]
+        try:
+            await asyncio.gather(self._write_pdf(artifacts, ready), *workers)
+            self._checkpoint()
+        finally:
+            self.finished_at = time.time()
+        return self